@@ -0,0 +1,132 @@
+"""
+asyncio 模拟引擎吞吐量基准测试
+
+在单个进程中创建大量混合设备（默认 10 万个），按正常的发布周期运行 asyncio 引擎，
+同时由另一个协程以目标速率注入控制消息（与 Broker 投递的消息走同一个 on_message 路径）。
+统计每秒处理的命令数、每秒发布数以及发布调度的最大延迟。
+
+用法:
+    python benchmarks/bench_async.py [--devices N] [--rate R] [--seconds S] [--min-commands C]
+
+指定 --min-commands 时，若每秒处理的命令数低于该值或出现发布超限则以非零状态退出。
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import paho.mqtt.client as mqtt
+from old.async_engine import AsyncSimulator
+from old.devices import DEVICE_TYPES
+
+DEVICE_TYPE_NAMES = list(DEVICE_TYPES)
+
+# 每种设备类型使用一个合法命令
+COMMANDS = {
+    "light": {"command": "turn_on"},
+    "thermostat": {"command": "set_target_temp", "temperature": 24},
+    "doorlock": {"command": "lock"},
+    "blind": {"command": "set_position", "position": 50},
+    "ac": {"command": "turn_on"},
+    "smoke_detector": {"command": "test"},
+    "fan": {"command": "turn_on"},
+    "plug": {"command": "turn_on"},
+}
+
+
+def make_messages(simulator: AsyncSimulator, count: int):
+    """预先构造控制消息，避免把构造开销计入命令处理"""
+    messages = []
+    device_ids = list(simulator.devices)
+    for i in range(count):
+        device_id = device_ids[(i * 7919) % len(device_ids)]
+        msg = mqtt.MQTTMessage(topic=simulator.control_topic(device_id).encode("utf-8"))
+        device_type = device_id.rsplit("-", 1)[0]  # 设备ID形如 "{类型名}-{序号}"
+        msg.payload = json.dumps(COMMANDS[device_type]).encode("utf-8")
+        messages.append(msg)
+    return messages
+
+
+async def feed(simulator: AsyncSimulator, messages, rate: float) -> None:
+    """按目标速率分批注入控制消息"""
+    batch = max(1, int(rate / 100))
+    start = time.monotonic()
+    sent = 0
+    while True:
+        for _ in range(batch):
+            simulator.on_message(None, None, messages[sent % len(messages)])
+            sent += 1
+        delay = start + sent / rate - time.monotonic()
+        await asyncio.sleep(max(0.0, delay))
+
+
+async def run(device_count: int, rate: float, seconds: float,
+              publish_interval: float, warmup: float = 2.0) -> dict:
+    """运行一轮基准并返回统计结果"""
+    published = [0]
+
+    def publish(topic, payload):
+        published[0] += 1
+
+    simulator = AsyncSimulator("bench", publish, tick_interval=1.0,
+                               publish_interval=publish_interval,
+                               publish_jitter=0.1, seed=0)
+    for i in range(device_count):
+        device_type = DEVICE_TYPE_NAMES[i % len(DEVICE_TYPE_NAMES)]
+        simulator.add_device(device_type, f"{device_type}-{i:07d}")
+    messages = make_messages(simulator, 10_000)
+
+    tasks = [asyncio.create_task(simulator.run()),
+             asyncio.create_task(feed(simulator, messages, rate))]
+    # 预热：消化创建设备期间积压的发布，之后再开始计数
+    await asyncio.sleep(warmup)
+    simulator.scheduler.max_lag = 0.0
+    simulator.scheduler.overruns = 0
+    simulator.commands = 0
+    published[0] = 0
+    start = time.perf_counter()
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    stats = simulator.stats()
+    return {
+        "commands_per_sec": stats["commands"] / elapsed,
+        "publish_per_sec": published[0] / elapsed,
+        "max_lag": stats["max_lag"],
+        "overruns": stats["overruns"],
+        "errors": stats["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 模拟引擎吞吐量基准测试")
+    parser.add_argument("--devices", type=int, default=100_000, help="设备数量")
+    parser.add_argument("--rate", type=float, default=5000, help="注入的命令速率（条/秒）")
+    parser.add_argument("--seconds", type=float, default=10.0, help="测量时长（秒）")
+    parser.add_argument("--interval", type=float, default=10.0, help="设备发布周期（秒）")
+    parser.add_argument("--min-commands", type=float, default=None,
+                        help="每秒命令数下限，未达到时以非零状态退出")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.devices, args.rate, args.seconds, args.interval))
+    print(f"设备数:       {args.devices:,}")
+    print(f"命令处理:     {result['commands_per_sec']:12,.0f} 条/秒")
+    print(f"状态发布:     {result['publish_per_sec']:12,.0f} 次/秒")
+    print(f"最大发布延迟: {result['max_lag']:12.3f} 秒")
+    print(f"发布超限:     {result['overruns']:12d}")
+    print(f"命令错误:     {result['errors']:12d}")
+
+    if args.min_commands is not None and (
+            result["commands_per_sec"] < args.min_commands or result["overruns"]):
+        print("未达到吞吐量目标")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+房间热环境模型基准测试
+
+创建 N 个房间（每个房间一台温控器，半数房间另有一台开机的空调），
+统计一次模拟节拍（热环境积分 + 温控器读数写回）的耗时。
+
+用法:
+    python benchmarks/bench_environment.py [--rooms N] [--ticks T] [--max-ms M]
+
+指定 --max-ms 时，若单次节拍平均耗时超过该值则以非零状态退出。
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Thermostat, AirConditioner
+from old.fleet import FleetStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="房间热环境模型基准测试")
+    parser.add_argument("--rooms", type=int, default=100000, help="房间数")
+    parser.add_argument("--ticks", type=int, default=20, help="计时的节拍数")
+    parser.add_argument("--max-ms", type=float, default=None, help="单次节拍平均耗时上限（毫秒）")
+    args = parser.parse_args()
+
+    fleet = FleetStore(seed=0)
+    for n in range(args.rooms):
+        room = f"room-{n}"
+        fleet.add(Thermostat, f"thermostat-{n}", room=room)
+        if n % 2 == 0:
+            ac = fleet.add(AirConditioner, f"ac-{n}", room=room)
+            ac.on = True
+
+    now = 0.0
+    fleet.tick(now=now)
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        now += 10.0
+        fleet.tick(now=now)
+    per_tick = (time.perf_counter() - start) / args.ticks * 1000
+
+    print(f"房间数:       {len(fleet.environment)}")
+    print(f"单次节拍:     {per_tick:.1f} ms")
+    if args.max_ms is not None and per_tick > args.max_ms:
+        print(f"超过上限 {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
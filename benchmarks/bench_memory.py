@@ -0,0 +1,107 @@
+"""
+设备内存占用基准测试
+
+构建大量混合类型设备（默认 100 万个），分别统计旧版布局
+（实例 __dict__、datetime 时间戳、每实例独立的类型字符串）与当前紧凑布局
+（__slots__、共享类型名、浮点时间戳、小整数枚举）下每个设备占用的字节数。
+
+用法:
+    python benchmarks/bench_memory.py [--count N] [--max-bytes B]
+
+指定 --max-bytes 时，若当前布局每设备字节数超过该值则以非零状态退出，
+可用于防止内存占用回退。
+"""
+
+import argparse
+import gc
+import sys
+import os
+import tracemalloc
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import (
+    Light, Thermostat, DoorLock, Blind,
+    AirConditioner, SmokeDetector, Fan, Plug
+)
+
+DEVICE_CLASSES = [Light, Thermostat, DoorLock, Blind,
+                  AirConditioner, SmokeDetector, Fan, Plug]
+
+
+class LegacyDevice:
+    """旧版设备布局：所有属性存放在实例 __dict__ 中"""
+
+    def __init__(self, device_id, class_name, state):
+        self.device_id = device_id
+        self.type = class_name.lower()
+        self.last_update = datetime.now()
+        self.online = True
+        self.error_state = None
+        self.__dict__.update(state)
+
+
+def build_legacy(device_ids):
+    """按旧版布局构建设备"""
+    templates = [(cls.__name__, cls("template").get_state())
+                 for cls in DEVICE_CLASSES]
+    devices = [None] * len(device_ids)
+    for i, device_id in enumerate(device_ids):
+        class_name, state = templates[i % len(templates)]
+        devices[i] = LegacyDevice(device_id, class_name, state)
+    return devices
+
+
+def build_compact(device_ids):
+    """按当前紧凑布局构建设备"""
+    devices = [None] * len(device_ids)
+    for i, device_id in enumerate(device_ids):
+        devices[i] = DEVICE_CLASSES[i % len(DEVICE_CLASSES)](device_id)
+    return devices
+
+
+def measure(build, device_ids) -> float:
+    """
+    统计构建设备期间新增的内存
+
+    Returns:
+        float: 每个设备占用的字节数（不含设备ID字符串）
+    """
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    devices = build(device_ids)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 扣除设备列表本身的指针开销
+    used = after - before - sys.getsizeof(devices)
+    del devices
+    gc.collect()
+    return used / len(device_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备内存占用基准测试")
+    parser.add_argument("--count", type=int, default=1_000_000,
+                        help="设备数量（默认 1000000）")
+    parser.add_argument("--max-bytes", type=float, default=None,
+                        help="当前布局每设备字节数上限，超过则失败")
+    args = parser.parse_args()
+
+    device_ids = [f"{DEVICE_CLASSES[i % len(DEVICE_CLASSES)].__name__.lower()}-{i:07d}"
+                  for i in range(args.count)]
+
+    legacy = measure(build_legacy, device_ids)
+    compact = measure(build_compact, device_ids)
+
+    print(f"设备数量: {args.count}")
+    print(f"旧版布局: {legacy:8.1f} 字节/设备")
+    print(f"紧凑布局: {compact:8.1f} 字节/设备")
+    print(f"节省比例: {1 - compact / legacy:8.1%}")
+
+    if args.max_bytes is not None and compact > args.max_bytes:
+        print(f"内存占用回退: {compact:.1f} > {args.max_bytes:.1f} 字节/设备")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+命令往返延迟基准测试
+
+在本进程中启动 Web 应用的设备模拟器（命令接收队列 + MQTT 客户端），创建 N 个混合设备，
+再由另一个 MQTT 客户端以指定并发度向所有设备发送带关联ID的控制命令，
+统计从控制消息发出到收到对应状态消息的往返延迟（p50/p99/p999）和吞吐量。
+
+默认使用进程内的 Broker 替身（LocalBroker），不需要网络；指定 --broker 时连接真实的 MQTT Broker。
+设备主题前缀使用 .env 中的 DEVICE_PREFIX。
+
+用法:
+    python benchmarks/bench_roundtrip.py [--devices N] [--concurrency C] [--device-rate R]
+                                         [--seconds S] [--broker HOST:PORT] [--simulate]
+                                         [--max-p99-ms MS] [--min-throughput T]
+
+指定 --max-p99-ms 或 --min-throughput 时，p99 超过上限、吞吐量低于下限或有命令丢失则以非零状态退出。
+"""
+
+import argparse
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import paho.mqtt.client as mqtt
+from old import web_app
+from old.devices import DEVICE_TYPES
+from old.roundtrip import LocalBroker, RoundTripLoad
+
+DEVICE_TYPE_NAMES = list(DEVICE_TYPES)
+
+# 每种设备类型使用一个合法命令
+COMMANDS = {
+    "light": {"command": "turn_on"},
+    "thermostat": {"command": "set_target_temp", "temperature": 24},
+    "doorlock": {"command": "lock"},
+    "blind": {"command": "set_position", "position": 50},
+    "ac": {"command": "turn_on"},
+    "smoke_detector": {"command": "test"},
+    "fan": {"command": "turn_on"},
+    "plug": {"command": "turn_on"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="命令往返延迟基准测试")
+    parser.add_argument("--devices", type=int, default=10_000, help="设备数量")
+    parser.add_argument("--concurrency", type=int, default=200, help="最多同时在途的命令数")
+    parser.add_argument("--device-rate", type=float, default=1.0, help="每台设备每秒最多发送的命令数")
+    parser.add_argument("--seconds", type=float, default=10.0, help="发送命令的时长（秒）")
+    parser.add_argument("--timeout", type=float, default=5.0, help="等待状态的超时时间（秒）")
+    parser.add_argument("--broker", default=None,
+                        help="MQTT Broker 地址 HOST:PORT，省略时使用进程内的 Broker 替身")
+    parser.add_argument("--simulate", action="store_true",
+                        help="同时运行模拟节拍和定期状态发布（作为背景负载）")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="p99 往返延迟上限（毫秒）")
+    parser.add_argument("--min-throughput", type=float, default=None,
+                        help="吞吐量下限（往返/秒）")
+    args = parser.parse_args()
+
+    if args.broker is None:
+        broker = LocalBroker()
+        host, port = None, None
+    else:
+        broker = None
+        host, _, port = args.broker.rpartition(":")
+        port = int(port)
+
+    # 模拟器使用替身或连接到指定的 Broker
+    if broker is not None:
+        web_app.mqtt_client = broker.client("WebSimulator")
+    else:
+        web_app.broker_ip, web_app.broker_port = host, port
+    for i in range(args.devices):
+        device_type = DEVICE_TYPE_NAMES[i % len(DEVICE_TYPE_NAMES)]
+        web_app.create_device(device_type, f"{device_type}-{i:07d}", notify=False)
+    web_app.start_mqtt_client()
+    if args.simulate:
+        threading.Thread(target=web_app.start_device_simulator, daemon=True).start()
+
+    if broker is not None:
+        client = broker.client("RoundTripLoad")
+    else:
+        client = mqtt.Client(client_id=f"RoundTripLoad-{os.getpid()}")
+        client.max_inflight_messages_set(1000)
+        client.connect(host, port, 60)
+    client.loop_start()
+    commands = {device_id: COMMANDS[device_id.rsplit("-", 1)[0]]
+                for device_id in web_app.devices.snapshot()}
+    load = RoundTripLoad(client, web_app.device_prefix, commands,
+                         concurrency=args.concurrency, device_rate=args.device_rate,
+                         timeout=args.timeout)
+    if broker is None:
+        time.sleep(0.5)  # 等待真实 Broker 上的订阅生效
+    result = load.run(args.seconds)
+    client.loop_stop()
+
+    latency = result["latency_ms"]
+    print(f"Broker:       {args.broker or '进程内替身'}")
+    print(f"设备数:       {result['devices']:,}")
+    print(f"并发度:       {result['concurrency']}")
+    print(f"发送/完成:    {result['sent']:,} / {result['completed']:,}（丢失 {result['lost']}）")
+    print(f"吞吐量:       {result['throughput']:12,.0f} 往返/秒")
+    print(f"往返延迟:     p50 {latency['p50']:.2f} ms  p99 {latency['p99']:.2f} ms  "
+          f"p999 {latency['p999']:.2f} ms  max {latency['max']:.2f} ms")
+
+    failed = result["lost"] > 0 and (args.max_p99_ms is not None or args.min_throughput is not None)
+    if args.max_p99_ms is not None and latency["p99"] > args.max_p99_ms:
+        failed = True
+    if args.min_throughput is not None and result["throughput"] < args.min_throughput:
+        failed = True
+    if failed:
+        print("未达到延迟或吞吐量目标")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
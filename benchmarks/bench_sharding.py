@@ -0,0 +1,72 @@
+"""
+分片模拟器吞吐量基准测试
+
+分别以 1、2、4…… 个分片启动模拟器（不连接 Broker，发布计数由替身客户端统计），
+把发布周期设得足够短使每个分片都满负荷运行，统计每秒发布的设备状态数，
+用于验证吞吐量随分片（CPU核）数量近似线性增长。
+
+用法:
+    python benchmarks/bench_sharding.py [--devices N] [--shards 1,2,4] [--seconds S]
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import DEVICE_TYPES
+from old.sharding import ShardSupervisor
+
+DEVICE_TYPE_NAMES = list(DEVICE_TYPES)
+
+
+def run(shards: int, device_count: int, seconds: float) -> float:
+    """
+    以指定分片数运行并返回每秒发布数
+
+    Returns:
+        float: 所有分片合计的每秒发布数
+    """
+    config = {
+        "broker_ip": None,
+        "broker_port": 1883,
+        "device_prefix": "bench",
+        "tick_interval": 1.0,
+        "publish_interval": 0.001,  # 远小于一轮发布耗时，使分片满负荷
+        "publish_jitter": 0.0,
+        "publish_intervals": {},
+    }
+    supervisor = ShardSupervisor(shards, config)
+    supervisor.start()
+    try:
+        items = []
+        for i in range(device_count):
+            device_type = DEVICE_TYPE_NAMES[i % len(DEVICE_TYPE_NAMES)]
+            items.append((device_type, f"{device_type}-{i:07d}"))
+        supervisor.add_devices(items)
+        start_count = sum(s["published"] for s in supervisor.stats())
+        start = time.perf_counter()
+        time.sleep(seconds)
+        published = sum(s["published"] for s in supervisor.stats()) - start_count
+        return published / (time.perf_counter() - start)
+    finally:
+        supervisor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片模拟器吞吐量基准测试")
+    parser.add_argument("--devices", type=int, default=20_000, help="设备数量")
+    parser.add_argument("--shards", default="1,2,4", help="要测试的分片数，逗号分隔")
+    parser.add_argument("--seconds", type=float, default=5.0, help="每轮测量时长（秒）")
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in [int(value) for value in args.shards.split(",")]:
+        rate = run(shards, args.devices, args.seconds)
+        baseline = baseline or rate
+        print(f"分片数 {shards:2d}: {rate:12,.0f} 次发布/秒  "
+              f"(相对单分片 {rate / baseline:4.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+集群快照基准测试
+
+构建 N 个混合类型设备（默认 100 万个，温控器和空调各自独占一个房间），
+统计保存快照（持锁复制 + 写文件）、从快照恢复到空集群（load_snapshot）的耗时，
+以及 Web 应用启动时完整恢复（restore_fleet：恢复集群并登记注册表、发布调度和控制路由）的耗时。
+
+为了快速构建大集群，每种设备类型先通过 FleetStore.add 创建一台模板设备，
+再把模板行的状态整批装入列存储表。
+
+用法:
+    python benchmarks/bench_snapshot.py [--count N] [--path P] [--max-restore-seconds S]
+                                        [--max-web-restore-seconds S]
+
+指定 --max-restore-seconds 或 --max-web-restore-seconds 时，
+若 load_snapshot 或 restore_fleet 的耗时超过该值则以非零状态退出。
+"""
+
+import argparse
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from old.devices import DEVICE_TYPES
+from old.fleet import TRANSIENT_COLUMNS, FleetStore
+from old.snapshot import load_snapshot, save_snapshot
+from old import web_app
+
+
+def build_fleet(count: int) -> FleetStore:
+    """按设备类型整批构建集群"""
+    fleet = FleetStore(seed=0)
+    classes = list(DEVICE_TYPES.values())
+    for device_class in classes:
+        template = fleet.add(device_class, f"template-{device_class.type}")
+        table = template._table
+        columns = {name: np.repeat(array[:1], count // len(classes))
+                   for name, array in table.arrays.items() if name not in TRANSIENT_COLUMNS}
+        fleet.remove(template)
+        table.size = 0
+        table._free.clear()
+        ids = [f"{device_class.type}-{n:07d}" for n in range(count // len(classes))]
+        if "_room" in columns:
+            columns["_room"] = np.array([fleet.environment.room(device_id)
+                                         for device_id in ids], dtype=np.int32)
+            fleet.environment.join(columns["_room"])
+        table.load(ids, columns)
+        fleet.stats.apply_rows(device_class.type, table.arrays["_group"][:len(ids)],
+                               online=table.arrays["online"][:len(ids)].astype(np.int64),
+                               devices=True)
+    return fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="集群快照基准测试")
+    parser.add_argument("--count", type=int, default=1000000, help="设备数")
+    parser.add_argument("--path", default=None, help="快照文件路径，默认使用临时目录")
+    parser.add_argument("--max-restore-seconds", type=float, default=None,
+                        help="load_snapshot 恢复耗时上限（秒）")
+    parser.add_argument("--max-web-restore-seconds", type=float, default=None,
+                        help="Web 应用 restore_fleet 恢复耗时上限（秒）")
+    args = parser.parse_args()
+
+    fleet = build_fleet(args.count)
+    fleet.tick(now=0.0)
+    path = args.path or os.path.join(tempfile.mkdtemp(), "fleet.snapshot")
+    info = save_snapshot(fleet, path)
+
+    start = time.perf_counter()
+    restored = load_snapshot(FleetStore(seed=0), path)
+    restore_seconds = time.perf_counter() - start
+    del restored
+
+    start = time.perf_counter()
+    web_app.restore_fleet(path)
+    web_restore_seconds = time.perf_counter() - start
+
+    print(f"设备数:       {len(web_app.fleet)}")
+    print(f"快照大小:     {info['bytes'] / 1e6:.1f} MB")
+    print(f"持锁复制:     {info['capture_seconds'] * 1000:.1f} ms")
+    print(f"写入文件:     {info['write_seconds'] * 1000:.1f} ms")
+    print(f"恢复集群:     {restore_seconds * 1000:.1f} ms")
+    print(f"Web 应用恢复: {web_restore_seconds * 1000:.1f} ms（含注册表、发布调度和控制路由）")
+    failed = False
+    if args.max_restore_seconds is not None and restore_seconds > args.max_restore_seconds:
+        print(f"恢复集群超过上限 {args.max_restore_seconds} s")
+        failed = True
+    if (args.max_web_restore_seconds is not None
+            and web_restore_seconds > args.max_web_restore_seconds):
+        print(f"Web 应用恢复超过上限 {args.max_web_restore_seconds} s")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+asyncio 模拟引擎
+
+线程模式下 paho 的网络线程（on_message）、模拟线程和 Flask 处理线程同时访问设备，
+既有线程切换开销，也没有同步保护。本模块把所有工作放到同一个事件循环上：
+- MQTT 套接字由事件循环驱动（add_reader/add_writer），不再调用 loop_start()
+- 命令在 on_message 回调中直接处理（回调本身就运行在事件循环上）
+- 状态发布和模拟节拍是同一个循环中的协程，按调度器计划的时间唤醒
+所有设备状态只在事件循环线程中读写，不需要加锁。
+时间来自模拟时钟（SIM_CLOCK），支持 real 和 scaled 时钟；两个协程各自等待，不支持 step 时钟。
+
+启动方式:
+    python -m old.async_engine [--devices N]
+"""
+
+from typing import Any, Callable, Dict, Optional
+import argparse
+import asyncio
+import json
+
+import paho.mqtt.client as mqtt
+
+from .devices import DEVICE_TYPES
+from .fleet import FleetStore
+from .scheduler import PublishScheduler
+from .randomness import derive_seed
+from .sharding import load_config
+from .commands import CORRELATION_KEY, correlation_id
+from .serialization import prepend_field
+from . import clock as sim_clock
+
+
+class AsyncMqttIO:
+    """把 paho 客户端的套接字读写挂到 asyncio 事件循环上"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: mqtt.Client):
+        """
+        初始化并接管客户端的套接字回调
+
+        Args:
+            loop (asyncio.AbstractEventLoop): 事件循环
+            client (mqtt.Client): paho 客户端（不要再调用 loop_start）
+        """
+        self.loop = loop
+        self.client = client
+        self._misc: Optional[asyncio.Task] = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self._misc = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+            self._misc = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        """处理心跳和重传（相当于 loop_start 线程中的 loop_misc）"""
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+
+class AsyncSimulator:
+    """运行在单个事件循环上的设备模拟器"""
+
+    def __init__(self, device_prefix: str,
+                 publish: Callable[[str, bytes], Any],
+                 tick_interval: float = 10.0,
+                 publish_interval: float = 10.0,
+                 publish_jitter: float = 0.1,
+                 publish_intervals: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None,
+                 yield_every: int = 1000):
+        """
+        初始化模拟器
+
+        Args:
+            device_prefix (str): 设备主题前缀
+            publish (Callable[[str, bytes], Any]): 发布函数，参数为主题和消息体
+            tick_interval (float): 模拟节拍周期（秒）
+            publish_interval (float): 默认发布周期（秒）
+            publish_jitter (float): 发布抖动（占周期比例）
+            publish_intervals (Optional[Dict[str, float]]): 按设备类型的发布周期
+            seed (Optional[int]): 随机数种子，默认使用运行种子（见 randomness）
+            yield_every (int): 一次发布多少个设备后让出事件循环，保证命令及时处理
+
+        Raises:
+            ValueError: 当前模拟时钟是步进时钟
+        """
+        if isinstance(sim_clock.get_clock(), sim_clock.StepClock):
+            raise ValueError("asyncio 引擎不支持 step 时钟")
+        self.device_prefix = device_prefix
+        self.publish = publish
+        self.tick_interval = tick_interval
+        self.yield_every = yield_every
+        self.fleet = FleetStore(seed)
+        self.devices: Dict[str, Any] = {}
+        self.control_routes: Dict[str, str] = {}
+        self.scheduler = PublishScheduler(
+            interval=publish_interval,
+            jitter=publish_jitter,
+            type_intervals=publish_intervals,
+            seed=derive_seed("scheduler", seed=seed),
+        )
+        self.commands = 0
+        self.errors = 0
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def control_topic(self, device_id: str) -> str:
+        """设备控制主题"""
+        return f"{self.device_prefix}/control/{device_id}"
+
+    def add_device(self, device_type: str, device_id: str) -> None:
+        """
+        添加设备
+
+        Raises:
+            ValueError: 设备类型无效或设备ID已存在
+        """
+        if device_type not in DEVICE_TYPES:
+            raise ValueError(f"无效的设备类型: {device_type}")
+        if device_id in self.devices:
+            raise ValueError(f"设备ID已存在: {device_id}")
+        self.devices[device_id] = self.fleet.add(DEVICE_TYPES[device_type], device_id)
+        self.scheduler.add(device_id, device_type)
+        self.control_routes[self.control_topic(device_id)] = device_id
+        if self._wakeup is not None:
+            # 新设备可能比当前等待的时间更早到期
+            self._wakeup.set()
+
+    def remove_device(self, device_id: str) -> None:
+        """
+        删除设备
+
+        Raises:
+            KeyError: 设备不存在
+        """
+        device = self.devices.pop(device_id)
+        self.control_routes.pop(self.control_topic(device_id), None)
+        self.scheduler.remove(device_id)
+        self.fleet.remove(device)
+
+    def on_connect(self, client, userdata, flags, rc):
+        """连接（含重连）成功后订阅控制通配符主题"""
+        client.subscribe(f"{self.device_prefix}/control/+")
+
+    def on_message(self, client, userdata, msg):
+        """处理控制消息（在事件循环线程中被调用，直接修改设备状态）"""
+        device_id = self.control_routes.get(msg.topic)
+        if device_id is None:
+            return
+        try:
+            self.handle_command(device_id, json.loads(msg.payload))
+        except Exception as e:
+            self.errors += 1
+            print(f"Error handling message: {e}")
+
+    def handle_command(self, device_id: str, command: Dict[str, Any]) -> None:
+        """执行设备命令并立即发布新状态（带回命令的关联ID）"""
+        self.devices[device_id].handle_command(command)
+        self.commands += 1
+        self.publish_status(device_id, correlation_id(command))
+
+    def publish_status(self, device_id: str, cid: Any = None) -> None:
+        """发布设备状态（复用设备缓存的已编码状态）"""
+        payload = self.devices[device_id].to_json()
+        if cid is not None:
+            payload = prepend_field(payload, CORRELATION_KEY, cid)
+        self.publish(f"{self.device_prefix}/status/{device_id}", payload)
+
+    async def publish_loop(self) -> None:
+        """按调度器安排的时间发布设备状态"""
+        self._wakeup = asyncio.Event()
+        while True:
+            due = self.scheduler.pop_due()
+            for count, device_id in enumerate(due, 1):
+                if device_id in self.devices:
+                    self.publish_status(device_id)
+                if count % self.yield_every == 0:
+                    await asyncio.sleep(0)
+            next_due = self.scheduler.next_due()
+            self._wakeup.clear()
+            if next_due is None:
+                await self._wakeup.wait()
+                continue
+            delay = sim_clock.real_delay(next_due - sim_clock.monotonic())
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(0)
+
+    async def tick_loop(self) -> None:
+        """按固定周期执行模拟节拍（以计划时间为基准，不漂移）"""
+        next_tick = sim_clock.monotonic()
+        while True:
+            now = sim_clock.monotonic()
+            if now >= next_tick:
+                self.fleet.tick()
+                next_tick += self.tick_interval
+                if next_tick < now:
+                    next_tick = now + self.tick_interval
+            await asyncio.sleep(sim_clock.real_delay(next_tick - sim_clock.monotonic()))
+
+    async def run(self) -> None:
+        """运行发布与节拍协程，直到被取消"""
+        await asyncio.gather(self.publish_loop(), self.tick_loop())
+
+    def stats(self) -> Dict[str, Any]:
+        """返回运行统计信息"""
+        stats = self.scheduler.stats()
+        stats.update(commands=self.commands, errors=self.errors)
+        return stats
+
+
+async def main(device_count: int = 0) -> None:
+    """连接 Broker 并运行 asyncio 模拟器"""
+    config = load_config()
+    loop = asyncio.get_running_loop()
+    client = mqtt.Client(client_id="AsyncSimulator")
+    simulator = AsyncSimulator(
+        config["device_prefix"],
+        client.publish,
+        tick_interval=config["tick_interval"],
+        publish_interval=config["publish_interval"],
+        publish_jitter=config["publish_jitter"],
+        publish_intervals=config["publish_intervals"],
+    )
+    client.on_connect = simulator.on_connect
+    client.on_message = simulator.on_message
+    AsyncMqttIO(loop, client)
+    client.connect(config["broker_ip"], config["broker_port"], 60)
+
+    device_types = list(DEVICE_TYPES)
+    for i in range(device_count):
+        device_type = device_types[i % len(device_types)]
+        simulator.add_device(device_type, f"{device_type}-{i:07d}")
+    try:
+        await simulator.run()
+    finally:
+        client.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="asyncio 设备模拟器")
+    parser.add_argument("--devices", type=int, default=0, help="启动时创建的混合设备数量")
+    args = parser.parse_args()
+    asyncio.run(main(args.devices))
@@ -0,0 +1,164 @@
+"""
+状态批量发布模块
+
+高扇出场景下逐设备发布状态会同时压垮 paho 的网络线程和 Broker。
+批量模式把多个设备的状态打包成一帧，发布到分片的批量主题：
+    {device_prefix}/status/batch/{shard}
+分片可以按设备类型或按设备ID哈希桶划分；每个分片在达到帧大小上限
+或最早一条状态等待超过延迟上限时发送。
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import threading
+import zlib
+
+from .serialization import dumps, join_object
+from . import clock as sim_clock
+
+
+def parse_shard_spec(spec: Optional[str]) -> Tuple[str, int]:
+    """
+    解析分片方式配置
+
+    Args:
+        spec (Optional[str]): "type" 或 "hash:<桶数>"
+
+    Returns:
+        Tuple[str, int]: 分片方式和哈希桶数
+    """
+    if not spec or spec == "type":
+        return "type", 0
+    mode, _, buckets = spec.partition(":")
+    if mode != "hash":
+        raise ValueError(f"无效的分片方式: {spec}")
+    return "hash", int(buckets or 16)
+
+
+def hash_bucket(device_id: str, buckets: int) -> int:
+    """按设备ID计算稳定的哈希桶编号（与进程、运行无关）"""
+    return zlib.crc32(device_id.encode("utf-8")) % buckets
+
+
+class StatusBatcher:
+    """状态批量发布器"""
+
+    def __init__(self, publish: Callable[[str, bytes], Any], device_prefix: str,
+                 shard_by: str = "type", buckets: int = 16,
+                 max_batch: int = 500, max_latency: float = 1.0,
+                 clock: Callable[[], float] = sim_clock.monotonic):
+        """
+        初始化批量发布器
+
+        Args:
+            publish (Callable[[str, bytes], Any]): 发布函数，参数为主题和消息体
+            device_prefix (str): 设备主题前缀
+            shard_by (str): 分片方式，"type" 按设备类型，"hash" 按设备ID哈希桶
+            buckets (int): 哈希桶数量
+            max_batch (int): 每帧最多包含的设备状态数
+            max_latency (float): 状态在缓冲区中的最长等待时间（秒）
+            clock (Callable[[], float]): 单调时钟，默认为模拟时钟
+        """
+        if shard_by not in ("type", "hash"):
+            raise ValueError(f"无效的分片方式: {shard_by}")
+        self.publish = publish
+        self.device_prefix = device_prefix
+        self.shard_by = shard_by
+        self.buckets = buckets
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.clock = clock
+        self._pending: Dict[str, Dict[str, bytes]] = {}  # 分片 -> {设备ID: 已编码状态}
+        self._deadlines: Dict[str, float] = {}  # 分片 -> 最晚发送时间
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def shard_of(self, device_id: str, device_type: str) -> str:
+        """计算设备所属的分片"""
+        if self.shard_by == "type":
+            return device_type
+        return str(hash_bucket(device_id, self.buckets))
+
+    def topic(self, shard: str) -> str:
+        """分片的批量主题"""
+        return f"{self.device_prefix}/status/batch/{shard}"
+
+    def add(self, device_id: str, device_type: str, payload: bytes) -> None:
+        """
+        缓冲一条设备状态，分片满时立即发送
+
+        状态为已编码的 JSON（通常是设备缓存的 to_json 结果），打包时直接拼接，
+        不会重新编码。同一帧内同一设备只保留最新状态。
+        """
+        shard = self.shard_of(device_id, device_type)
+        frame = None
+        with self._lock:
+            pending = self._pending.get(shard)
+            if pending is None:
+                pending = self._pending[shard] = {}
+                self._deadlines[shard] = self.clock() + self.max_latency
+            pending[device_id] = payload
+            if len(pending) >= self.max_batch:
+                frame = self._take(shard)
+        if frame is not None:
+            self._send(shard, frame)
+
+    def next_deadline(self) -> Optional[float]:
+        """返回最早需要发送的时间，没有缓冲的状态时返回 None"""
+        with self._lock:
+            return min(self._deadlines.values(), default=None)
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """
+        发送所有等待时间达到延迟上限的分片
+
+        Returns:
+            int: 发送的帧数
+        """
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            frames = [(shard, self._take(shard))
+                      for shard, deadline in list(self._deadlines.items())
+                      if deadline <= now]
+        for shard, frame in frames:
+            self._send(shard, frame)
+        return len(frames)
+
+    def flush(self) -> int:
+        """立即发送所有缓冲的状态"""
+        with self._lock:
+            frames = [(shard, self._take(shard)) for shard in list(self._pending)]
+        for shard, frame in frames:
+            self._send(shard, frame)
+        return len(frames)
+
+    def _take(self, shard: str) -> Dict[str, bytes]:
+        """取出分片缓冲区（调用方持有锁）"""
+        del self._deadlines[shard]
+        return self._pending.pop(shard)
+
+    def _send(self, shard: str, states: Dict[str, bytes]) -> None:
+        """打包并发布一帧"""
+        header = dumps({
+            "shard": shard,
+            "count": len(states),
+            "timestamp": sim_clock.now(),
+        })
+        frame = header[:-1] + b',"devices":' + join_object(states.items()) + b"}"
+        self.publish(self.topic(shard), frame)
+        self.frames += 1
+
+
+def unpack_frame(payload: Any) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    解包一帧批量状态，供消费端使用
+
+    Args:
+        payload: 批量主题收到的消息体
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: (设备ID, 状态) 列表
+    """
+    frame = json.loads(payload)
+    return list(frame["devices"].items())
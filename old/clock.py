@@ -0,0 +1,192 @@
+"""
+模拟时钟模块
+
+设备时间戳、模拟节拍和发布调度原来都直接读取系统时间，主循环也按墙上时间等待，
+模拟一天的设备行为就要运行一天。本模块提供可替换的模拟时钟，设备和主循环都从当前时钟读取时间：
+- real：系统时间（默认）
+- scaled:N：模拟时间以 N 倍速流逝，主循环的等待按比例缩短（如 scaled:60 一分钟模拟一小时）
+- step：尽可能快，主循环需要等待时直接把模拟时间推进到下一个事件，不实际等待
+
+时钟通过环境变量配置：
+    SIM_CLOCK=scaled:60
+    SIM_CLOCK_START=2025-01-01T00:00:00   # 模拟起始时间（ISO 格式或 Unix 时间戳），默认为当前时间
+
+命令接收队列、SSE 心跳、快照和命令日志的写入线程属于基础设施，仍使用系统时间。
+"""
+
+from datetime import datetime
+from typing import Optional
+import os
+import threading
+import time
+
+
+class RealClock:
+    """系统时钟"""
+
+    name = "real"
+
+    def now(self) -> float:
+        """当前模拟时间（Unix 时间戳）"""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """单调时间（秒），用于调度和节拍"""
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """等待一段模拟时间"""
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def real_delay(self, seconds: float) -> float:
+        """一段模拟时间对应的实际等待时间（秒）"""
+        return max(0.0, seconds)
+
+
+class ScaledClock(RealClock):
+    """按固定倍速流逝的模拟时钟"""
+
+    name = "scaled"
+
+    def __init__(self, rate: float, start: Optional[float] = None):
+        """
+        初始化倍速时钟
+
+        Args:
+            rate (float): 倍速（模拟秒数 / 实际秒数）
+            start (Optional[float]): 模拟起始时间，默认为当前时间
+
+        Raises:
+            ValueError: 倍速不是正数
+        """
+        if rate <= 0:
+            raise ValueError("时钟倍速必须大于0")
+        self.rate = rate
+        self.start = time.time() if start is None else start
+        self._origin = time.monotonic()
+
+    def now(self) -> float:
+        return self.start + self.monotonic()
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self._origin) * self.rate
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds / self.rate)
+
+    def real_delay(self, seconds: float) -> float:
+        return max(0.0, seconds) / self.rate
+
+
+class StepClock(RealClock):
+    """只在等待时推进的模拟时钟（尽可能快地运行）"""
+
+    name = "step"
+
+    def __init__(self, start: Optional[float] = None):
+        """
+        初始化步进时钟
+
+        Args:
+            start (Optional[float]): 模拟起始时间，默认为当前时间
+        """
+        self.start = time.time() if start is None else start
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return self.start + self._elapsed
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def sleep(self, seconds: float) -> None:
+        """不实际等待，直接把模拟时间推进 seconds 秒"""
+        if seconds > 0:
+            with self._lock:
+                self._elapsed += seconds
+
+    def real_delay(self, seconds: float) -> float:
+        return 0.0
+
+    def advance_to(self, timestamp: float) -> None:
+        """把模拟时间推进到指定时间戳（不会后退）"""
+        with self._lock:
+            self._elapsed = max(self._elapsed, timestamp - self.start)
+
+
+def parse_clock(spec: Optional[str], start: Optional[str] = None) -> RealClock:
+    """
+    按配置创建时钟
+
+    Args:
+        spec (Optional[str]): "real"、"scaled:<倍速>" 或 "step"，为空时为 real
+        start (Optional[str]): 模拟起始时间，ISO 格式或 Unix 时间戳
+
+    Returns:
+        RealClock: 时钟
+
+    Raises:
+        ValueError: 配置格式错误
+    """
+    spec = (spec or "real").strip()
+    if start:
+        try:
+            start_time = float(start)
+        except ValueError:
+            start_time = datetime.fromisoformat(start).timestamp()
+    else:
+        start_time = None
+    name, _, value = spec.partition(":")
+    if name == "real":
+        return RealClock() if start_time is None else ScaledClock(1.0, start_time)
+    if name == "scaled":
+        return ScaledClock(float(value), start_time)
+    if name == "step":
+        return StepClock(start_time)
+    raise ValueError(f"无效的时钟配置: {spec}")
+
+
+_clock = parse_clock(os.getenv("SIM_CLOCK"), os.getenv("SIM_CLOCK_START"))
+
+
+def get_clock() -> RealClock:
+    """获取当前时钟"""
+    return _clock
+
+
+def set_clock(clock: RealClock) -> RealClock:
+    """
+    替换当前时钟
+
+    Args:
+        clock (RealClock): 新时钟
+
+    Returns:
+        RealClock: 原来的时钟
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def now() -> float:
+    """当前时钟的模拟时间（Unix 时间戳）"""
+    return _clock.now()
+
+
+def monotonic() -> float:
+    """当前时钟的单调时间（秒）"""
+    return _clock.monotonic()
+
+
+def sleep(seconds: float) -> None:
+    """按当前时钟等待一段模拟时间"""
+    _clock.sleep(seconds)
+
+
+def real_delay(seconds: float) -> float:
+    """一段模拟时间在当前时钟下对应的实际等待时间（秒）"""
+    return _clock.real_delay(seconds)
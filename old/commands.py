@@ -0,0 +1,334 @@
+"""
+设备命令表模块
+
+每种设备的命令以声明方式定义：命令名、参数（类型、取值范围、默认值）和处理函数。
+- 参数校验器在定义时编译为闭包，执行命令时只做一次字典查找和参数转换
+- 设备的 handle_command、REST API 的参数校验（返回 4xx）和
+  文档/MQTT通信规范.md 中的命令说明都由同一张命令表生成
+
+生成命令文档:
+    python -m old.commands --docs
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+
+
+class CommandError(ValueError):
+    """命令无效（未知命令或参数无法解析）"""
+
+
+# 参数类型
+INT = "int"
+FLOAT = "float"
+CHOICE = "choice"
+
+_CONVERTERS = {INT: int, FLOAT: float}
+
+# 命令消息中的关联ID字段：设备执行命令后立即发布状态，并在状态消息中原样带回该字段
+CORRELATION_KEY = "correlation_id"
+
+
+def correlation_id(command: Any) -> Any:
+    """
+    取出命令消息中的关联ID
+
+    Returns:
+        Any: 关联ID，没有时为 None
+    """
+    return command.get(CORRELATION_KEY) if isinstance(command, dict) else None
+
+
+class Param:
+    """命令参数定义"""
+
+    __slots__ = ("name", "kind", "default", "minimum", "maximum", "choices",
+                 "error", "description", "parse")
+
+    def __init__(self, name: str, kind: str, default: Any,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 choices: Optional[Sequence[str]] = None,
+                 error: str = "无效的参数值", description: str = ""):
+        """
+        定义命令参数
+
+        Args:
+            name (str): 参数在命令消息中的键名
+            kind (str): 参数类型，INT、FLOAT 或 CHOICE
+            default: 消息中缺少该参数时使用的默认值
+            minimum (Optional[float]): 数值下限，超出时截断到边界
+            maximum (Optional[float]): 数值上限，超出时截断到边界
+            choices (Optional[Sequence[str]]): CHOICE 类型的可选值
+            error (str): 参数无效时设置的设备错误信息
+            description (str): 文档中的参数说明
+        """
+        if kind not in (INT, FLOAT, CHOICE):
+            raise ValueError(f"无效的参数类型: {kind}")
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = tuple(choices or ())
+        self.error = error
+        self.description = description
+        self.parse = self._compile()
+
+    def _compile(self) -> Callable[[Any], Any]:
+        """编译参数转换函数：返回转换并截断后的值，无效时抛出 CommandError"""
+        error = self.error
+        if self.kind == CHOICE:
+            choices = frozenset(self.choices)
+
+            def parse_choice(value):
+                if value not in choices:
+                    raise CommandError(error)
+                return value
+            return parse_choice
+
+        convert = _CONVERTERS[self.kind]
+        lo, hi = self.minimum, self.maximum
+
+        def parse_number(value):
+            try:
+                value = convert(value)
+            except (ValueError, TypeError):
+                raise CommandError(error)
+            if lo is not None and value < lo:
+                value = lo
+            if hi is not None and value > hi:
+                value = hi
+            return value
+        return parse_number
+
+    def range_text(self) -> str:
+        """文档中的取值范围"""
+        if self.kind == CHOICE:
+            return " / ".join(self.choices)
+        return f"{self.minimum} - {self.maximum}"
+
+
+class Command:
+    """命令定义"""
+
+    __slots__ = ("name", "params", "handler", "description", "_parsers")
+
+    def __init__(self, name: str, params: Sequence[Param],
+                 handler: Callable[..., None], description: str = ""):
+        self.name = name
+        self.params = tuple(params)
+        self.handler = handler
+        self.description = description
+        self._parsers = tuple((p.name, p.default, p.parse) for p in self.params)
+
+    def parse(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        解析命令参数
+
+        Returns:
+            Dict[str, Any]: 参数名到转换后取值的映射
+
+        Raises:
+            CommandError: 参数无效
+        """
+        return {name: parse(command.get(name, default))
+                for name, default, parse in self._parsers}
+
+    def example(self) -> Dict[str, Any]:
+        """文档中的命令示例"""
+        message = {"command": self.name}
+        for param in self.params:
+            message[param.name] = param.default
+        return message
+
+
+def command(name: str, *params: Param, description: str = ""):
+    """
+    把设备方法注册为命令处理函数
+
+    被装饰的方法以解析后的参数作为关键字参数调用；
+    设备类创建时（BaseDevice.__init_subclass__）收集为该类的命令表。
+
+    Args:
+        name (str): 命令名
+        *params (Param): 命令参数
+        description (str): 文档中的命令说明
+    """
+    def decorator(func):
+        func._command = (name, params, description)
+        return func
+    return decorator
+
+
+class CommandTable:
+    """一种设备类型的命令表"""
+
+    def __init__(self, commands: Iterable[Command] = ()):
+        self.commands: Dict[str, Command] = {cmd.name: cmd for cmd in commands}
+
+    @classmethod
+    def collect(cls, device_class: type) -> "CommandTable":
+        """从设备类（含父类）中收集被 command 装饰的方法"""
+        commands: Dict[str, Command] = {}
+        for klass in reversed(device_class.__mro__):
+            for attr in vars(klass).values():
+                spec = getattr(attr, "_command", None)
+                if spec is not None:
+                    name, params, description = spec
+                    commands[name] = Command(name, params, attr, description)
+        return cls(commands.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.commands
+
+    def __iter__(self):
+        return iter(self.commands.values())
+
+    def validate(self, command: Any) -> Tuple[Command, Dict[str, Any]]:
+        """
+        校验命令消息
+
+        Args:
+            command: 命令消息（应为包含 "command" 键的字典）
+
+        Returns:
+            Tuple[Command, Dict[str, Any]]: 命令定义和解析后的参数
+
+        Raises:
+            CommandError: 消息格式错误、未知命令或参数无效
+        """
+        if not isinstance(command, dict):
+            raise CommandError("命令消息必须是 JSON 对象")
+        name = command.get("command")
+        cmd = self.commands.get(name)
+        if cmd is None:
+            raise CommandError(f"未知命令: {name}")
+        return cmd, cmd.parse(command)
+
+    def apply(self, device: Any, command: Dict[str, Any]) -> None:
+        """
+        对设备执行命令
+
+        Raises:
+            CommandError: 未知命令或参数无效（设备状态不变）
+        """
+        cmd, kwargs = self.validate(command)
+        cmd.handler(device, **kwargs)
+
+
+def apply_many(devices: Iterable[Any], command: Dict[str, Any],
+               guard: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """
+    对多个设备执行同一条命令
+
+    命令按设备类型只解析一次，之后直接调用处理函数。
+
+    Args:
+        devices: 设备列表（可以混合多种类型）
+        command (Dict[str, Any]): 命令消息
+        guard (Optional[Callable]): 对每个设备返回一个上下文管理器（如 DeviceRegistry.command），
+            在其中执行命令；产出的对象不是该设备时（已被删除）跳过
+
+    Returns:
+        List[Any]: 执行了命令的设备
+
+    Raises:
+        CommandError: 命令对其中某种设备类型无效（此时不会修改任何设备）
+    """
+    devices = list(devices)
+    parsed: Dict[type, Tuple[Command, Dict[str, Any]]] = {}
+    for device in devices:
+        device_class = type(device)
+        if device_class not in parsed:
+            parsed[device_class] = device_class.COMMANDS.validate(command)
+    applied = []
+    for device in devices:
+        cmd, kwargs = parsed[type(device)]
+        if guard is None:
+            cmd.handler(device, **kwargs)
+            device.update_status()
+            applied.append(device)
+            continue
+        with guard(device) as current:
+            if current is device:
+                cmd.handler(device, **kwargs)
+                device.update_status()
+                applied.append(device)
+    return applied
+
+
+# 文档生成
+
+DOC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "文档", "MQTT通信规范.md")
+DOC_BEGIN = "<!-- 以下内容由 python -m old.commands --docs 根据命令表生成，请勿手动修改 -->"
+DOC_END = "<!-- 命令表生成内容结束 -->"
+
+
+def render_docs(device_types: Dict[str, type]) -> str:
+    """
+    根据命令表生成设备命令文档
+
+    Args:
+        device_types (Dict[str, type]): REST API 类型名到设备类的映射
+
+    Returns:
+        str: Markdown 文本（含起止标记）
+    """
+    lines = [DOC_BEGIN, ""]
+    for index, (type_name, device_class) in enumerate(device_types.items(), 1):
+        title = (device_class.__doc__ or "").strip().split("\n")[0].replace("设备类", "")
+        lines.append(f"### {index}. {title} ({device_class.__name__})")
+        lines.append("")
+        lines.append(f"REST API 类型名：`{type_name}`")
+        lines.append("")
+        lines.append("| 命令 | 说明 | 参数 | 取值范围 | 默认值 |")
+        lines.append("|------|------|------|----------|--------|")
+        for cmd in device_class.COMMANDS:
+            if not cmd.params:
+                lines.append(f"| `{cmd.name}` | {cmd.description} | - | - | - |")
+            for param in cmd.params:
+                param_text = f"`{param.name}` ({param.kind})"
+                if param.description:
+                    param_text += f" {param.description}"
+                lines.append(f"| `{cmd.name}` | {cmd.description} | {param_text} | "
+                             f"{param.range_text()} | `{json.dumps(param.default)}` |")
+        lines.append("")
+        lines.append("```json")
+        for cmd in device_class.COMMANDS:
+            lines.append(json.dumps(cmd.example(), ensure_ascii=False))
+        lines.append("```")
+        lines.append("")
+    lines.append(DOC_END)
+    return "\n".join(lines)
+
+
+def update_docs(path: str = DOC_PATH) -> bool:
+    """
+    用命令表生成的内容替换文档中起止标记之间的部分
+
+    Returns:
+        bool: 文档内容是否有变化
+    """
+    from .devices import DEVICE_TYPES
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    begin = text.index(DOC_BEGIN)
+    end = text.index(DOC_END) + len(DOC_END)
+    updated = text[:begin] + render_docs(DEVICE_TYPES) + text[end:]
+    if updated == text:
+        return False
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(updated)
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="设备命令表工具")
+    parser.add_argument("--docs", action="store_true", help="根据命令表更新MQTT通信规范文档")
+    args = parser.parse_args()
+    if args.docs:
+        print("文档已更新" if update_docs() else "文档已是最新")
@@ -6,15 +6,16 @@
 """
 
 import paho.mqtt.client as mqtt
-import random
-import time
 import json
 from dotenv import load_dotenv
 import os
-from devices import (
+from .devices import (
     Light, Thermostat, DoorLock, Blind,
     AirConditioner, SmokeDetector, Fan, Plug
 )
+from .scheduler import PublishScheduler
+from .randomness import derive_seed, stream
+from . import clock as sim_clock
 
 # 加载环境变量
 load_dotenv()
@@ -39,6 +40,26 @@ devices = {
     "plug-001": Plug("plug-001")
 }
 
+# 控制主题到设备ID的路由表
+control_routes = {
+    f"{device_prefix}/control/{device_id}": device_id
+    for device_id in devices
+}
+
+def on_connect(client, userdata, flags, rc):
+    """
+    连接（含重连）成功后用一个通配符订阅所有设备的控制主题
+    
+    Args:
+        client: MQTT客户端实例
+        userdata: 用户数据
+        flags: 连接标志
+        rc: 连接结果码
+    """
+    control_topic = f"{device_prefix}/control/+"
+    client.subscribe(control_topic)
+    print(f"Subscribed to {control_topic}")
+
 def on_message(client, userdata, msg):
     """
     处理接收到的MQTT消息
@@ -48,16 +69,16 @@ def on_message(client, userdata, msg):
         userdata: 用户数据
         msg: 接收到的消息
     """
-    for device_id, device in devices.items():
-        control_topic = f"{device_prefix}/control/{device_id}"
-        if msg.topic == control_topic:
-            try:
-                command = json.loads(msg.payload)
-                print(f"Received command for {device_id}: {command}")
-                device.handle_command(command)
-                publish_status(device_id)
-            except Exception as e:
-                print(f"Error parsing command: {e}")
+    device_id = control_routes.get(msg.topic)
+    if device_id is None:
+        return
+    try:
+        command = json.loads(msg.payload)
+        print(f"Received command for {device_id}: {command}")
+        devices[device_id].handle_command(command)
+        publish_status(device_id)
+    except Exception as e:
+        print(f"Error parsing command: {e}")
 
 def publish_status(device_id):
     """
@@ -67,42 +88,54 @@ def publish_status(device_id):
         device_id (str): 设备ID
     """
     topic = f"{device_prefix}/status/{device_id}"
-    payload = devices[device_id].to_dict()
-    client.publish(topic, json.dumps(payload))
-    print(f"Published status of {device_id} to {topic}: {payload}")
-
-# 连接到 MQTT Broker
-client.connect(broker_ip, broker_port, 60)
-client.on_message = on_message
-
-# 订阅所有设备的控制主题
-for device_id in devices:
-    control_topic = f"{device_prefix}/control/{device_id}"
-    client.subscribe(control_topic)
-    print(f"Subscribed to {control_topic}")
+    payload = devices[device_id].to_json()
+    client.publish(topic, payload)
+    print(f"Published status of {device_id} to {topic}: {payload.decode()}")
+
+def main():
+    """连接 MQTT Broker 并运行模拟循环（直到 Ctrl+C）"""
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(broker_ip, broker_port, 60)
+
+    client.loop_start()
+
+    # 每个设备每10秒发布一次状态，发布时间均匀错开
+    scheduler = PublishScheduler(interval=10, jitter=0.1, seed=derive_seed("scheduler"))
+    for device_id in devices:
+        scheduler.add(device_id)
+
+    # 模拟运行：时间和等待都来自模拟时钟（SIM_CLOCK），与发布调度器使用同一时钟
+    try:
+        next_tick = sim_clock.monotonic()
+        while True:
+            now = sim_clock.monotonic()
+            # 发布到期设备的状态
+            for device_id in scheduler.pop_due(now):
+                publish_status(device_id)
 
-client.loop_start()
+            if now >= next_tick:
+                # 模拟传感器数据变化（随机数流由运行种子派生，可通过 SIM_SEED 复现）
+                rng = stream("simulator")
+                if rng.random() < 0.3:  # 30%概率改变温度
+                    new_temp = round(rng.uniform(20, 30), 1)
+                    devices["thermostat-001"].update_current_temp(new_temp)
 
-# 模拟运行
-try:
-    while True:
-        # 定期发布状态
-        for device_id in devices:
-            publish_status(device_id)
+                if rng.random() < 0.1:  # 10%概率触发烟雾报警
+                    devices["smoke_detector-001"].trigger_alarm()
 
-        # 模拟传感器数据变化
-        if random.random() < 0.3:  # 30%概率改变温度
-            new_temp = round(random.uniform(20, 30), 1)
-            devices["thermostat-001"].update_current_temp(new_temp)
+                next_tick += 10  # 每10秒更新一次状态
 
-        if random.random() < 0.1:  # 10%概率触发烟雾报警
-            devices["smoke_detector-001"].trigger_alarm()
+            delay = min(next_tick, scheduler.next_due()) - sim_clock.monotonic()
+            if delay > 0:
+                sim_clock.sleep(delay)
 
-        time.sleep(10)  # 每10秒更新一次状态
+    except KeyboardInterrupt:
+        print("Stopping simulator...")
 
-except KeyboardInterrupt:
-    print("Stopping simulator...")
+    finally:
+        client.loop_stop()
+        client.disconnect()
 
-finally:
-    client.loop_stop()
-    client.disconnect()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
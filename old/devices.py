@@ -6,13 +6,150 @@
 """
 
 from abc import ABC, abstractmethod
-import json
-from typing import Dict, Any, Optional
+from enum import IntEnum
+from typing import Dict, Any, List, Optional, Tuple, Type
 from datetime import datetime
-import random
+from collections import deque
+import itertools
+import sys
+from .serialization import dumps
+from . import clock as sim_clock
+from .randomness import stream
+from .commands import CHOICE, FLOAT, INT, CommandError, CommandTable, Param, command
+
+class ThermostatMode(IntEnum):
+    """温控器运行模式"""
+    AUTO = 0
+    HEAT = 1
+    COOL = 2
+
+class AcMode(IntEnum):
+    """空调运行模式"""
+    COOL = 0
+    HEAT = 1
+    DRY = 2
+    FAN = 3
+
+class FanSpeed(IntEnum):
+    """温控器/空调风速"""
+    AUTO = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+def _enum_names(enum: Type[IntEnum]) -> tuple:
+    """枚举值到小写名称的映射表（按枚举值索引）"""
+    return tuple(sys.intern(member.name.lower()) for member in enum)
+
+def _enum_codes(enum: Type[IntEnum]) -> Dict[str, int]:
+    """小写名称到枚举值（小整数）的映射表"""
+    return {member.name.lower(): int(member) for member in enum}
+
+THERMOSTAT_MODES = _enum_names(ThermostatMode)
+AC_MODES = _enum_names(AcMode)
+FAN_SPEEDS = _enum_names(FanSpeed)
+_THERMOSTAT_MODE_CODES = _enum_codes(ThermostatMode)
+_AC_MODE_CODES = _enum_codes(AcMode)
+_FAN_SPEED_CODES = _enum_codes(FanSpeed)
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    """将时间戳格式化为ISO格式字符串，None 保持不变"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+class VersionCounter:
+    """
+    单调递增的版本计数器
+    
+    所有设备共用一个计数器：设备每次变化都取下一个版本号作为自己的版本，
+    计数器的当前值即集群版本。版本号大于某个集群版本的设备就是此后发生过变化的设备。
+    """
+    
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self.value = 0
+    
+    def next(self) -> int:
+        """取下一个版本号"""
+        # next() 在 GIL 下是原子操作，各线程拿到的版本号不会重复
+        version = next(self._counter)
+        if version > self.value:
+            self.value = version
+        return version
+    
+    def reserve(self, count: int) -> int:
+        """
+        一次取 count 个连续的版本号（用于向量化更新）
+        
+        Returns:
+            int: 其中最后一个版本号
+        """
+        # 在一次 C 调用中取完，其他线程不会插入其间，版本号是连续的
+        version = deque(itertools.islice(self._counter, count), maxlen=1)[0]
+        if version > self.value:
+            self.value = version
+        return version
+    
+    def advance(self, value: int) -> None:
+        """
+        把计数器推进到 value（恢复快照时使用，之后取到的版本号都大于快照中的版本）
+        
+        与 next() 并发调用时不保证原子性，应在设备开始变化之前调用。
+        """
+        if value > self.value:
+            self._counter = itertools.count(value + 1)
+            self.value = value
+
+# 设备集群版本
+FLEET_VERSION = VersionCounter()
 
 class BaseDevice(ABC):
-    """基础设备类，定义了所有设备共有的属性和方法"""
+    """
+    基础设备类，定义了所有设备共有的属性和方法
+    
+    为降低大规模设备集群的内存占用，所有设备类都使用 __slots__，
+    设备类型名称作为类属性共享，时间以浮点时间戳存储，仅在 to_dict 中格式化。
+    
+    状态字段的每次赋值都会经过 __setattr__ 记录变化（按字段的位掩码），
+    发布时只需输出自上次发布以来变化的字段。
+    to_dict 的结果及其 JSON 编码会被缓存，直到设备状态发生变化。
+    每次变化还会从 FLEET_VERSION 取一个新的版本号，用于条件请求和增量查询。
+    """
+    
+    __slots__ = ("device_id", "_cache", "_dirty", "_since_keyframe", "_version",
+                 "_last_update", "online", "error_state")
+    
+    # 设备类型名称（类属性，由 __init_subclass__ 设置并驻留）
+    type: str = ""
+    
+    # 不属于设备状态的内部属性，不参与变化跟踪
+    _UNTRACKED = frozenset(("device_id", "_cache", "_dirty", "_since_keyframe",
+                            "_version", "_table", "_row"))
+    
+    # 状态字段：属性名 -> 变化位；以及按位序排列的对外字段名
+    _FIELD_BITS: Dict[str, int] = {}
+    _FIELD_NAMES: Tuple[str, ...] = ()
+    
+    # 按设备类型的随机数流（由运行种子派生，由 __init_subclass__ 设置）
+    _rng = stream("device", "base")
+    
+    # 命令表（由 __init_subclass__ 从 @command 装饰的方法收集）
+    COMMANDS = CommandTable()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.type = sys.intern(cls.__name__.lower())
+        attrs = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get("__slots__", ()):
+                if name not in cls._UNTRACKED and name not in attrs:
+                    attrs.append(name)
+        cls._FIELD_BITS = {name: 1 << i for i, name in enumerate(attrs)}
+        # 以下划线开头的存储属性（如 _mode）对外字段名去掉下划线
+        cls._FIELD_NAMES = tuple(name.lstrip("_") for name in attrs)
+        cls.COMMANDS = CommandTable.collect(cls)
+        cls._rng = stream("device", cls.type)
     
     def __init__(self, device_id: str):
         """
@@ -22,25 +159,145 @@ class BaseDevice(ABC):
             device_id (str): 设备唯一标识符
         """
         self.device_id = device_id
-        self.type = self.__class__.__name__.lower()
-        self.last_update = datetime.now()
+        self._cache = None
+        self._dirty = 0
+        self._since_keyframe = 0
+        self._version = 0
+        self._last_update = sim_clock.now()
         self.online = True
         self.error_state = None
     
+    def __setattr__(self, name: str, value: Any) -> None:
+        bit = self._FIELD_BITS.get(name)
+        if bit is not None:
+            try:
+                changed = getattr(self, name) != value
+            except AttributeError:
+                changed = True
+            if changed:
+                self._touch(bit)
+        object.__setattr__(self, name, value)
+    
+    def _touch(self, bits: int) -> None:
+        """记录状态字段变化（bits 为字段变化位的组合），更新版本号并使序列化缓存失效"""
+        object.__setattr__(self, "_dirty", self._dirty | bits)
+        object.__setattr__(self, "_cache", None)
+        object.__setattr__(self, "_version", FLEET_VERSION.next())
+    
+    @classmethod
+    def field_bits(cls, fields) -> int:
+        """
+        计算一组字段的变化位掩码
+        
+        Args:
+            fields: 存储属性名（如 "current_temp"、"_last_update"）
+        
+        Returns:
+            int: 位掩码
+        """
+        bits = 0
+        for name in fields:
+            bits |= cls._FIELD_BITS[name]
+        return bits
+    
+    @property
+    def version(self) -> int:
+        """设备版本号（最近一次变化时的集群版本）"""
+        return self._version
+    
+    @property
+    def last_update(self) -> datetime:
+        """最后更新时间"""
+        return datetime.fromtimestamp(self._last_update)
+    
+    def dirty_fields(self) -> List[str]:
+        """
+        获取自上次发布以来变化的字段
+        
+        Returns:
+            List[str]: 变化字段名（与 to_dict 的键一致）
+        """
+        dirty = self._dirty
+        return [name for i, name in enumerate(self._FIELD_NAMES) if dirty >> i & 1]
+    
+    def mark_dirty(self, fields) -> None:
+        """
+        将字段标记为已变化，用于绕过属性赋值的批量更新（如列式存储的向量化节拍）
+        
+        Args:
+            fields: 存储属性名（如 "current_temp"、"_last_update"）
+        """
+        self._touch(self.field_bits(fields))
+    
+    def request_keyframe(self) -> None:
+        """要求下一次发布输出完整关键帧"""
+        object.__setattr__(self, "_since_keyframe", 0)
+    
+    def take_status(self, keyframe_interval: int = 0) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        生成待发布的状态并清除变化标记
+        
+        每 keyframe_interval 次发布（以及首次发布或 request_keyframe 之后）
+        输出一次完整关键帧，其余情况只输出变化字段。
+        
+        Args:
+            keyframe_interval (int): 关键帧间隔（发布次数），0 表示只在请求时输出关键帧
+        
+        Returns:
+            Tuple[bool, Optional[Dict[str, Any]]]: (是否关键帧, 状态字典)；
+            非关键帧且没有变化时状态字典为 None
+        """
+        keyframe = self._since_keyframe == 0
+        since = self._since_keyframe + 1
+        if keyframe_interval:
+            since %= keyframe_interval
+        object.__setattr__(self, "_since_keyframe", since)
+        
+        if keyframe:
+            object.__setattr__(self, "_dirty", 0)
+            return True, self.to_dict()
+        if not self._dirty:
+            return False, None
+        state = self.to_dict()
+        delta = {name: state[name] for name in self.dirty_fields()}
+        object.__setattr__(self, "_dirty", 0)
+        return False, delta
+    
     def to_dict(self) -> Dict[str, Any]:
         """
         将设备状态转换为字典格式
         
+        结果在设备状态变化前会被缓存复用，调用方不应修改返回的字典。
+        
         Returns:
             Dict[str, Any]: 包含设备状态的字典
         """
-        return {
-            "type": self.type,
-            "online": self.online,
-            "last_update": self.last_update.isoformat(),
-            "error_state": self.error_state,
-            **self.get_state()
-        }
+        cache = self._cache
+        if cache is None:
+            cache = [{
+                "type": self.type,
+                "online": self.online,
+                "last_update": _iso(self._last_update),
+                "error_state": self.error_state,
+                **self.get_state()
+            }, None]
+            object.__setattr__(self, "_cache", cache)
+        return cache[0]
+    
+    def to_json(self) -> bytes:
+        """
+        将设备状态编码为 JSON
+        
+        编码结果与 to_dict 一同缓存，发布循环和 Web 接口共享同一份 bytes。
+        
+        Returns:
+            bytes: UTF-8 编码的 JSON
+        """
+        state = self.to_dict()
+        cache = self._cache
+        if cache[1] is None:
+            cache[1] = dumps(state)
+        return cache[1]
     
     @abstractmethod
     def get_state(self) -> Dict[str, Any]:
@@ -52,21 +309,27 @@ class BaseDevice(ABC):
         """
         pass
     
-    @abstractmethod
     def handle_command(self, command: Dict[str, Any]) -> None:
         """
         处理设备控制命令
         
+        命令通过类的命令表分发；未知命令或无效参数不会修改设备状态，
+        只记录在 error_state 中。
+        
         Args:
             command (Dict[str, Any]): 控制命令字典
         """
-        pass
+        try:
+            self.COMMANDS.apply(self, command)
+        except CommandError as e:
+            self.error_state = str(e)
+        self.update_status()
     
     def update_status(self):
         """更新设备状态时间戳"""
-        self.last_update = datetime.now()
+        self._last_update = sim_clock.now()
         # 模拟设备偶尔离线
-        if random.random() < 0.01:  # 1%的概率设备离线
+        if self._rng.random() < 0.01:  # 1%的概率设备离线
             self.online = False
             self.error_state = "设备连接异常"
         else:
@@ -76,6 +339,8 @@ class BaseDevice(ABC):
 class Light(BaseDevice):
     """智能灯设备类"""
     
+    __slots__ = ("state", "brightness", "color_temp", "power_consumption")
+    
     def __init__(self, device_id: str):
         """
         初始化智能灯设备
@@ -97,33 +362,35 @@ class Light(BaseDevice):
             "power_consumption": self.power_consumption
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "turn_on":
-            self.state = "on"
-            self.power_consumption = self.brightness * 0.1  # 模拟功率消耗
-        elif cmd_type == "turn_off":
-            self.state = "off"
-            self.power_consumption = 0
-        elif cmd_type == "set_brightness":
-            try:
-                brightness = int(command.get("brightness", 100))
-                self.brightness = max(0, min(100, brightness))
-                if self.state == "on":
-                    self.power_consumption = self.brightness * 0.1
-            except (ValueError, TypeError):
-                self.error_state = "无效的亮度值"
-        elif cmd_type == "set_color_temp":
-            try:
-                temp = int(command.get("color_temp", 4000))
-                self.color_temp = max(2700, min(6500, temp))
-            except (ValueError, TypeError):
-                self.error_state = "无效的色温值"
-        self.update_status()
+    @command("turn_on", description="开灯")
+    def _turn_on(self) -> None:
+        self.state = "on"
+        self.power_consumption = self.brightness * 0.1  # 模拟功率消耗
+    
+    @command("turn_off", description="关灯")
+    def _turn_off(self) -> None:
+        self.state = "off"
+        self.power_consumption = 0
+    
+    @command("set_brightness",
+             Param("brightness", INT, 100, 0, 100, error="无效的亮度值", description="亮度（%）"),
+             description="设置亮度")
+    def _set_brightness(self, brightness: int) -> None:
+        self.brightness = brightness
+        if self.state == "on":
+            self.power_consumption = self.brightness * 0.1
+    
+    @command("set_color_temp",
+             Param("color_temp", INT, 4000, 2700, 6500, error="无效的色温值", description="色温（K）"),
+             description="设置色温")
+    def _set_color_temp(self, color_temp: int) -> None:
+        self.color_temp = color_temp
 
 class Thermostat(BaseDevice):
     """温控器设备类"""
     
+    __slots__ = ("current_temp", "target_temp", "humidity", "_mode", "_fan_speed")
+    
     def __init__(self, device_id: str):
         """
         初始化温控器设备
@@ -135,8 +402,26 @@ class Thermostat(BaseDevice):
         self.current_temp = 22
         self.target_temp = 24
         self.humidity = 50
-        self.mode = "auto"  # auto, heat, cool
-        self.fan_speed = "auto"  # auto, low, medium, high
+        self._mode = ThermostatMode.AUTO.value  # auto, heat, cool
+        self._fan_speed = FanSpeed.AUTO.value  # auto, low, medium, high
+    
+    @property
+    def mode(self) -> str:
+        """运行模式"""
+        return THERMOSTAT_MODES[self._mode]
+    
+    @mode.setter
+    def mode(self, value: str) -> None:
+        self._mode = _THERMOSTAT_MODE_CODES[value]
+    
+    @property
+    def fan_speed(self) -> str:
+        """风速设置"""
+        return FAN_SPEEDS[self._fan_speed]
+    
+    @fan_speed.setter
+    def fan_speed(self, value: str) -> None:
+        self._fan_speed = _FAN_SPEED_CODES[value]
     
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -147,38 +432,36 @@ class Thermostat(BaseDevice):
             "fan_speed": self.fan_speed
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "set_target_temp":
-            try:
-                temp = float(command.get("temperature", 24))
-                self.target_temp = max(16, min(30, temp))
-            except (ValueError, TypeError):
-                self.error_state = "无效的温度值"
-        elif cmd_type == "set_mode":
-            mode = command.get("mode", "auto")
-            if mode in ["auto", "heat", "cool"]:
-                self.mode = mode
-            else:
-                self.error_state = "无效的模式"
-        elif cmd_type == "set_fan_speed":
-            speed = command.get("speed", "auto")
-            if speed in ["auto", "low", "medium", "high"]:
-                self.fan_speed = speed
-            else:
-                self.error_state = "无效的风速"
-        self.update_status()
+    @command("set_target_temp",
+             Param("temperature", FLOAT, 24, 16, 30, error="无效的温度值", description="目标温度（℃）"),
+             description="设置目标温度")
+    def _set_target_temp(self, temperature: float) -> None:
+        self.target_temp = temperature
+    
+    @command("set_mode",
+             Param("mode", CHOICE, "auto", choices=THERMOSTAT_MODES, error="无效的模式"),
+             description="设置运行模式")
+    def _set_mode(self, mode: str) -> None:
+        self.mode = mode
+    
+    @command("set_fan_speed",
+             Param("speed", CHOICE, "auto", choices=FAN_SPEEDS, error="无效的风速"),
+             description="设置风速")
+    def _set_fan_speed(self, speed: str) -> None:
+        self.fan_speed = speed
     
     def update_current_temp(self, temp: float) -> None:
         """更新当前温度和湿度"""
         self.current_temp = temp
         # 模拟湿度变化
-        self.humidity = max(30, min(80, self.humidity + random.uniform(-2, 2)))
+        self.humidity = max(30, min(80, self.humidity + self._rng.uniform(-2, 2)))
         self.update_status()
 
 class DoorLock(BaseDevice):
     """智能门锁设备类"""
     
+    __slots__ = ("locked", "battery_level", "_last_lock_time", "_last_unlock_time")
+    
     def __init__(self, device_id: str):
         """
         初始化智能门锁设备
@@ -189,8 +472,18 @@ class DoorLock(BaseDevice):
         super().__init__(device_id)
         self.locked = True
         self.battery_level = 100
-        self.last_lock_time = None
-        self.last_unlock_time = None
+        self._last_lock_time = None
+        self._last_unlock_time = None
+    
+    @property
+    def last_lock_time(self) -> Optional[str]:
+        """最后上锁时间"""
+        return _iso(self._last_lock_time)
+    
+    @property
+    def last_unlock_time(self) -> Optional[str]:
+        """最后解锁时间"""
+        return _iso(self._last_unlock_time)
     
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -200,21 +493,23 @@ class DoorLock(BaseDevice):
             "last_unlock_time": self.last_unlock_time
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "lock":
-            self.locked = True
-            self.last_lock_time = datetime.now().isoformat()
-            self.battery_level = max(0, self.battery_level - 0.1)
-        elif cmd_type == "unlock":
-            self.locked = False
-            self.last_unlock_time = datetime.now().isoformat()
-            self.battery_level = max(0, self.battery_level - 0.1)
-        self.update_status()
+    @command("lock", description="上锁")
+    def _lock(self) -> None:
+        self.locked = True
+        self._last_lock_time = sim_clock.now()
+        self.battery_level = max(0, self.battery_level - 0.1)
+    
+    @command("unlock", description="解锁")
+    def _unlock(self) -> None:
+        self.locked = False
+        self._last_unlock_time = sim_clock.now()
+        self.battery_level = max(0, self.battery_level - 0.1)
 
 class Blind(BaseDevice):
     """智能窗帘设备类"""
     
+    __slots__ = ("position", "tilt", "moving", "_last_move_time")
+    
     def __init__(self, device_id: str):
         """
         初始化智能窗帘设备
@@ -226,7 +521,12 @@ class Blind(BaseDevice):
         self.position = 0  # 0-100%
         self.tilt = 0  # 0-180度
         self.moving = False
-        self.last_move_time = None
+        self._last_move_time = None
+    
+    @property
+    def last_move_time(self) -> Optional[str]:
+        """最后移动时间"""
+        return _iso(self._last_move_time)
     
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -236,37 +536,39 @@ class Blind(BaseDevice):
             "last_move_time": self.last_move_time
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "open":
-            self.position = 100
-            self.moving = True
-        elif cmd_type == "close":
-            self.position = 0
-            self.moving = True
-        elif cmd_type == "set_position":
-            try:
-                position = int(command.get("position", 0))
-                self.position = max(0, min(100, position))
-                self.moving = True
-            except (ValueError, TypeError):
-                self.error_state = "无效的位置值"
-        elif cmd_type == "set_tilt":
-            try:
-                tilt = int(command.get("tilt", 0))
-                self.tilt = max(0, min(180, tilt))
-            except (ValueError, TypeError):
-                self.error_state = "无效的倾斜角度"
-        
-        if self.moving:
-            self.last_move_time = datetime.now().isoformat()
-            # 模拟移动完成
-            self.moving = False
-        self.update_status()
+    def _move_to(self, position: int) -> None:
+        """移动到指定位置"""
+        self.position = position
+        self.moving = True
+        self._last_move_time = sim_clock.now()
+        # 模拟移动完成
+        self.moving = False
+    
+    @command("open", description="完全打开")
+    def _open(self) -> None:
+        self._move_to(100)
+    
+    @command("close", description="完全关闭")
+    def _close(self) -> None:
+        self._move_to(0)
+    
+    @command("set_position",
+             Param("position", INT, 0, 0, 100, error="无效的位置值", description="打开程度（%）"),
+             description="设置位置")
+    def _set_position(self, position: int) -> None:
+        self._move_to(position)
+    
+    @command("set_tilt",
+             Param("tilt", INT, 0, 0, 180, error="无效的倾斜角度", description="百叶角度（度）"),
+             description="设置倾斜角度")
+    def _set_tilt(self, tilt: int) -> None:
+        self.tilt = tilt
 
 class AirConditioner(BaseDevice):
     """空调设备类"""
     
+    __slots__ = ("on", "temp", "_mode", "_fan_speed", "swing", "power_consumption")
+    
     def __init__(self, device_id: str):
         """
         初始化空调设备
@@ -277,11 +579,29 @@ class AirConditioner(BaseDevice):
         super().__init__(device_id)
         self.on = False
         self.temp = 26
-        self.mode = "cool"  # cool, heat, dry, fan
-        self.fan_speed = "auto"  # auto, low, medium, high
+        self._mode = AcMode.COOL.value  # cool, heat, dry, fan
+        self._fan_speed = FanSpeed.AUTO.value  # auto, low, medium, high
         self.swing = False
         self.power_consumption = 0
     
+    @property
+    def mode(self) -> str:
+        """运行模式"""
+        return AC_MODES[self._mode]
+    
+    @mode.setter
+    def mode(self, value: str) -> None:
+        self._mode = _AC_MODE_CODES[value]
+    
+    @property
+    def fan_speed(self) -> str:
+        """风速设置"""
+        return FAN_SPEEDS[self._fan_speed]
+    
+    @fan_speed.setter
+    def fan_speed(self, value: str) -> None:
+        self._fan_speed = _FAN_SPEED_CODES[value]
+    
     def get_state(self) -> Dict[str, Any]:
         return {
             "on": self.on,
@@ -292,39 +612,43 @@ class AirConditioner(BaseDevice):
             "power_consumption": self.power_consumption
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "turn_on":
-            self.on = True
-            self.power_consumption = 1000  # 模拟功率消耗
-        elif cmd_type == "turn_off":
-            self.on = False
-            self.power_consumption = 0
-        elif cmd_type == "set_temp":
-            try:
-                temp = float(command.get("temp", 26))
-                self.temp = max(16, min(30, temp))
-            except (ValueError, TypeError):
-                self.error_state = "无效的温度值"
-        elif cmd_type == "set_mode":
-            mode = command.get("mode", "cool")
-            if mode in ["cool", "heat", "dry", "fan"]:
-                self.mode = mode
-            else:
-                self.error_state = "无效的模式"
-        elif cmd_type == "set_fan_speed":
-            speed = command.get("fan_speed", "auto")
-            if speed in ["auto", "low", "medium", "high"]:
-                self.fan_speed = speed
-            else:
-                self.error_state = "无效的风速"
-        elif cmd_type == "toggle_swing":
-            self.swing = not self.swing
-        self.update_status()
+    @command("turn_on", description="开机")
+    def _turn_on(self) -> None:
+        self.on = True
+        self.power_consumption = 1000  # 模拟功率消耗
+    
+    @command("turn_off", description="关机")
+    def _turn_off(self) -> None:
+        self.on = False
+        self.power_consumption = 0
+    
+    @command("set_temp",
+             Param("temp", FLOAT, 26, 16, 30, error="无效的温度值", description="设定温度（℃）"),
+             description="设置温度")
+    def _set_temp(self, temp: float) -> None:
+        self.temp = temp
+    
+    @command("set_mode",
+             Param("mode", CHOICE, "cool", choices=AC_MODES, error="无效的模式"),
+             description="设置运行模式")
+    def _set_mode(self, mode: str) -> None:
+        self.mode = mode
+    
+    @command("set_fan_speed",
+             Param("fan_speed", CHOICE, "auto", choices=FAN_SPEEDS, error="无效的风速"),
+             description="设置风速")
+    def _set_fan_speed(self, fan_speed: str) -> None:
+        self.fan_speed = fan_speed
+    
+    @command("toggle_swing", description="切换扫风")
+    def _toggle_swing(self) -> None:
+        self.swing = not self.swing
 
 class SmokeDetector(BaseDevice):
     """烟雾报警器设备类"""
     
+    __slots__ = ("alarm", "battery_level", "smoke_level", "_last_test_time")
+    
     def __init__(self, device_id: str):
         """
         初始化烟雾报警器设备
@@ -336,7 +660,12 @@ class SmokeDetector(BaseDevice):
         self.alarm = False
         self.battery_level = 100
         self.smoke_level = 0  # 0-100
-        self.last_test_time = None
+        self._last_test_time = None
+    
+    @property
+    def last_test_time(self) -> Optional[str]:
+        """最后测试时间"""
+        return _iso(self._last_test_time)
     
     def get_state(self) -> Dict[str, Any]:
         return {
@@ -346,25 +675,27 @@ class SmokeDetector(BaseDevice):
             "last_test_time": self.last_test_time
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "reset":
-            self.alarm = False
-            self.smoke_level = 0
-        elif cmd_type == "test":
-            self.last_test_time = datetime.now().isoformat()
-            self.battery_level = max(0, self.battery_level - 0.5)
-        self.update_status()
+    @command("reset", description="复位报警")
+    def _reset(self) -> None:
+        self.alarm = False
+        self.smoke_level = 0
+    
+    @command("test", description="自检")
+    def _test(self) -> None:
+        self._last_test_time = sim_clock.now()
+        self.battery_level = max(0, self.battery_level - 0.5)
     
     def trigger_alarm(self) -> None:
         """触发烟雾报警"""
         self.alarm = True
-        self.smoke_level = random.randint(50, 100)
+        self.smoke_level = self._rng.randint(50, 100)
         self.update_status()
 
 class Fan(BaseDevice):
     """风扇设备类"""
     
+    __slots__ = ("on", "speed", "oscillate", "timer", "power_consumption")
+    
     def __init__(self, device_id: str):
         """
         初始化风扇设备
@@ -388,35 +719,39 @@ class Fan(BaseDevice):
             "power_consumption": self.power_consumption
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "turn_on":
-            self.on = True
-            self.power_consumption = self.speed * 20  # 模拟功率消耗
-        elif cmd_type == "turn_off":
-            self.on = False
-            self.power_consumption = 0
-        elif cmd_type == "set_speed":
-            try:
-                speed = int(command.get("speed", 1))
-                self.speed = max(1, min(3, speed))
-                if self.on:
-                    self.power_consumption = self.speed * 20
-            except (ValueError, TypeError):
-                self.error_state = "无效的风速值"
-        elif cmd_type == "toggle_oscillate":
-            self.oscillate = not self.oscillate
-        elif cmd_type == "set_timer":
-            try:
-                timer = int(command.get("minutes", 0))
-                self.timer = max(0, min(120, timer))
-            except (ValueError, TypeError):
-                self.error_state = "无效的定时值"
-        self.update_status()
+    @command("turn_on", description="开启")
+    def _turn_on(self) -> None:
+        self.on = True
+        self.power_consumption = self.speed * 20  # 模拟功率消耗
+    
+    @command("turn_off", description="关闭")
+    def _turn_off(self) -> None:
+        self.on = False
+        self.power_consumption = 0
+    
+    @command("set_speed",
+             Param("speed", INT, 1, 1, 3, error="无效的风速值", description="风速档位"),
+             description="设置风速")
+    def _set_speed(self, speed: int) -> None:
+        self.speed = speed
+        if self.on:
+            self.power_consumption = self.speed * 20
+    
+    @command("toggle_oscillate", description="切换摇头")
+    def _toggle_oscillate(self) -> None:
+        self.oscillate = not self.oscillate
+    
+    @command("set_timer",
+             Param("minutes", INT, 0, 0, 120, error="无效的定时值", description="定时关闭（分钟）"),
+             description="设置定时")
+    def _set_timer(self, minutes: int) -> None:
+        self.timer = minutes
 
 class Plug(BaseDevice):
     """智能插座设备类"""
     
+    __slots__ = ("on", "power_consumption", "voltage", "current", "power_factor", "timer")
+    
     def __init__(self, device_id: str):
         """
         初始化智能插座设备
@@ -442,20 +777,32 @@ class Plug(BaseDevice):
             "timer": self.timer
         }
     
-    def handle_command(self, command: Dict[str, Any]) -> None:
-        cmd_type = command.get("command")
-        if cmd_type == "turn_on":
-            self.on = True
-            self.power_consumption = random.uniform(50, 200)  # 模拟功率消耗
-            self.current = self.power_consumption / self.voltage
-        elif cmd_type == "turn_off":
-            self.on = False
-            self.power_consumption = 0
-            self.current = 0
-        elif cmd_type == "set_timer":
-            try:
-                timer = int(command.get("minutes", 0))
-                self.timer = max(0, min(120, timer))
-            except (ValueError, TypeError):
-                self.error_state = "无效的定时值"
-        self.update_status() 
\ No newline at end of file
+    @command("turn_on", description="通电")
+    def _turn_on(self) -> None:
+        self.on = True
+        self.power_consumption = self._rng.uniform(50, 200)  # 模拟功率消耗
+        self.current = self.power_consumption / self.voltage
+    
+    @command("turn_off", description="断电")
+    def _turn_off(self) -> None:
+        self.on = False
+        self.power_consumption = 0
+        self.current = 0
+    
+    @command("set_timer",
+             Param("minutes", INT, 0, 0, 120, error="无效的定时值", description="定时关闭（分钟）"),
+             description="设置定时")
+    def _set_timer(self, minutes: int) -> None:
+        self.timer = minutes
+
+# 设备类型映射（REST API 中使用的类型名 -> 设备类）
+DEVICE_TYPES = {
+    "light": Light,
+    "thermostat": Thermostat,
+    "doorlock": DoorLock,
+    "blind": Blind,
+    "ac": AirConditioner,
+    "smoke_detector": SmokeDetector,
+    "fan": Fan,
+    "plug": Plug
+}
@@ -0,0 +1,263 @@
+"""
+房间热环境模型
+
+温控器的当前温度原来每个节拍随机取 20-30℃，与目标温度、运行模式以及同一房间的空调都无关，
+下游的控制回路无法用它测试。本模块为每个房间维护温度和湿度，每个节拍对所有房间做一次向量化积分：
+- 房间温度以房间自身的时间常数向室外温度弛豫（室外温度按一天的正弦曲线变化）
+- 温控器和开机的空调按设定值与房间温度之差做比例加热或制冷，同一房间的多台设备叠加
+- 相对湿度随房间温度变化（升温下降、降温上升），制冷和除湿模式冷凝除湿，湿度同时向室外湿度弛豫
+- 积分步长不超过 MAX_STEP 秒，长时间间隔拆成多个子步，温度曲线保持平滑
+
+设备通过 FleetStore.add 的 room 参数加入房间，未指定时温控器和空调各自独占一个以设备ID命名的房间。
+房间成员关系保存在温控器和空调列存储表的 _room 列中（房间编号，-1 表示不属于任何房间）。
+每个房间记录成员数，最后一台设备移除时房间被删除，编号留给之后新建的房间复用。
+"""
+
+from typing import Dict, List, Optional, Type
+import math
+
+import numpy as np
+
+from .devices import (
+    BaseDevice, Thermostat, AirConditioner, ThermostatMode, AcMode
+)
+from .randomness import generator
+
+# 单个积分子步的最长时间（秒）
+MAX_STEP = 30.0
+
+# 满负荷时的加热/制冷速率（℃/秒，约每10分钟4℃）
+HVAC_RATE = 4.0 / 600
+# 比例控制带宽（℃）：设定值与房间温度相差超过带宽时满负荷运行
+CONTROL_BAND = 1.0
+# 按风速的出力系数（按 FanSpeed 枚举值索引：auto, low, medium, high）
+FAN_OUTPUT = np.array([1.0, 0.5, 0.75, 1.0])
+
+# 含湿量不变时，温度每升高1℃相对湿度下降的百分点（降温时相应上升）
+RH_PER_DEGREE = 3.0
+# 满负荷制冷的除湿速率（%/秒，冷凝除湿）与除湿模式的除湿速率
+COOLING_DRYING = 3.0 / 600
+DRY_MODE_DRYING = 5.0 / 600
+HUMIDITY_RANGE = (10.0, 95.0)
+
+
+class ThermalModel:
+    """所有房间的温湿度状态及其向量化积分"""
+
+    def __init__(self, outdoor_temp: float = 18.0, outdoor_amplitude: float = 6.0,
+                 outdoor_humidity: float = 60.0, seed: Optional[int] = None,
+                 capacity: int = 1024):
+        """
+        初始化热环境模型
+
+        Args:
+            outdoor_temp (float): 室外日平均温度（℃）
+            outdoor_amplitude (float): 室外温度日变化幅度（℃），最低在3点、最高在15点（UTC）
+            outdoor_humidity (float): 室外相对湿度（%）
+            seed (Optional[int]): 房间参数的随机数种子，默认使用运行种子
+            capacity (int): 初始房间容量
+        """
+        self.outdoor_temp = outdoor_temp
+        self.outdoor_amplitude = outdoor_amplitude
+        self.outdoor_humidity = outdoor_humidity
+        self.rooms: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []  # 按房间编号排列的房间名，None 表示空闲编号
+        self.size = 0  # 已使用过的最大房间编号 + 1
+        self.temp = np.zeros(capacity)
+        self.humidity = np.zeros(capacity)
+        self.tau = np.zeros(capacity)  # 房间向室外弛豫的时间常数（秒）
+        self.members = np.zeros(capacity, dtype=np.int64)  # 各房间的设备数
+        self._free: List[int] = []
+        self.last_step: Optional[float] = None
+        self._rng = generator("environment", seed=seed)
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def outdoor(self, now: float) -> float:
+        """某一时刻的室外温度"""
+        phase = (now % 86400 - 9 * 3600) / 86400
+        return self.outdoor_temp + self.outdoor_amplitude * math.sin(2 * math.pi * phase)
+
+    def room(self, name: str, temp: Optional[float] = None,
+             humidity: Optional[float] = None) -> int:
+        """
+        获取房间编号，房间不存在时创建
+
+        Args:
+            name (str): 房间名
+            temp (Optional[float]): 新房间的初始温度，默认为室外日平均温度
+            humidity (Optional[float]): 新房间的初始湿度，默认为室外湿度
+
+        Returns:
+            int: 房间编号
+        """
+        index = self.rooms.get(name)
+        if index is not None:
+            return index
+        if self._free:
+            index = self._free.pop()
+            self.names[index] = name
+        else:
+            index = self.size
+            self.reserve(index + 1)
+            self.size += 1
+            self.names.append(name)
+        self.temp[index] = self.outdoor_temp if temp is None else temp
+        self.humidity[index] = self.outdoor_humidity if humidity is None else humidity
+        # 房间保温性能各不相同：时间常数 2-6 小时
+        self.tau[index] = self._rng.uniform(7200, 21600)
+        self.rooms[name] = index
+        return index
+
+    def join(self, rooms: np.ndarray) -> None:
+        """
+        把设备计入房间成员数
+
+        Args:
+            rooms (np.ndarray): 各设备的房间编号，-1 表示不属于任何房间
+        """
+        rooms = np.asarray(rooms)
+        np.add.at(self.members, rooms[rooms >= 0], 1)
+
+    def leave(self, index: int) -> None:
+        """
+        设备离开房间，最后一台设备离开时删除房间并释放编号
+
+        Args:
+            index (int): 房间编号
+        """
+        self.members[index] -= 1
+        if self.members[index]:
+            return
+        del self.rooms[self.names[index]]
+        self.names[index] = None
+        # 空闲编号的温湿度不再参与温控器读数，弛豫时间常数置为无穷，积分时保持不变
+        self.tau[index] = np.inf
+        self._free.append(index)
+
+    def room_state(self, name: str) -> Dict[str, float]:
+        """房间当前的温度和湿度"""
+        index = self.rooms[name]
+        return {"temp": float(self.temp[index]), "humidity": float(self.humidity[index])}
+
+    def reserve(self, count: int) -> None:
+        """确保至少能容纳 count 个房间"""
+        while self.temp.size < count:
+            self._grow()
+
+    def load(self, rooms: List[Optional[str]], arrays: Dict[str, np.ndarray],
+             last_step: Optional[float]) -> None:
+        """
+        装入整批房间（恢复快照时使用）
+
+        成员数不在快照中保存，由调用方装入设备后通过 join 重新计入。
+
+        Args:
+            rooms (List[Optional[str]]): 房间名，按房间编号排列，None 表示空闲编号
+            arrays (Dict[str, np.ndarray]): temp、humidity、tau 各房间的取值
+            last_step (Optional[float]): 上次积分的时间戳
+        """
+        count = len(rooms)
+        self.reserve(count)
+        for name, values in arrays.items():
+            getattr(self, name)[:count] = values
+        self.members[:] = 0
+        self.names = list(rooms)
+        self.size = count
+        self.rooms = {name: index for index, name in enumerate(rooms) if name is not None}
+        self._free = [index for index, name in enumerate(rooms) if name is None]
+        self.last_step = last_step
+
+    def _grow(self) -> None:
+        """容量翻倍"""
+        for name in ("temp", "humidity", "tau", "members"):
+            array = getattr(self, name)
+            grown = np.zeros(array.size * 2, dtype=array.dtype)
+            grown[:array.size] = array
+            setattr(self, name, grown)
+
+    def step(self, tables: Dict[Type[BaseDevice], "TypeTable"], now: float) -> Optional[np.ndarray]:
+        """
+        积分到 now 时刻，并把房间温湿度写入温控器的读数
+
+        Args:
+            tables: FleetStore 的设备类型到列存储表的映射
+            now (float): 当前时间戳
+
+        Returns:
+            Optional[np.ndarray]: 读数发生变化的温控器行号，没有温控器表时为 None
+        """
+        last, self.last_step = self.last_step, now
+        count = self.size
+        if count and last is not None and now > last:
+            elapsed = now - last
+            substeps = max(1, math.ceil(elapsed / MAX_STEP))
+            dt = elapsed / substeps
+            for i in range(substeps):
+                self._integrate(tables, last + (i + 1) * dt, dt, count)
+
+        table = tables.get(Thermostat)
+        if table is None:
+            return None
+        rows, rooms = _members(table)
+        cols = table.arrays
+        temp = np.round(self.temp[rooms], 1)
+        humidity = np.round(self.humidity[rooms], 1)
+        changed = (cols["current_temp"][rows] != temp) | (cols["humidity"][rows] != humidity)
+        rows = rows[changed]
+        cols["current_temp"][rows] = temp[changed]
+        cols["humidity"][rows] = humidity[changed]
+        return rows
+
+    def _integrate(self, tables, now: float, dt: float, count: int) -> None:
+        """对所有房间积分一个子步"""
+        temp = self.temp[:count]
+        humidity = self.humidity[:count]
+        heating = np.zeros(count)  # 各房间的加热(+)/制冷(-)出力（℃/秒）
+        drying = np.zeros(count)  # 各房间的除湿速率（%/秒）
+
+        table = tables.get(Thermostat)
+        if table is not None and len(table):
+            rows, rooms = _members(table)
+            cols = table.arrays
+            mode = cols["_mode"][rows]
+            error = cols["target_temp"][rows] - temp[rooms]
+            heat = np.clip(error / CONTROL_BAND, 0, 1) * (mode != ThermostatMode.COOL)
+            cool = np.clip(-error / CONTROL_BAND, 0, 1) * (mode != ThermostatMode.HEAT)
+            output = FAN_OUTPUT[cols["_fan_speed"][rows]] * HVAC_RATE
+            heating += np.bincount(rooms, (heat - cool) * output, count)
+            drying += np.bincount(rooms, cool * COOLING_DRYING, count)
+
+        table = tables.get(AirConditioner)
+        if table is not None and len(table):
+            rows, rooms = _members(table)
+            cols = table.arrays
+            on = cols["on"][rows]
+            rows, rooms = rows[on], rooms[on]
+            mode = cols["_mode"][rows]
+            error = cols["temp"][rows] - temp[rooms]
+            heat = np.clip(error / CONTROL_BAND, 0, 1) * (mode == AcMode.HEAT)
+            cool = np.clip(-error / CONTROL_BAND, 0, 1) * (mode == AcMode.COOL)
+            # 除湿模式以较小出力制冷，送风模式不改变温度
+            cool = cool + 0.3 * np.clip(-error / CONTROL_BAND, 0, 1) * (mode == AcMode.DRY)
+            output = FAN_OUTPUT[cols["_fan_speed"][rows]] * HVAC_RATE
+            heating += np.bincount(rooms, (heat - cool) * output, count)
+            drying += np.bincount(rooms, cool * COOLING_DRYING
+                                  + (mode == AcMode.DRY) * DRY_MODE_DRYING, count)
+
+        # 向室外状态弛豫用指数形式，步长较大时也不会越过平衡点
+        relax = -np.expm1(-dt / self.tau[:count])
+        change = (self.outdoor(now) - temp) * relax + heating * dt
+        temp += change
+        humidity += ((self.outdoor_humidity - humidity) * relax
+                     - RH_PER_DEGREE * change - drying * dt)
+        np.clip(humidity, *HUMIDITY_RANGE, out=humidity)
+
+
+def _members(table) -> tuple:
+    """表中属于某个房间的在用行及其房间编号"""
+    rows = table.live_rows()
+    rooms = table.arrays["_room"][rows]
+    member = rooms >= 0
+    return rows[member], rooms[member]
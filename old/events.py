@@ -0,0 +1,135 @@
+"""
+设备状态事件推送模块
+
+Web 仪表盘原来定时轮询 /api/devices，每次轮询都要序列化整个设备集群，
+服务器开销与"设备数 × 打开的页面数"成正比。本模块把状态变化推送给
+Server-Sent Events 订阅者：
+- 状态与发布 MQTT 时来自同一处（publish_status），已编码的 JSON 直接复用
+- 设备状态未变化时（缓存的编码结果是同一个对象）不推送
+- 每个订阅者维护一个按设备合并的待发送表：慢速客户端只会收到每个设备的最新状态，
+  内存占用以设备数为上限，不会无限堆积
+"""
+
+from typing import Dict, Iterator, Optional, Set
+import threading
+import time
+
+from .serialization import dumps, join_object
+
+
+class Subscriber:
+    """一个事件流订阅者（对应一个浏览器连接）"""
+
+    def __init__(self):
+        self._pending: Dict[str, Optional[bytes]] = {}  # 设备ID -> 最新状态，None 表示已删除
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def push(self, device_id: str, payload: Optional[bytes]) -> None:
+        """登记设备的最新状态（覆盖尚未发送的旧状态）"""
+        with self._cond:
+            self._pending[device_id] = payload
+            self._cond.notify()
+
+    def take(self, timeout: float) -> Dict[str, Optional[bytes]]:
+        """等待并取出所有待发送的状态，超时返回空表"""
+        with self._cond:
+            if not self._pending and not self.closed:
+                self._cond.wait(timeout)
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def close(self) -> None:
+        """结束事件流"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class EventHub:
+    """设备状态变化的分发中心"""
+
+    def __init__(self, heartbeat: float = 15.0):
+        """
+        初始化分发中心
+
+        Args:
+            heartbeat (float): 没有状态变化时发送心跳注释的间隔（秒），防止代理断开空闲连接
+        """
+        self.heartbeat = heartbeat
+        self._subscribers: Set[Subscriber] = set()
+        self._last: Dict[str, bytes] = {}  # 设备ID -> 最近一次推送的状态
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, device_id: str, payload: bytes) -> bool:
+        """
+        推送设备状态
+
+        Args:
+            device_id (str): 设备ID
+            payload (bytes): 设备缓存的已编码状态（to_json 的结果）
+
+        Returns:
+            bool: 是否推送（状态未变化时为 False）
+        """
+        with self._lock:
+            if self._last.get(device_id) is payload:
+                return False
+            self._last[device_id] = payload
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(device_id, payload)
+        return True
+
+    def remove(self, device_id: str) -> None:
+        """通知订阅者设备已删除"""
+        with self._lock:
+            self._last.pop(device_id, None)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(device_id, None)
+
+    def subscribe(self) -> Subscriber:
+        """新增订阅者"""
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """移除订阅者"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+        subscriber.close()
+
+    def stream(self, subscriber: Subscriber) -> Iterator[bytes]:
+        """
+        生成 SSE 事件流
+
+        每批状态变化合并为一个 "update" 事件（数据为 {设备ID: 状态}），
+        删除的设备合并为一个 "remove" 事件（数据为设备ID列表）。
+        """
+        try:
+            yield b"retry: 3000\n\n"
+            last_sent = time.monotonic()
+            while not subscriber.closed:
+                pending = subscriber.take(self.heartbeat)
+                if not pending:
+                    if time.monotonic() - last_sent >= self.heartbeat:
+                        yield b": keepalive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                updates = [(device_id, payload) for device_id, payload in pending.items()
+                           if payload is not None]
+                removed = [device_id for device_id, payload in pending.items()
+                           if payload is None]
+                if updates:
+                    yield b"event: update\ndata: " + join_object(updates) + b"\n\n"
+                if removed:
+                    yield b"event: remove\ndata: " + dumps(removed) + b"\n\n"
+                last_sent = time.monotonic()
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,826 @@
+"""
+设备列式存储模块
+
+按设备类型把设备状态存放在 NumPy 列数组中（structure-of-arrays），
+每种设备类型对应一张 TypeTable，每个属性对应一列。
+设备对象只是某一行的轻量视图，原有的 handle_command / to_dict 接口保持不变；
+模拟节拍引擎按类型对整列做少量向量化运算，不再逐个设备调用 isinstance 和 random。
+"""
+
+from collections import deque
+from itertools import repeat
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+import threading
+
+import numpy as np
+
+from .devices import (
+    FLEET_VERSION, BaseDevice, Light, Thermostat, DoorLock, Blind,
+    AirConditioner, SmokeDetector, Fan, Plug
+)
+from .randomness import generator
+from .environment import ThermalModel
+from .stats import FleetStats, milliwatts
+from .history import StateHistory
+from . import clock as sim_clock
+
+
+class Column:
+    """数值列：属性值直接以给定的 NumPy 类型存储"""
+
+    def __init__(self, dtype: Any, fill: Any = 0):
+        """
+        初始化数值列
+
+        Args:
+            dtype: 列的 NumPy 数据类型
+            fill: 未使用行的填充值
+        """
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+
+    def encode(self, value: Any) -> Any:
+        """将属性值编码为列中存储的值"""
+        return value
+
+    def decode(self, raw: Any) -> Any:
+        """将列中存储的值解码为 Python 对象"""
+        return raw.item()
+
+    @property
+    def numeric(self) -> bool:
+        """是否为可做范围查询的数值列"""
+        return self.dtype.kind in "iuf"
+
+    def parse(self, text: str) -> Any:
+        """将查询参数中的字符串解析为属性值"""
+        if self.dtype.kind == "b":
+            if text.lower() not in ("true", "false", "1", "0"):
+                raise ValueError(f"无效的布尔值: {text}")
+            return text.lower() in ("true", "1")
+        return float(text)
+
+    def lookup(self, value: Any) -> Any:
+        """查询时将属性值编码为列中的值，未出现过的值抛出 KeyError"""
+        return self.encode(value)
+
+
+class CategoryColumn(Column):
+    """枚举列：取值有限的字符串以小整数编码存储"""
+
+    numeric = False
+
+    def __init__(self, choices):
+        super().__init__(np.int8)
+        self.choices = tuple(choices)
+        self._codes = {choice: code for code, choice in enumerate(self.choices)}
+
+    def encode(self, value: Any) -> int:
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise ValueError(f"无效的枚举值: {value!r}")
+
+    def decode(self, raw: Any) -> str:
+        return self.choices[raw]
+
+    def parse(self, text: str) -> str:
+        return text
+
+    def lookup(self, value: Any) -> int:
+        return self._codes[value]
+
+
+class TextColumn(Column):
+    """文本列：任意字符串通过共享的字符串表编码，0 表示 None"""
+
+    numeric = False
+
+    def __init__(self):
+        super().__init__(np.int32)
+        self.texts: List[Optional[str]] = [None]
+        self._codes: Dict[Optional[str], int] = {None: 0}
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.texts)
+            self.texts.append(value)
+            self._codes[value] = code
+        return code
+
+    def decode(self, raw: Any) -> Optional[str]:
+        return self.texts[raw]
+
+    def parse(self, text: str) -> str:
+        return text
+
+    def lookup(self, value: Optional[str]) -> int:
+        # 查询不应向字符串表中添加新字符串
+        return self._codes[value]
+
+
+class TimestampColumn(Column):
+    """可空时间戳列：以浮点数存储，NaN 表示 None"""
+
+    def __init__(self):
+        super().__init__(np.float64, np.nan)
+
+    def encode(self, value: Optional[float]) -> float:
+        if value is None:
+            return np.nan
+        return value
+
+    def decode(self, raw: Any) -> Optional[float]:
+        if np.isnan(raw):
+            return None
+        return raw.item()
+
+
+class ObjectColumn(Column):
+    """对象列：存放 Python 对象（如设备的序列化缓存），不参与查询和快照"""
+
+    numeric = False
+
+    def __init__(self):
+        super().__init__(np.object_, None)
+
+    def decode(self, raw: Any) -> Any:
+        return raw
+
+
+# 所有设备共享的错误信息字符串表
+ERROR_TEXT = TextColumn()
+
+# 基础设备属性列
+BASE_COLUMNS: Dict[str, Column] = {
+    "online": Column(np.bool_, False),
+    "error_state": ERROR_TEXT,
+    "_last_update": Column(np.float64, np.nan),
+    "_version": Column(np.int64),
+    "_group": Column(np.int32),  # 分组编号（见 stats），0 表示不属于任何分组
+    # 发布状态：变化位、距上次关键帧的发布次数和序列化缓存。
+    # 存放在列中而不是视图的槽里，视图只有 _table、_row 两个槽，可以整批创建
+    "_dirty": Column(np.int64),
+    "_since_keyframe": Column(np.int32),
+    "_cache": ObjectColumn(),
+}
+
+# 只在进程内有意义的列，不写入快照
+TRANSIENT_COLUMNS = ("_dirty", "_since_keyframe", "_cache")
+
+# 各设备类型的属性列
+TYPE_COLUMNS: Dict[Type[BaseDevice], Dict[str, Column]] = {
+    Light: {
+        "state": CategoryColumn(("off", "on")),
+        "brightness": Column(np.int16),
+        "color_temp": Column(np.int32),
+        "power_consumption": Column(np.float64),
+    },
+    Thermostat: {
+        "current_temp": Column(np.float64),
+        "target_temp": Column(np.float64),
+        "humidity": Column(np.float64),
+        "_mode": Column(np.int8),
+        "_fan_speed": Column(np.int8),
+        "_room": Column(np.int32, fill=-1),  # 所在房间编号（见 environment）
+    },
+    DoorLock: {
+        "locked": Column(np.bool_),
+        "battery_level": Column(np.float64),
+        "_last_lock_time": TimestampColumn(),
+        "_last_unlock_time": TimestampColumn(),
+    },
+    Blind: {
+        "position": Column(np.int16),
+        "tilt": Column(np.int16),
+        "moving": Column(np.bool_),
+        "_last_move_time": TimestampColumn(),
+    },
+    AirConditioner: {
+        "on": Column(np.bool_),
+        "temp": Column(np.float64),
+        "_mode": Column(np.int8),
+        "_fan_speed": Column(np.int8),
+        "swing": Column(np.bool_),
+        "power_consumption": Column(np.float64),
+        "_room": Column(np.int32, fill=-1),
+    },
+    SmokeDetector: {
+        "alarm": Column(np.bool_),
+        "battery_level": Column(np.float64),
+        "smoke_level": Column(np.int16),
+        "_last_test_time": TimestampColumn(),
+    },
+    Fan: {
+        "on": Column(np.bool_),
+        "speed": Column(np.int8),
+        "oscillate": Column(np.bool_),
+        "timer": Column(np.int16),
+        "power_consumption": Column(np.float64),
+    },
+    Plug: {
+        "on": Column(np.bool_),
+        "power_consumption": Column(np.float64),
+        "voltage": Column(np.int16),
+        "current": Column(np.float64),
+        "power_factor": Column(np.float64),
+        "timer": Column(np.int16),
+    },
+}
+
+
+def _column_property(name: str, column: Column) -> property:
+    """生成读写某一列当前行的属性"""
+
+    def fget(self):
+        return column.decode(self._table.arrays[name][self._row])
+
+    def fset(self, value):
+        self._table.arrays[name][self._row] = column.encode(value)
+
+    return property(fget, fset)
+
+
+# 增量汇总的列：通过设备视图赋值时把变化量计入 FleetStats
+AGGREGATED_COLUMNS = ("online", "power_consumption")
+
+
+def _aggregated_property(name: str, column: Column) -> property:
+    """生成读写某一列当前行、并把变化量计入集群汇总的属性"""
+
+    def fget(self):
+        return column.decode(self._table.arrays[name][self._row])
+
+    def fset(self, value):
+        table, row = self._table, self._row
+        array = table.arrays[name]
+        old = array[row]
+        array[row] = column.encode(value)
+        new = array[row]
+        if table.stats is None or new == old:
+            return
+        group = int(table.arrays["_group"][row])
+        if name == "online":
+            table.stats.apply(table.device_class.type, group, online=1 if new else -1)
+        else:
+            table.stats.apply(table.device_class.type, group,
+                              power_mw=milliwatts(new) - milliwatts(old))
+
+    return property(fget, fset)
+
+
+def _make_view_class(device_class: Type[BaseDevice],
+                     columns: Dict[str, Column]) -> Type[BaseDevice]:
+    """
+    为设备类生成行视图子类，列属性覆盖原有的实例属性
+
+    视图类与设备类同名，保证 __init__ 中推导出的设备类型不变。
+    """
+    namespace = {name: (_aggregated_property if name in AGGREGATED_COLUMNS
+                        else _column_property)(name, column)
+                 for name, column in columns.items()}
+    namespace["device_id"] = property(_view_device_id, _set_view_device_id)
+    namespace["__doc__"] = f"{device_class.__name__} 的列存储行视图"
+    namespace["__slots__"] = ("_table", "_row")
+    return type(device_class.__name__, (device_class,), namespace)
+
+
+def _view_device_id(self) -> str:
+    """视图的设备ID保存在表的ID列表中"""
+    return self._table.ids[self._row]
+
+
+def _set_view_device_id(self, device_id: str) -> None:
+    self._table.ids[self._row] = device_id
+
+
+class TypeTable:
+    """单一设备类型的列存储表"""
+
+    def __init__(self, device_class: Type[BaseDevice], capacity: int = 1024):
+        """
+        初始化列存储表
+
+        Args:
+            device_class (Type[BaseDevice]): 设备类
+            capacity (int): 初始行容量
+        """
+        self.device_class = device_class
+        self.columns = {**BASE_COLUMNS, **TYPE_COLUMNS[device_class]}
+        self.capacity = capacity
+        self.size = 0  # 已使用过的最大行号 + 1
+        self.arrays = {
+            name: np.full(capacity, column.fill, dtype=column.dtype)
+            for name, column in self.columns.items()
+        }
+        self.alive = np.zeros(capacity, dtype=np.bool_)
+        self.ids: List[Optional[str]] = []
+        self.views: List[Optional[BaseDevice]] = []
+        self.view_class = _make_view_class(device_class, self.columns)
+        self._free: List[int] = []
+        self.stats: Optional[FleetStats] = None  # 所属集群的汇总
+
+    def __len__(self) -> int:
+        return self.size - len(self._free)
+
+    def allocate(self, device_id: str) -> int:
+        """分配一行，优先复用已释放的行"""
+        if self._free:
+            row = self._free.pop()
+            self.ids[row] = device_id
+            self.views[row] = None
+        else:
+            if self.size == self.capacity:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.ids.append(device_id)
+            self.views.append(None)
+        self.alive[row] = True
+        return row
+
+    def load(self, ids: List[str], columns: Dict[str, np.ndarray]) -> List[BaseDevice]:
+        """
+        把整批设备装入空表（恢复快照时使用）
+
+        列数组整列复制，设备视图通过槽描述符批量创建，不调用设备类的 __init__。
+        装入大量设备时调用方应暂停垃圾回收（见 snapshot.load_snapshot）。
+
+        Args:
+            ids (List[str]): 设备ID，按行号排列
+            columns (Dict[str, np.ndarray]): 列名到各行取值的映射，缺少的列保持填充值
+
+        Returns:
+            List[BaseDevice]: 新建的设备视图
+        """
+        if self.size:
+            raise ValueError("只能向空表装入设备")
+        count = len(ids)
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        if capacity != self.capacity:
+            self.arrays = {name: np.full(capacity, column.fill, dtype=column.dtype)
+                           for name, column in self.columns.items()}
+            self.alive = np.zeros(capacity, dtype=np.bool_)
+            self.capacity = capacity
+        for name, values in columns.items():
+            self.arrays[name][:count] = values
+        self.alive[:count] = True
+        self.size = count
+        self.ids = list(ids)
+        views = self._new_views(range(count))
+        self.views = list(views)
+        return views
+
+    def allocate_many(self, device_ids: Sequence[str]) -> np.ndarray:
+        """
+        一次分配多行（优先复用已释放的行），并为它们创建设备视图
+
+        Returns:
+            np.ndarray: 与 device_ids 一一对应的行号
+        """
+        count = len(device_ids)
+        reused = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        fresh = count - len(reused)
+        while self.size + fresh > self.capacity:
+            self._grow()
+        rows = np.concatenate([np.array(reused, dtype=np.int64),
+                               np.arange(self.size, self.size + fresh, dtype=np.int64)])
+        self.size += fresh
+        self.ids.extend(repeat(None, fresh))
+        self.views.extend(repeat(None, fresh))
+        row_list = rows.tolist()
+        for row, device_id, view in zip(row_list, device_ids, self._new_views(row_list)):
+            self.ids[row] = device_id
+            self.views[row] = view
+        self.alive[rows] = True
+        return rows
+
+    def _new_views(self, rows) -> List[BaseDevice]:
+        """通过槽描述符批量创建指向各行的视图，不调用设备类的 __init__"""
+        view_class = self.view_class
+        rows = list(rows)
+        count = len(rows)
+        views = list(map(view_class.__new__, repeat(view_class, count)))
+        deque(map(vars(view_class)["_table"].__set__, views, repeat(self, count)), maxlen=0)
+        deque(map(vars(view_class)["_row"].__set__, views, rows), maxlen=0)
+        return views
+
+    def release(self, row: int) -> None:
+        """释放一行，行号留待复用"""
+        self.alive[row] = False
+        self.ids[row] = None
+        self.views[row] = None
+        for name, column in self.columns.items():
+            self.arrays[name][row] = column.fill
+        self._free.append(row)
+
+    def live_rows(self) -> np.ndarray:
+        """返回所有在用行的行号"""
+        return np.flatnonzero(self.alive[:self.size])
+
+    def mark_dirty(self, rows: np.ndarray, fields) -> None:
+        """
+        将向量化更新过的行标记为已变化
+
+        列数组的批量写入绕过了设备视图的属性赋值，需要在这里补记变化。
+
+        Args:
+            rows (np.ndarray): 被更新的行号
+            fields: 被更新的列名
+        """
+        if not rows.size:
+            return
+        # 与 BaseDevice._touch 相同的效果：版本号整块分配，版本、变化位和序列化缓存都按列向量化写入
+        last = FLEET_VERSION.reserve(rows.size)
+        cols = self.arrays
+        cols["_version"][rows] = np.arange(last - rows.size + 1, last + 1)
+        cols["_dirty"][rows] |= self.view_class.field_bits(fields)
+        cols["_cache"][rows] = None
+
+    def _grow(self) -> None:
+        """容量翻倍"""
+        capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.full(capacity, column.fill, dtype=column.dtype)
+            grown[:self.capacity] = self.arrays[name]
+            self.arrays[name] = grown
+        alive = np.zeros(capacity, dtype=np.bool_)
+        alive[:self.capacity] = self.alive
+        self.alive = alive
+        self.capacity = capacity
+
+
+def _update_status(table: TypeTable, rows: np.ndarray,
+                   rng: np.random.Generator, now: float) -> None:
+    """BaseDevice.update_status 的向量化版本"""
+    cols = table.arrays
+    cols["_last_update"][rows] = now
+    offline = rng.random(rows.size) < 0.01  # 1%的概率设备离线
+    if table.stats is not None:
+        # 在线状态的变化量（-1、0、1）按分组计入集群汇总
+        change = (~offline).astype(np.int8) - cols["online"][rows]
+        changed = change != 0
+        if changed.any():
+            table.stats.apply_rows(table.device_class.type,
+                                   cols["_group"][rows[changed]], online=change[changed])
+    cols["online"][rows] = ~offline
+    cols["error_state"][rows] = np.where(
+        offline, ERROR_TEXT.encode("设备连接异常"), 0)
+
+
+def _tick_smoke_detector(table: TypeTable, rng: np.random.Generator,
+                         now: float) -> np.ndarray:
+    """烟雾报警器：10%概率触发报警"""
+    rows = table.live_rows()
+    hit = rows[rng.random(rows.size) < 0.1]
+    if hit.size:
+        cols = table.arrays
+        cols["alarm"][hit] = True
+        cols["smoke_level"][hit] = rng.integers(50, 101, hit.size)
+        _update_status(table, hit, rng, now)
+    return hit
+
+
+# update_status 会修改的列
+STATUS_FIELDS = ("_last_update", "online", "error_state")
+
+# 温控器读数（由热环境模型写入）修改的列
+THERMOSTAT_FIELDS = ("current_temp", "humidity") + STATUS_FIELDS
+
+# 各设备类型的节拍函数及其修改的列
+TICK_STEPS: Dict[Type[BaseDevice],
+                 Tuple[Callable[[TypeTable, np.random.Generator, float], np.ndarray],
+                       Tuple[str, ...]]] = {
+    SmokeDetector: (_tick_smoke_detector, ("alarm", "smoke_level") + STATUS_FIELDS),
+}
+
+
+def _filter_mask(table: TypeTable, filters: Sequence[Tuple[str, str, Any]],
+                 first: int = 0) -> Optional[np.ndarray]:
+    """
+    计算表中从 first 行开始满足所有条件的在用行掩码
+
+    Returns:
+        Optional[np.ndarray]: 行掩码，表中没有条件涉及的列时返回 None
+    """
+    mask = table.alive[first:table.size]
+    for name, op, value in filters:
+        column = table.columns.get(name)
+        if column is None:
+            return None
+        if isinstance(value, str):
+            value = column.parse(value)
+        data = table.arrays[name][first:table.size]
+        if op in ("eq", "ne"):
+            try:
+                code = column.lookup(value)
+            except KeyError:
+                # 从未出现过的值：eq 无匹配，ne 全部匹配
+                if op == "eq":
+                    return np.zeros_like(mask)
+                continue
+            mask = mask & ((data == code) if op == "eq" else (data != code))
+        elif op == "min":
+            mask = mask & (data >= value)
+        elif op == "max":
+            mask = mask & (data <= value)
+        else:
+            raise ValueError(f"无效的运算符: {op}")
+    return mask
+
+
+def queryable_fields() -> Dict[str, Column]:
+    """所有设备类型中可用于查询的公开列（不含以下划线开头的内部列）"""
+    fields = {}
+    for columns in [BASE_COLUMNS, *TYPE_COLUMNS.values()]:
+        for name, column in columns.items():
+            if not name.startswith("_"):
+                fields.setdefault(name, column)
+    return fields
+
+
+class FleetStore:
+    """设备集群列式存储，按设备类型分表"""
+
+    def __init__(self, seed: Optional[int] = None, history: Optional[StateHistory] = None):
+        """
+        初始化集群存储
+
+        Args:
+            seed (Optional[int]): 节拍引擎随机数种子，默认使用运行种子（见 randomness）
+            history (Optional[StateHistory]): 状态历史，每个节拍采样一次；None 表示不记录历史
+        """
+        self.tables: Dict[Type[BaseDevice], TypeTable] = {}
+        self.seed = seed
+        # 每种设备类型一个独立的随机数流，增加其他类型的设备不影响已有类型的序列
+        self.rngs: Dict[Type[BaseDevice], np.random.Generator] = {}
+        # 房间热环境：温控器的读数由房间温湿度决定
+        self.environment = ThermalModel(seed=seed)
+        # 按类型和分组增量维护的设备数、在线数和功率合计
+        self.stats = FleetStats()
+        self.history = history
+        # 增删设备、节拍和查询可能来自不同线程；行分配与扩容必须互斥
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables.values())
+
+    def table(self, device_class: Type[BaseDevice]) -> TypeTable:
+        """获取设备类对应的列存储表，不存在时创建"""
+        table = self.tables.get(device_class)
+        if table is None:
+            table = TypeTable(device_class)
+            table.stats = self.stats
+            self.tables[device_class] = table
+            self.rngs[device_class] = generator("fleet", device_class.type, seed=self.seed)
+        return table
+
+    def add(self, device_class: Type[BaseDevice], device_id: str,
+            room: Optional[str] = None, group: Optional[str] = None) -> BaseDevice:
+        """
+        在列存储中新建设备
+
+        Args:
+            device_class (Type[BaseDevice]): 设备类
+            device_id (str): 设备唯一标识符
+            room (Optional[str]): 温控器和空调所在的房间，默认独占一个以设备ID命名的房间
+            group (Optional[str]): 统计分组（如楼层、租户），默认不属于任何分组
+
+        Returns:
+            BaseDevice: 指向新行的设备视图
+        """
+        with self.lock:
+            table = self.table(device_class)
+            row = table.allocate(device_id)
+            # 先登记分组和设备数，__init__ 写入的在线状态和功率随后按分组计入汇总
+            code = self.stats.group_code(group)
+            table.arrays["_group"][row] = code
+            self.stats.apply(device_class.type, code, devices=1)
+            view = table.view_class.__new__(table.view_class)
+            view._table = table
+            view._row = row
+            # 通过设备类自身的 __init__ 写入默认状态
+            view.__init__(device_id)
+            table.views[row] = view
+            if "_room" in table.columns:
+                self.assign_room(view, room or device_id)
+        return view
+
+    def add_many(self, device_class: Type[BaseDevice], device_ids: Sequence[str],
+                 rooms: Optional[Sequence[Optional[str]]] = None,
+                 group: Optional[str] = None) -> List[BaseDevice]:
+        """
+        批量新建同一类型的设备（批量创建接口使用）
+
+        第一台设备通过 add 写入默认状态，其余设备整列复制这一行并按顺序各取一个版本号，
+        只有温控器和空调的房间仍逐台登记（房间热环境按创建顺序取值）。
+        除版本号外，结果与逐个调用 add 相同。
+
+        Args:
+            device_class (Type[BaseDevice]): 设备类
+            device_ids (Sequence[str]): 设备ID（互不相同，且不在集群中）
+            rooms (Optional[Sequence[Optional[str]]]): 各设备的房间，见 add
+            group (Optional[str]): 统计分组
+
+        Returns:
+            List[BaseDevice]: 与 device_ids 一一对应的设备视图
+        """
+        if not device_ids:
+            return []
+        if rooms is None:
+            rooms = [None] * len(device_ids)
+        with self.lock:
+            first = self.add(device_class, device_ids[0], room=rooms[0], group=group)
+            count = len(device_ids) - 1
+            if not count:
+                return [first]
+            table = first._table
+            rows = table.allocate_many(device_ids[1:])
+            cols = table.arrays
+            for name, array in cols.items():
+                array[rows] = array[first._row]
+            cols["_cache"][rows] = None
+            if "_room" in cols:
+                cols["_room"][rows] = -1  # 房间随后逐台登记
+            last = FLEET_VERSION.reserve(count)
+            cols["_version"][rows] = np.arange(last - count + 1, last + 1)
+            power = cols.get("power_consumption")
+            self.stats.apply_rows(
+                device_class.type, cols["_group"][rows],
+                online=cols["online"][rows].astype(np.int64),
+                power_mw=None if power is None else milliwatts(power[rows]),
+                devices=True)
+            views = [table.views[row] for row in rows.tolist()]
+            if "_room" in table.columns:
+                for view, device_id, room in zip(views, device_ids[1:], rooms[1:]):
+                    self.assign_room(view, room or device_id)
+        return [first] + views
+
+    def assign_room(self, device: BaseDevice, room: str) -> None:
+        """
+        把温控器或空调移入房间（房间不存在时创建）
+
+        Args:
+            device (BaseDevice): 温控器或空调的设备视图
+            room (str): 房间名
+        """
+        with self.lock:
+            table = device._table
+            if "_room" not in table.columns:
+                raise ValueError(f"{device.type} 不属于任何房间")
+            # 由温控器创建的房间以其当前读数为初始温湿度
+            if isinstance(device, Thermostat):
+                index = self.environment.room(room, device.current_temp, device.humidity)
+            else:
+                index = self.environment.room(room)
+            # 先计入新房间再离开原房间，移入同一房间时不会把它删除
+            self.environment.join(np.array([index]))
+            previous = int(table.arrays["_room"][device._row])
+            if previous >= 0:
+                self.environment.leave(previous)
+            table.arrays["_room"][device._row] = index
+
+    def remove(self, device: BaseDevice) -> None:
+        """从列存储中移除设备（集群版本随之递增）"""
+        with self.lock:
+            table, row = device._table, device._row
+            cols = table.arrays
+            power = cols["power_consumption"][row] if "power_consumption" in cols else 0
+            self.stats.apply(table.device_class.type, int(cols["_group"][row]), devices=-1,
+                             online=-int(cols["online"][row]), power_mw=-milliwatts(power))
+            if self.history is not None:
+                self.history.clear(table, row)
+            if "_room" in cols and cols["_room"][row] >= 0:
+                self.environment.leave(int(cols["_room"][row]))
+            table.release(row)
+        FLEET_VERSION.next()
+
+    def select(self, device_class: Optional[Type[BaseDevice]] = None,
+               online: Optional[bool] = None,
+               prefix: Optional[str] = None) -> List[BaseDevice]:
+        """
+        按条件选择设备，类型和在线状态直接在列数组上过滤
+
+        Args:
+            device_class (Optional[Type[BaseDevice]]): 设备类，None 表示所有类型
+            online (Optional[bool]): 在线状态，None 表示不限
+            prefix (Optional[str]): 设备ID前缀，None 表示不限
+
+        Returns:
+            List[BaseDevice]: 匹配的设备视图
+        """
+        filters = [] if online is None else [("online", "eq", online)]
+        selected, _ = self.query(device_class, filters)
+        if prefix is not None:
+            selected = [device for device in selected if device.device_id.startswith(prefix)]
+        return selected
+
+    def query(self, device_class: Optional[Type[BaseDevice]] = None,
+              filters: Sequence[Tuple[str, str, Any]] = (),
+              limit: Optional[int] = None,
+              cursor: Optional[str] = None) -> Tuple[List[BaseDevice], Optional[str]]:
+        """
+        按列条件查询设备，支持游标分页
+
+        设备类型对应各自的列存储表，其余条件在列数组上向量化过滤，
+        只有最终返回的行才会构造或访问设备视图。
+        结果按设备类型名、行号排序；游标记录下一页的起始位置。
+
+        Args:
+            device_class (Optional[Type[BaseDevice]]): 设备类，None 表示所有类型
+            filters: (列名, 运算符, 值) 列表，运算符为 eq/ne/min/max（min、max 含边界）；
+                值可以是属性值，也可以是查询参数字符串（按列类型解析）。
+                没有该列的设备类型不会出现在结果中
+            limit (Optional[int]): 每页最多返回的设备数，None 表示不分页
+            cursor (Optional[str]): 上一页返回的游标
+
+        Returns:
+            Tuple[List[BaseDevice], Optional[str]]: 匹配的设备视图和下一页游标（没有更多时为 None）
+
+        Raises:
+            ValueError: 游标、运算符或值无效
+        """
+        start_type, start_row = "", 0
+        if cursor:
+            start_type, _, row = cursor.rpartition(":")
+            try:
+                start_row = int(row)
+            except ValueError:
+                raise ValueError(f"无效的游标: {cursor}")
+        with self.lock:
+            if device_class is None:
+                tables = sorted(self.tables.values(), key=lambda t: t.device_class.type)
+            else:
+                table = self.tables.get(device_class)
+                tables = [table] if table is not None else []
+
+            results: List[BaseDevice] = []
+            for table in tables:
+                table_type = table.device_class.type
+                if table_type < start_type:
+                    continue
+                first = start_row if table_type == start_type else 0
+                mask = _filter_mask(table, filters, first)
+                if mask is None:
+                    continue
+                rows = np.flatnonzero(mask) + first
+                if limit is not None:
+                    rows = rows[:limit - len(results)]
+                views = table.views
+                results.extend(views[row] for row in rows.tolist())
+                if limit is not None and len(results) >= limit:
+                    return results, f"{table_type}:{rows[-1] + 1}"
+            return results, None
+
+    def tick(self, now: Optional[float] = None) -> Dict[Type[BaseDevice], np.ndarray]:
+        """
+        执行一次模拟节拍，按类型批量更新设备状态
+
+        先对所有房间的热环境做一次向量化积分，温控器的读数随所在房间的温湿度变化；
+        启用状态历史时，节拍结束后对所有设备的数值字段采样一次。
+
+        Args:
+            now (Optional[float]): 节拍时间戳，默认为当前时间
+
+        Returns:
+            Dict[Type[BaseDevice], np.ndarray]: 各设备类型本次被更新的行号
+        """
+        if now is None:
+            now = sim_clock.now()
+        updated = {}
+        with self.lock:
+            sensed = self.environment.step(self.tables, now)
+            if sensed is not None and sensed.size:
+                table = self.tables[Thermostat]
+                _update_status(table, sensed, self.rngs[Thermostat], now)
+                table.mark_dirty(sensed, THERMOSTAT_FIELDS)
+                updated[Thermostat] = sensed
+            for device_class, table in self.tables.items():
+                entry = TICK_STEPS.get(device_class)
+                if entry is None or not len(table):
+                    continue
+                step, fields = entry
+                rows = step(table, self.rngs[device_class], now)
+                table.mark_dirty(rows, fields)
+                updated[device_class] = rows
+            if self.history is not None:
+                for table in self.tables.values():
+                    self.history.record(table, now)
+        return updated
+
+    def device_history(self, device: BaseDevice, field: str, start: Optional[float] = None,
+                       end: Optional[float] = None,
+                       resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        查询设备某个数值字段的历史（见 StateHistory.query）
+
+        Raises:
+            ValueError: 未启用历史，或字段、分辨率无效
+        """
+        if self.history is None:
+            raise ValueError("未启用状态历史")
+        with self.lock:
+            return self.history.query(device._table, device._row, field, start, end, resolution)
@@ -0,0 +1,248 @@
+"""
+设备状态历史模块
+
+状态发布后模拟器原来不保留任何历史值。本模块为每个设备的数值字段维护固定大小的环形缓冲区：
+- 每个模拟节拍对整张列存储表采样一次，原始采样、1分钟均值和1小时均值各占一个环形缓冲区
+- 缓冲区是按 (槽位, 行号) 排列的 float32 二维数组：同一节拍的采样是一次连续写入，
+  同一类型的所有设备共享槽位的时间戳
+- 降采样在节拍中向量化完成：每行累加当前桶的和与采样数，跨桶时写入均值
+- 内存只与表容量、字段数和各分辨率的槽位数有关，不随运行时间增长；
+  默认每个字段每台设备 (60 + 60 + 24) × 4 = 576 字节，另加降采样累加器约 20 字节
+
+某一时刻没有采样（设备尚未创建、或该桶内设备一直不存在）的槽位值为 NaN，查询时跳过。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 记录历史的数值字段（只记录设备类型具有的字段）
+HISTORY_FIELDS = ("current_temp", "humidity", "power_consumption", "battery_level", "smoke_level")
+
+# 分辨率名称及桶长度（秒），0 表示原始采样
+RESOLUTIONS = (("raw", 0), ("1m", 60), ("1h", 3600))
+
+
+class _Ring:
+    """一张表在一种分辨率下的环形缓冲区"""
+
+    def __init__(self, period: int, slots: int, fields: List[str], rows: int):
+        self.period = period
+        self.slots = slots
+        self.rows = rows
+        self.times = np.full(slots, np.nan)
+        self.values = {name: np.full((slots, rows), np.nan, dtype=np.float32)
+                       for name in fields}
+        self.head = 0  # 下一个写入的槽位
+        self.count = 0  # 已写入的槽位数（不超过 slots）
+        # 降采样累加器：当前桶的起始时间、各行的采样和与采样数
+        self.bucket: Optional[float] = None
+        self.sums = {name: np.zeros(rows) for name in fields} if period else {}
+        self.samples = np.zeros(rows, dtype=np.int32) if period else None
+
+    def nbytes(self) -> int:
+        total = self.times.nbytes + sum(values.nbytes for values in self.values.values())
+        total += sum(sums.nbytes for sums in self.sums.values())
+        return total + (self.samples.nbytes if self.samples is not None else 0)
+
+    def grow(self, rows: int) -> None:
+        """扩展行数（新行没有历史）"""
+        self.rows = rows
+        for name, values in self.values.items():
+            grown = np.full((self.slots, rows), np.nan, dtype=np.float32)
+            grown[:, :values.shape[1]] = values
+            self.values[name] = grown
+        for name, sums in self.sums.items():
+            grown = np.zeros(rows)
+            grown[:sums.size] = sums
+            self.sums[name] = grown
+        if self.samples is not None:
+            grown = np.zeros(rows, dtype=np.int32)
+            grown[:self.samples.size] = self.samples
+            self.samples = grown
+
+    def clear(self, row: int) -> None:
+        """清除一行的历史（行被释放后留给新设备复用）"""
+        for values in self.values.values():
+            values[:, row] = np.nan
+        for sums in self.sums.values():
+            sums[row] = 0.0
+        if self.samples is not None:
+            self.samples[row] = 0
+
+    def _next_slot(self, time: float) -> int:
+        """占用下一个槽位（覆盖最早的槽位）"""
+        slot = self.head
+        self.times[slot] = time
+        self.head = (slot + 1) % self.slots
+        self.count = min(self.count + 1, self.slots)
+        return slot
+
+    def record(self, now: float, rows: np.ndarray, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        记录一次采样
+
+        Args:
+            now (float): 采样时间
+            rows (np.ndarray): 在用行号
+            arrays (Dict[str, np.ndarray]): 表的列数组
+        """
+        if not self.period:
+            slot = self._next_slot(now)
+            for name, values in self.values.items():
+                sample = values[slot]
+                sample.fill(np.nan)
+                sample[rows] = arrays[name][rows]
+            return
+
+        bucket = now - now % self.period
+        if self.bucket is not None and bucket != self.bucket:
+            self.flush()
+        self.bucket = bucket
+        for name, sums in self.sums.items():
+            sums[rows] += arrays[name][rows]
+        self.samples[rows] += 1
+
+    def flush(self) -> None:
+        """把当前桶的均值写入一个槽位并重置累加器"""
+        if self.bucket is None:
+            return
+        samples = self.samples
+        slot = self._next_slot(self.bucket)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name, sums in self.sums.items():
+                self.values[name][slot] = np.where(samples > 0, sums / samples, np.nan)
+                sums.fill(0.0)
+        samples.fill(0)
+        self.bucket = None
+
+    def series(self, row: int, name: str, start: float, end: float) -> List[Tuple[float, float]]:
+        """一行在 [start, end] 时间范围内按时间排序的 (时间, 值) 列表"""
+        order = (np.arange(self.count) + self.head - self.count) % self.slots
+        times = self.times[order]
+        values = self.values[name][order, row]
+        keep = (times >= start) & (times <= end) & ~np.isnan(values)
+        return list(zip(times[keep].tolist(), np.round(values[keep], 3).tolist()))
+
+    def oldest(self) -> Optional[float]:
+        """缓冲区中最早的槽位时间"""
+        if not self.count:
+            return None
+        return float(self.times[(self.head - self.count) % self.slots])
+
+
+class TableHistory:
+    """一张列存储表（一种设备类型）的多分辨率历史"""
+
+    def __init__(self, fields: List[str], rows: int, slots: Dict[str, int]):
+        self.fields = fields
+        self.rings = {name: _Ring(period, slots[name], fields, rows)
+                      for name, period in RESOLUTIONS if slots[name] > 0}
+
+    def nbytes(self) -> int:
+        return sum(ring.nbytes() for ring in self.rings.values())
+
+
+class StateHistory:
+    """按设备类型组织的状态历史，由 FleetStore 在每个节拍调用 record"""
+
+    def __init__(self, raw: int = 60, minutes: int = 60, hours: int = 24):
+        """
+        初始化状态历史
+
+        Args:
+            raw (int): 原始采样槽位数（每个节拍一个）
+            minutes (int): 1分钟均值槽位数
+            hours (int): 1小时均值槽位数
+        """
+        if min(raw, minutes, hours) < 0:
+            raise ValueError("槽位数不能为负数")
+        self.slots = {"raw": raw, "1m": minutes, "1h": hours}
+        self.tables: Dict[Any, TableHistory] = {}
+
+    def _history(self, table) -> Optional[TableHistory]:
+        """获取表的历史，表中没有历史字段时为 None"""
+        history = self.tables.get(table.device_class)
+        if history is None:
+            fields = self.fields(table)
+            if not fields or not any(self.slots.values()):
+                return None
+            history = self.tables[table.device_class] = TableHistory(
+                fields, table.capacity, self.slots)
+        return history
+
+    def record(self, table, now: float) -> None:
+        """
+        对一张表的所有在用行采样
+
+        Args:
+            table (TypeTable): 列存储表
+            now (float): 采样时间
+        """
+        history = self._history(table)
+        if history is None:
+            return
+        rows = table.live_rows()
+        for ring in history.rings.values():
+            if ring.rows < table.capacity:
+                ring.grow(table.capacity)
+            ring.record(now, rows, table.arrays)
+
+    def clear(self, table, row: int) -> None:
+        """清除一行的历史（设备被删除时调用）"""
+        history = self.tables.get(table.device_class)
+        if history is None:
+            return
+        for ring in history.rings.values():
+            if row < ring.rows:
+                ring.clear(row)
+
+    def fields(self, table) -> List[str]:
+        """表中记录历史的字段"""
+        return [name for name in HISTORY_FIELDS if name in table.columns]
+
+    def query(self, table, row: int, field: str, start: Optional[float] = None,
+              end: Optional[float] = None,
+              resolution: Optional[str] = None) -> Dict[str, Any]:
+        """
+        查询一台设备某个字段的历史
+
+        未指定分辨率时，选择保留范围覆盖 start 的最细分辨率。
+
+        Args:
+            table (TypeTable): 设备所在的列存储表
+            row (int): 设备行号
+            field (str): 字段名
+            start (Optional[float]): 起始时间戳（含），None 表示不限
+            end (Optional[float]): 结束时间戳（含），None 表示不限
+            resolution (Optional[str]): 分辨率 raw、1m 或 1h
+
+        Returns:
+            Dict[str, Any]: 分辨率和 [时间戳, 值] 列表（降采样的时间戳为桶的起始时间）
+
+        Raises:
+            ValueError: 字段或分辨率无效
+        """
+        if field not in self.fields(table):
+            raise ValueError(f"{table.device_class.type} 没有历史字段: {field}")
+        if resolution is not None and resolution not in self.slots:
+            raise ValueError(f"无效的分辨率: {resolution}")
+        history = self._history(table)
+        rings = {} if history is None else history.rings
+        if resolution is None:
+            resolution = next(
+                (name for name, ring in rings.items()
+                 if ring.count and (start is None or ring.oldest() <= start)),
+                # 没有分辨率覆盖 start 时取保留范围最长的
+                next(reversed(rings), "raw"))
+        ring = rings.get(resolution)
+        points: List[Tuple[float, float]] = []
+        if ring is not None and row < ring.rows:
+            points = ring.series(row, field,
+                                 -np.inf if start is None else start,
+                                 np.inf if end is None else end)
+        return {"resolution": resolution, "points": points}
+
+    def nbytes(self) -> int:
+        """历史缓冲区占用的字节数"""
+        return sum(history.nbytes() for history in self.tables.values())
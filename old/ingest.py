@@ -0,0 +1,213 @@
+"""
+命令接收队列模块
+
+paho 在网络线程中回调 on_message，原来在回调中直接解码 JSON 并执行命令：
+命令突发或某个命令执行较慢时，网络线程无法读取套接字、发送心跳，所有设备的消息都会被延迟。
+本模块把命令的解码和执行移到工作线程池：
+- 网络线程只做路由查找和入队
+- 按设备ID哈希分配工作线程，同一设备的命令按到达顺序执行
+- 队列有容量上限，满时按策略处理：drop_oldest（默认，丢弃该队列中最早的命令）、
+  drop_new（丢弃新命令）、block（等待空位，超时后丢弃）。
+  submit 在网络线程中调用，block 策略等待期间网络线程同样无法读取套接字和发送心跳，
+  因此等待时间应远小于 keepalive（默认 50 毫秒）
+- 统计队列深度、丢弃数和每条命令从入队到执行完成的延迟，用于确定线程数和容量
+"""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import json
+import threading
+import time
+import zlib
+
+POLICIES = ("block", "drop_new", "drop_oldest")
+
+
+class _Shard:
+    """一个工作线程及其队列"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items: Deque[Tuple[str, bytes, float]] = deque()
+        self.cond = threading.Condition()
+        self.busy = False
+        self.thread: Optional[threading.Thread] = None
+
+
+class CommandQueue:
+    """按设备保序的有界命令队列和工作线程池"""
+
+    def __init__(self, handler: Callable[[str, Dict[str, Any]], None],
+                 workers: int = 4, capacity: int = 10000, policy: str = "drop_oldest",
+                 block_timeout: float = 0.05, latency_samples: int = 1024):
+        """
+        初始化命令队列
+
+        Args:
+            handler (Callable): 命令处理函数 handler(device_id, command)，在工作线程中调用
+            workers (int): 工作线程数
+            capacity (int): 所有队列的总容量（平均分配给各工作线程）
+            policy (str): 队列满时的策略，drop_oldest、drop_new 或 block
+            block_timeout (float): block 策略下等待空位的最长时间（秒），超时后丢弃；
+                等待会阻塞调用 submit 的 MQTT 网络线程，应远小于 keepalive
+            latency_samples (int): 用于计算延迟分位数的最近样本数
+        """
+        if workers < 1:
+            raise ValueError("工作线程数必须大于0")
+        if capacity < workers:
+            raise ValueError("队列容量不能小于工作线程数")
+        if policy not in POLICIES:
+            raise ValueError(f"无效的队列策略: {policy}")
+        self.handler = handler
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.capacity = capacity
+        self._shards = [_Shard(-(-capacity // workers)) for _ in range(workers)]
+        self._running = False
+
+        # 统计
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latencies: Deque[float] = deque(maxlen=latency_samples)
+
+    def __len__(self) -> int:
+        """当前排队的命令数"""
+        return sum(len(shard.items) for shard in self._shards)
+
+    def start(self) -> None:
+        """启动工作线程"""
+        if self._running:
+            return
+        self._running = True
+        for index, shard in enumerate(self._shards):
+            shard.thread = threading.Thread(target=self._work, args=(shard,),
+                                            name=f"command-worker-{index}", daemon=True)
+            shard.thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """处理完已排队的命令后停止工作线程"""
+        self._running = False
+        for shard in self._shards:
+            with shard.cond:
+                shard.cond.notify_all()
+        for shard in self._shards:
+            if shard.thread is not None:
+                shard.thread.join(timeout)
+                shard.thread = None
+
+    def submit(self, device_id: str, payload: bytes) -> bool:
+        """
+        提交命令（由 MQTT 网络线程调用）
+
+        Args:
+            device_id (str): 设备ID
+            payload (bytes): 未解码的命令消息
+
+        Returns:
+            bool: 是否入队（被丢弃时为 False；drop_oldest 策略下新命令总会入队）
+        """
+        shard = self._shards[zlib.crc32(device_id.encode("utf-8")) % len(self._shards)]
+        dropped = 0
+        with shard.cond:
+            if len(shard.items) >= shard.capacity:
+                if self.policy == "drop_oldest":
+                    shard.items.popleft()
+                    dropped = 1
+                elif self.policy == "block":
+                    shard.cond.wait_for(lambda: len(shard.items) < shard.capacity,
+                                        self.block_timeout)
+            if len(shard.items) >= shard.capacity:
+                dropped = 1
+            else:
+                shard.items.append((device_id, payload, time.monotonic()))
+                shard.cond.notify_all()
+        with self._stats_lock:
+            self.submitted += 1
+            self.dropped += dropped
+        return not dropped or self.policy == "drop_oldest"
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已排队的命令全部执行完成
+
+        Returns:
+            bool: 是否在超时前完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard in self._shards:
+            with shard.cond:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not shard.cond.wait_for(lambda: not shard.items and not shard.busy,
+                                           remaining):
+                    return False
+        return True
+
+    def _work(self, shard: _Shard) -> None:
+        """工作线程：按顺序解码并执行本队列的命令"""
+        while True:
+            with shard.cond:
+                shard.busy = False
+                shard.cond.notify_all()
+                shard.cond.wait_for(lambda: shard.items or not self._running)
+                if not shard.items:
+                    return
+                device_id, payload, enqueued = shard.items.popleft()
+                shard.busy = True
+                # 唤醒等待空位的提交者
+                shard.cond.notify_all()
+            failed = False
+            try:
+                self.handler(device_id, json.loads(payload))
+            except Exception as e:
+                failed = True
+                print(f"Error handling command for {device_id}: {e}")
+            latency = time.monotonic() - enqueued
+            with self._stats_lock:
+                self.processed += 1
+                self.errors += failed
+                self._latency_total += latency
+                if latency > self._latency_max:
+                    self._latency_max = latency
+                self._latencies.append(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        队列统计
+
+        Returns:
+            Dict[str, Any]: 队列深度、计数和命令延迟（毫秒，分位数基于最近的样本）
+        """
+        depths = [len(shard.items) for shard in self._shards]
+        with self._stats_lock:
+            samples: List[float] = sorted(self._latencies)
+            processed = self.processed
+            stats = {
+                "workers": len(self._shards),
+                "policy": self.policy,
+                "capacity": self.capacity,
+                "depth": sum(depths),
+                "max_worker_depth": max(depths),
+                "submitted": self.submitted,
+                "processed": processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
+            latency_total, latency_max = self._latency_total, self._latency_max
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        stats["latency_ms"] = {
+            "avg": latency_total / processed * 1000 if processed else 0.0,
+            "p50": percentile(0.5),
+            "p99": percentile(0.99),
+            "max": latency_max * 1000,
+        }
+        return stats
@@ -0,0 +1,388 @@
+"""
+命令日志与确定性回放模块
+
+下游消费端出问题时，原来无法复现模拟器当时产生的命令和状态序列。本模块提供：
+- 只追加的日志：记录设备的增删、设备接受的每条命令（MQTT 与 REST）以及每个模拟节拍
+  及其产生的事件（温控器读数更新数、烟雾报警、离线/恢复在线），每行一条 JSON
+- 批量 fsync：写入方只把记录放入缓冲区，后台线程每隔 fsync_interval 秒把缓冲区一次写入并 fsync
+- 确定性：所有随机数都由运行种子派生（见 randomness），日志头部记录运行种子；
+  同一设备类型的命令执行与记录在同一把锁内完成，节拍和设备增删持有全部类型的锁，
+  日志中的顺序就是各随机数流的实际消耗顺序
+- 回放：按日志顺序把命令重新交给设备类执行、按记录的时间戳重新执行节拍，
+  可以按 N 倍速或尽可能快地回放，可选地把状态重新发布到 MQTT；
+  每个节拍的事件摘要与日志比对，回放结果与原始运行不一致时计入 divergences
+- 记录的时间戳取自模拟时钟；回放时使用步进时钟，执行每条记录前把模拟时间推进到记录的时间戳，
+  设备的时间戳也与原始运行相同（使用 real 或 scaled 时钟运行时，与原始值相差执行命令到写入记录之间的时间）
+
+日志从空集群开始记录，回放也从空集群开始（从快照恢复的设备不在日志中）。
+每个日志文件只包含一次运行：打开日志时已有的非空文件被重命名为 path.1、path.2 ……（取第一个未使用的编号）。
+
+回放日志:
+    python -m old.journal replay journal.log [--speed N] [--publish]
+"""
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import argparse
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .devices import DEVICE_TYPES, BaseDevice, SmokeDetector, Thermostat
+from .fleet import FleetStore
+from .randomness import run_seed, set_run_seed
+from . import clock as sim_clock
+
+FORMAT_VERSION = 1
+
+# 节拍事件摘要覆盖的列：各设备类型在节拍中被更新的数值列
+DIGEST_COLUMNS = {
+    Thermostat: ("current_temp", "humidity"),
+    SmokeDetector: ("smoke_level",),
+}
+
+
+def tick_events(fleet: FleetStore, online_before: Dict[type, np.ndarray],
+                updated: Dict[type, np.ndarray]) -> Dict[str, Any]:
+    """
+    汇总一次节拍产生的事件
+
+    Args:
+        fleet (FleetStore): 设备集群
+        online_before (Dict[type, np.ndarray]): 节拍前各表的在线状态列
+        updated (Dict[type, np.ndarray]): FleetStore.tick 返回的各类型被更新的行号
+
+    Returns:
+        Dict[str, Any]: 温控器读数更新数、触发报警的设备、离线和恢复在线的设备，
+            以及被更新数值的 CRC32 摘要（回放时用于比对）
+    """
+    events: Dict[str, Any] = {"readings": 0, "alarms": [], "offline": [], "online": []}
+    digest = 0
+    for device_class, rows in updated.items():
+        table = fleet.tables[device_class]
+        ids = table.ids
+        if device_class is Thermostat:
+            events["readings"] += int(rows.size)
+        elif device_class is SmokeDetector:
+            events["alarms"].extend(ids[row] for row in rows.tolist())
+        before = online_before[device_class][rows]
+        after = table.arrays["online"][rows]
+        events["offline"].extend(ids[row] for row in rows[before & ~after].tolist())
+        events["online"].extend(ids[row] for row in rows[~before & after].tolist())
+        for name in DIGEST_COLUMNS.get(device_class, ()):
+            digest = zlib.crc32(table.arrays[name][rows].tobytes(), digest)
+    events["digest"] = digest
+    return events
+
+
+class Journal:
+    """只追加、批量 fsync 的命令与事件日志"""
+
+    def __init__(self, path: Optional[str], fsync_interval: float = 0.05,
+                 keys: Optional[Iterable[str]] = None):
+        """
+        打开日志并写入头部
+
+        已有的非空日志文件先被重命名（见 rotate），新的运行总是从空文件开始。
+
+        打开日志时按运行种子重置所有 random.Random 随机数流，保证回放从相同的随机数序列开始；
+        因此应在集群执行任何命令和节拍之前打开。
+
+        Args:
+            path (Optional[str]): 日志文件路径，None 表示不记录（所有方法都不做任何事）
+            fsync_interval (float): 后台线程写入并 fsync 的周期（秒）
+            keys (Optional[Iterable[str]]): 顺序锁的键，默认为所有设备类型名
+        """
+        if keys is None:
+            keys = [device_class.type for device_class in DEVICE_TYPES.values()]
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._locks = {key: threading.Lock() for key in keys}
+        self._buffer: List[bytes] = []
+        self._buffer_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+        self.written = 0
+        self.syncs = 0
+        self._file = None
+        if path is not None:
+            seed = run_seed()
+            set_run_seed(seed)
+            rotate(path)
+            self._file = open(path, "wb")
+            self.append("header", format=FORMAT_VERSION, seed=seed)
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    @contextmanager
+    def ordered(self, *keys: str) -> Iterator[None]:
+        """
+        持有顺序锁执行操作，使操作与其日志记录的先后一致
+
+        Args:
+            *keys (str): 设备类型名；不指定时持有全部类型的锁（节拍、设备增删）
+        """
+        if not self.enabled:
+            yield
+            return
+        with ExitStack() as stack:
+            for key in (keys or self._locks):
+                stack.enter_context(self._locks[key])
+            yield
+
+    def append(self, kind: str, **fields: Any) -> None:
+        """
+        追加一条记录（只放入缓冲区，由后台线程批量写入）
+
+        Args:
+            kind (str): 记录类型：header、add、remove、command、tick
+            **fields: 记录内容
+        """
+        if not self.enabled:
+            return
+        with self._buffer_lock:
+            self._seq += 1
+            record = {"seq": self._seq, "t": sim_clock.now(), "kind": kind, **fields}
+            self._buffer.append(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def tick(self, fleet: FleetStore, now: Optional[float] = None) -> Dict[type, np.ndarray]:
+        """
+        执行一次模拟节拍并记录其事件
+
+        Args:
+            fleet (FleetStore): 设备集群
+            now (Optional[float]): 节拍时间戳，默认为模拟时钟的当前时间
+
+        Returns:
+            Dict[type, np.ndarray]: FleetStore.tick 的返回值
+        """
+        if not self.enabled:
+            return fleet.tick(now)
+        if now is None:
+            now = sim_clock.now()
+        with self.ordered():
+            online_before = {device_class: table.arrays["online"].copy()
+                             for device_class, table in fleet.tables.items()}
+            updated = fleet.tick(now)
+            self.append("tick", now=now, events=tick_events(fleet, online_before, updated))
+        return updated
+
+    def start(self) -> None:
+        """启动后台写入线程"""
+        if not self.enabled or self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> None:
+        """把缓冲区写入文件并 fsync"""
+        if not self.enabled:
+            return
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        self._file.write(b"".join(batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.written += len(batch)
+        self.syncs += 1
+
+    def close(self) -> None:
+        """停止后台线程，写完剩余记录并关闭文件"""
+        if not self.enabled:
+            return
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def _run(self) -> None:
+        while self._running:
+            self._wake.wait(self.fsync_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing journal {self.path}: {e}")
+
+
+def rotate(path: str) -> Optional[str]:
+    """
+    把已有的非空日志重命名为 path.N（N 为第一个未使用的编号），避免两次运行写入同一个日志
+
+    Returns:
+        Optional[str]: 重命名后的路径，没有需要保留的日志时为 None
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    n = 1
+    while os.path.exists(f"{path}.{n}"):
+        n += 1
+    rotated = f"{path}.{n}"
+    os.replace(path, rotated)
+    return rotated
+
+
+def read_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取日志记录
+
+    进程崩溃时最后一批可能只写入了一部分，读到不完整的记录时结束。
+
+    Args:
+        path (str): 日志文件路径
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+class Replayer:
+    """按日志重建设备集群并重放命令和节拍"""
+
+    def __init__(self, speed: Optional[float] = None,
+                 publish: Optional[Callable[[BaseDevice], None]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        初始化回放器
+
+        Args:
+            speed (Optional[float]): 回放倍速（按记录的时间戳），None 表示尽可能快
+            publish (Optional[Callable]): 每个状态发生变化的设备都会调用 publish(device)
+            sleep (Callable): 等待函数
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("回放倍速必须大于0")
+        self.speed = speed
+        self.publish = publish
+        self.sleep = sleep
+        self.fleet: Optional[FleetStore] = None
+        self.devices: Dict[str, BaseDevice] = {}
+        self.stats = {"records": 0, "commands": 0, "ticks": 0, "divergences": 0}
+
+    def run(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        回放日志记录
+
+        Args:
+            records: 日志记录（read_journal 的结果），第一条必须是头部
+
+        Returns:
+            Dict[str, Any]: 回放的记录数、命令数、节拍数、不一致的节拍数和耗时（秒）
+
+        Raises:
+            ValueError: 缺少头部、格式版本不支持，或日志中间出现另一次运行的头部
+        """
+        records = iter(records)
+        header = next(records, None)
+        if header is None or header.get("kind") != "header":
+            raise ValueError("日志缺少头部")
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"不支持的日志格式版本: {header.get('format')}")
+        # 与原始运行相同的随机数流，集群在重置种子之后创建
+        set_run_seed(header["seed"])
+        self.fleet = FleetStore()
+        self.devices = {}
+        started = time.monotonic()
+        origin = header["t"]
+        replay_clock = sim_clock.StepClock(start=origin)
+        previous = sim_clock.set_clock(replay_clock)
+        try:
+            for record in records:
+                if self.speed is not None:
+                    delay = (record["t"] - origin) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        self.sleep(delay)
+                replay_clock.advance_to(record["t"])
+                self._apply(record)
+                self.stats["records"] += 1
+        finally:
+            sim_clock.set_clock(previous)
+        self.stats["seconds"] = time.monotonic() - started
+        return self.stats
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        kind = record["kind"]
+        if kind == "header":
+            # 多次运行拼接在同一个文件中时，后续运行的种子和设备无法与前一次运行一起重建
+            raise ValueError(f"日志第 {record['seq']} 条记录是另一次运行的头部")
+        if kind == "add":
+            device = self.fleet.add(DEVICE_TYPES[record["type"]], record["device"],
+                                    room=record.get("room"), group=record.get("group"))
+            self.devices[record["device"]] = device
+            self._publish([device])
+        elif kind == "remove":
+            device = self.devices.pop(record["device"], None)
+            if device is not None:
+                self.fleet.remove(device)
+        elif kind == "command":
+            device = self.devices.get(record["device"])
+            if device is not None:
+                device.handle_command(record["command"])
+                self.stats["commands"] += 1
+                self._publish([device])
+        elif kind == "tick":
+            online_before = {device_class: table.arrays["online"].copy()
+                             for device_class, table in self.fleet.tables.items()}
+            updated = self.fleet.tick(record["now"])
+            if tick_events(self.fleet, online_before, updated) != record["events"]:
+                self.stats["divergences"] += 1
+            self.stats["ticks"] += 1
+            if self.publish is not None:
+                for device_class, rows in updated.items():
+                    views = self.fleet.tables[device_class].views
+                    self._publish(views[row] for row in rows.tolist())
+
+    def _publish(self, devices: Iterable[BaseDevice]) -> None:
+        if self.publish is not None:
+            for device in devices:
+                self.publish(device)
+
+
+def _mqtt_publisher() -> Callable[[BaseDevice], None]:
+    """按 .env 中的 MQTT 配置创建发布函数"""
+    import paho.mqtt.client as mqtt
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    prefix = os.getenv("DEVICE_PREFIX")
+    client = mqtt.Client()
+    client.connect(os.getenv("BROKER_IP"), int(os.getenv("BROKER_PORT")), 60)
+    client.loop_start()
+
+    def publish(device: BaseDevice) -> None:
+        client.publish(f"{prefix}/status/{device.device_id}", device.to_json())
+    return publish
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="命令日志工具")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    replay = subparsers.add_parser("replay", help="回放日志")
+    replay.add_argument("path", help="日志文件路径")
+    replay.add_argument("--speed", type=float, default=None,
+                        help="回放倍速（按记录的时间戳），省略时尽可能快")
+    replay.add_argument("--publish", action="store_true",
+                        help="把回放的设备状态发布到 .env 中配置的 MQTT Broker")
+    args = parser.parse_args()
+
+    replayer = Replayer(speed=args.speed, publish=_mqtt_publisher() if args.publish else None)
+    stats = replayer.run(read_journal(args.path))
+    print(f"回放 {stats['records']} 条记录（{stats['commands']} 条命令、{stats['ticks']} 个节拍），"
+          f"耗时 {stats['seconds']:.2f}s，事件不一致的节拍 {stats['divergences']} 个")
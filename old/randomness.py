@@ -0,0 +1,114 @@
+"""
+随机数子系统
+
+设备模拟中的随机数原来都来自全局 random 模块，每次运行的结果都不同，压测无法复现。
+本模块从一个运行种子派生所有随机数流：
+- 运行种子来自环境变量 SIM_SEED，未设置时随机生成一个（可打印出来供复现使用）
+- 每个随机数流由运行种子和一个键（如 ("device", "light")、("shard", "3")）派生，
+  各流相互独立：增加一种设备或一个分片不会改变其他流产生的序列
+- 逐个取值的代码（命令处理、update_status）使用按设备类型划分的 random.Random 流，
+  单次取值与全局 random 一样快
+- 节拍循环使用 numpy Generator，按设备类型整表一次取出本次节拍需要的全部随机数
+
+同一运行种子、相同的操作顺序下，模拟结果逐位相同。
+"""
+
+from typing import Dict, Optional, Tuple
+import os
+import random
+import secrets
+import threading
+import zlib
+
+import numpy as np
+
+_lock = threading.Lock()
+_run_seed: Optional[int] = None
+_streams: Dict[Tuple[str, ...], random.Random] = {}
+
+
+def _key_words(key: Tuple[str, ...]) -> Tuple[int, ...]:
+    """把流的键转换为 SeedSequence 的派生键"""
+    return tuple(zlib.crc32(str(part).encode("utf-8")) for part in key)
+
+
+def run_seed() -> int:
+    """
+    获取运行种子
+
+    Returns:
+        int: 环境变量 SIM_SEED 的值；未设置时为首次调用时随机生成的种子
+    """
+    global _run_seed
+    if _run_seed is None:
+        with _lock:
+            if _run_seed is None:
+                env = os.getenv("SIM_SEED")
+                _run_seed = int(env) if env else secrets.randbits(63)
+    return _run_seed
+
+
+def set_run_seed(seed: Optional[int]) -> None:
+    """
+    设置运行种子
+
+    已创建的 random.Random 流会按新种子重新播种；numpy Generator 在创建时取种子，
+    应在创建 FleetStore 等对象之前调用。
+
+    Args:
+        seed (Optional[int]): 运行种子，None 表示重新读取 SIM_SEED 或随机生成
+    """
+    global _run_seed
+    with _lock:
+        _run_seed = seed
+    for key, stream_rng in list(_streams.items()):
+        stream_rng.seed(derive_seed(*key))
+
+
+def derive_seed(*key: str, seed: Optional[int] = None) -> int:
+    """
+    派生随机数种子
+
+    Args:
+        *key (str): 流的键
+        seed (Optional[int]): 基础种子，默认为运行种子
+
+    Returns:
+        int: 64位整数种子
+    """
+    base = run_seed() if seed is None else seed
+    sequence = np.random.SeedSequence(base, spawn_key=_key_words(key))
+    return int(sequence.generate_state(1, np.uint64)[0])
+
+
+def generator(*key: str, seed: Optional[int] = None) -> np.random.Generator:
+    """
+    创建用于批量取值的 numpy 随机数流
+
+    Args:
+        *key (str): 流的键
+        seed (Optional[int]): 基础种子，默认为运行种子
+
+    Returns:
+        np.random.Generator: 独立的随机数生成器
+    """
+    base = run_seed() if seed is None else seed
+    return np.random.default_rng(np.random.SeedSequence(base, spawn_key=_key_words(key)))
+
+
+def stream(*key: str) -> random.Random:
+    """
+    获取用于逐个取值的随机数流（同一个键总是返回同一个对象）
+
+    Args:
+        *key (str): 流的键
+
+    Returns:
+        random.Random: 由运行种子派生的随机数流
+    """
+    stream_rng = _streams.get(key)
+    if stream_rng is None:
+        created = random.Random(derive_seed(*key))
+        with _lock:
+            stream_rng = _streams.setdefault(key, created)
+    return stream_rng
@@ -0,0 +1,204 @@
+"""
+并发设备注册表
+
+Web 请求线程（添加、删除设备）、MQTT 网络线程（on_message）和模拟线程会同时访问设备表。
+直接使用一个 dict 时，遍历过程中的增删会抛出 "dictionary changed size during iteration"，
+同一设备的命令也可能交错执行。本模块提供：
+- 分段锁：设备按ID哈希分到若干段，每段有自己的字典和写锁，写入只锁所在的段
+- 命令串行化：同一设备的命令通过按ID哈希选取的锁池串行执行（不为每个设备单独建锁）
+- 写时复制快照：读者获取快照只需对每段做一次标记，之后的写入会先复制该段，
+  快照本身永远不会被修改，可以在不持有任何锁的情况下遍历
+"""
+
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import threading
+import zlib
+
+import numpy as np
+
+
+def _stripe_of(device_id: str, stripes: int) -> int:
+    """设备所属的段号"""
+    return zlib.crc32(device_id.encode("utf-8")) % stripes
+
+
+def _object_array(items: Sequence[Any]) -> np.ndarray:
+    """把序列装入一维 object 数组（元素本身不会被展开）"""
+    array = np.empty(len(items), dtype=object)
+    array[:] = items
+    return array
+
+
+class _Stripe:
+    """注册表的一段"""
+
+    __slots__ = ("lock", "devices", "shared")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.devices: Dict[str, Any] = {}
+        self.shared = False  # 当前字典是否已被快照引用
+
+    def writable(self) -> Dict[str, Any]:
+        """返回可以修改的字典（调用方持有段锁）"""
+        if self.shared:
+            self.devices = dict(self.devices)
+            self.shared = False
+        return self.devices
+
+
+class RegistrySnapshot(Mapping):
+    """注册表在某一时刻的只读快照"""
+
+    def __init__(self, parts: List[Dict[str, Any]], stripes: int):
+        self._parts = parts
+        self._stripes = stripes
+
+    def __getitem__(self, device_id: str) -> Any:
+        return self._parts[_stripe_of(device_id, self._stripes)][device_id]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            yield from part
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self._parts)
+
+
+class DeviceRegistry(Mapping):
+    """分段加锁、支持写时复制快照的设备注册表"""
+
+    def __init__(self, stripes: int = 64, command_locks: Optional[int] = None):
+        """
+        初始化注册表
+
+        Args:
+            stripes (int): 写锁分段数
+            command_locks (Optional[int]): 命令锁池大小，默认为分段数的4倍
+        """
+        if stripes < 1:
+            raise ValueError("分段数必须大于0")
+        self.stripes = stripes
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._command_locks = [threading.RLock()
+                               for _ in range(command_locks or stripes * 4)]
+
+    def _stripe(self, device_id: str) -> _Stripe:
+        return self._stripes[_stripe_of(device_id, self.stripes)]
+
+    def __getitem__(self, device_id: str) -> Any:
+        # 读取单个键不加锁：段字典只会被整体替换或单键赋值，二者在 GIL 下都是原子的
+        return self._stripe(device_id).devices[device_id]
+
+    def __contains__(self, device_id: object) -> bool:
+        return isinstance(device_id, str) and device_id in self._stripe(device_id).devices
+
+    def __iter__(self) -> Iterator[str]:
+        """遍历快照中的设备ID，遍历期间的增删不会影响本次遍历"""
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return sum(len(stripe.devices) for stripe in self._stripes)
+
+    def add(self, device_id: str, device: Any) -> bool:
+        """
+        添加设备（检查与插入是原子的）
+
+        Returns:
+            bool: 是否添加成功，设备ID已存在时为 False
+        """
+        stripe = self._stripe(device_id)
+        with stripe.lock:
+            if device_id in stripe.devices:
+                return False
+            stripe.writable()[device_id] = device
+            return True
+
+    def add_many(self, device_ids: Sequence[str], devices: Sequence[Any]) -> int:
+        """
+        批量添加设备（已存在的ID跳过，批内重复的ID保留第一个）
+
+        段号整批计算后按段排序分组，每段只加一次锁并用一次 dict.update 插入。
+
+        Args:
+            device_ids (Sequence[str]): 设备ID
+            devices (Sequence[Any]): 与 device_ids 一一对应的设备
+
+        Returns:
+            int: 实际添加的设备数
+        """
+        count = len(device_ids)
+        if not count:
+            return 0
+        stripe_of = np.fromiter(map(zlib.crc32, map(str.encode, device_ids)),
+                                dtype=np.int64, count=count) % self.stripes
+        order = np.argsort(stripe_of, kind="stable")
+        bounds = np.searchsorted(stripe_of[order], np.arange(self.stripes + 1)).tolist()
+        ids = _object_array(device_ids)[order]
+        values = _object_array(devices)[order]
+        added = 0
+        for index, stripe in enumerate(self._stripes):
+            lo, hi = bounds[index], bounds[index + 1]
+            if lo == hi:
+                continue
+            # 倒序构造字典，批内重复的ID最终保留第一次出现的设备
+            part = dict(zip(ids[lo:hi][::-1].tolist(), values[lo:hi][::-1].tolist()))
+            with stripe.lock:
+                if not stripe.devices:
+                    # 空段（如恢复快照时）直接换成新字典，旧的空字典可能被快照引用，保持不变
+                    stripe.devices = part
+                    stripe.shared = False
+                else:
+                    current = stripe.writable()
+                    for device_id in part.keys() & current.keys():
+                        del part[device_id]
+                    current.update(part)
+            added += len(part)
+        return added
+
+    def __setitem__(self, device_id: str, device: Any) -> None:
+        stripe = self._stripe(device_id)
+        with stripe.lock:
+            stripe.writable()[device_id] = device
+
+    def pop(self, device_id: str, default: Any = None) -> Any:
+        """删除并返回设备，不存在时返回 default"""
+        stripe = self._stripe(device_id)
+        with stripe.lock:
+            if device_id not in stripe.devices:
+                return default
+            return stripe.writable().pop(device_id)
+
+    def snapshot(self) -> RegistrySnapshot:
+        """
+        获取快照
+
+        只需对每段短暂加锁做一次标记，不复制任何数据；
+        之后某段第一次被写入时才复制该段。
+        """
+        parts = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.shared = True
+                parts.append(stripe.devices)
+        return RegistrySnapshot(parts, self.stripes)
+
+    def command_lock(self, device_id: str) -> threading.RLock:
+        """设备的命令锁（同一设备总是得到同一把锁）"""
+        return self._command_locks[zlib.crc32(device_id.encode("utf-8"))
+                                   % len(self._command_locks)]
+
+    @contextmanager
+    def command(self, device_id: str):
+        """
+        在设备的命令锁内访问设备，同一设备的命令串行执行
+
+        设备在加锁之后才查找，已被删除的设备不会再被修改。
+
+        Yields:
+            Optional[Any]: 设备，不存在时为 None
+        """
+        with self.command_lock(device_id):
+            yield self.get(device_id)
@@ -0,0 +1,332 @@
+"""
+命令往返延迟测试模块
+
+测量从 {device_prefix}/control/{id} 上的控制消息到对应 {device_prefix}/status/{id} 状态消息的往返时间：
+- 每条命令带一个唯一的关联ID（correlation_id），设备执行后立即发布状态并原样带回，据此把状态与命令对应起来
+- 并发度限制同时在途（已发送、尚未收到状态）的命令数，每台设备的命令速率也有上限；
+  超过 timeout 秒未收到状态的命令记为丢失并释放并发名额
+- 延迟记录在对数分桶的直方图中（相对误差约 1%），输出 p50/p99/p999 和吞吐量
+- 可以连接真实的 MQTT Broker，也可以使用进程内的 LocalBroker 替身（不需要网络和 Broker）
+
+命令行入口见 benchmarks/bench_roundtrip.py。
+"""
+
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+from .commands import CORRELATION_KEY
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图"""
+
+    def __init__(self, minimum: float = 1e-6, maximum: float = 100.0, precision: float = 0.01):
+        """
+        初始化直方图
+
+        Args:
+            minimum (float): 最小可分辨的延迟（秒），更小的值记入第一个桶
+            maximum (float): 最大延迟（秒），更大的值记入最后一个桶
+            precision (float): 相邻桶边界的相对间隔
+        """
+        self.minimum = minimum
+        self._scale = 1 / math.log1p(precision)
+        self.counts = np.zeros(int(math.log(maximum / minimum) * self._scale) + 2, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, latency: float) -> None:
+        """记录一个延迟（秒）"""
+        index = int(math.log(latency / self.minimum) * self._scale) + 1 if latency > self.minimum else 0
+        self.counts[min(index, self.counts.size - 1)] += 1
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def percentile(self, p: float) -> float:
+        """
+        延迟分位数
+
+        Args:
+            p (float): 0 到 1 之间的分位
+
+        Returns:
+            float: 分位数所在桶的上边界（秒），不超过记录到的最大值；没有记录时为 0
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        upper = self.minimum * math.exp(index / self._scale)
+        return min(upper, self.max)
+
+    def summary(self) -> Dict[str, float]:
+        """延迟统计（毫秒）"""
+        return {
+            "avg": self.total / self.count * 1000 if self.count else 0.0,
+            "p50": self.percentile(0.5) * 1000,
+            "p99": self.percentile(0.99) * 1000,
+            "p999": self.percentile(0.999) * 1000,
+            "max": self.max * 1000,
+        }
+
+
+class _Message:
+    """LocalBroker 投递的消息（与 paho 的 MQTTMessage 有相同的 topic 和 payload 属性）"""
+
+    __slots__ = ("topic", "payload", "qos")
+
+    def __init__(self, topic: str, payload: bytes, qos: int):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+
+
+class LocalClient:
+    """LocalBroker 的客户端，提供测试和模拟器用到的 paho 客户端接口"""
+
+    def __init__(self, broker: "LocalBroker", client_id: str):
+        self.broker = broker
+        self.client_id = client_id
+        self.on_connect: Optional[Callable] = None
+        self.on_message: Optional[Callable] = None
+        self.on_publish: Optional[Callable] = None
+        self._inbox: "queue.Queue[Optional[_Message]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._mids = count(1)
+
+    def connect(self, host: Any = None, port: Any = None, keepalive: int = 60) -> int:
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic: str, qos: int = 0) -> Tuple[int, int]:
+        self.broker._subscribe(self, topic)
+        return mqtt.MQTT_ERR_SUCCESS, next(self._mids)
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        mid = next(self._mids)
+        self.broker._route(_Message(topic, payload or b"", qos))
+        if self.on_publish is not None:
+            self.on_publish(self, None, mid)
+        info = mqtt.MQTTMessageInfo(mid)
+        info.rc = mqtt.MQTT_ERR_SUCCESS
+        return info
+
+    def loop_start(self) -> None:
+        """启动投递线程（相当于 paho 的网络线程，on_message 在其中调用）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._deliver, daemon=True,
+                                            name=f"local-mqtt-{self.client_id}")
+            self._thread.start()
+
+    def loop_stop(self) -> None:
+        if self._thread is not None:
+            self._inbox.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def disconnect(self) -> int:
+        self.broker._unsubscribe(self)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def _deliver(self) -> None:
+        while True:
+            message = self._inbox.get()
+            if message is None:
+                return
+            if self.on_message is not None:
+                try:
+                    self.on_message(self, None, message)
+                except Exception as e:
+                    print(f"Error in on_message of {self.client_id}: {e}")
+
+
+class LocalBroker:
+    """进程内的 MQTT Broker 替身：按主题过滤（支持 + 和 #）把消息放入订阅者的投递队列"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Tuple[str, LocalClient]] = []
+
+    def client(self, client_id: str = "") -> LocalClient:
+        """创建客户端"""
+        return LocalClient(self, client_id)
+
+    def _subscribe(self, client: LocalClient, topic: str) -> None:
+        with self._lock:
+            if (topic, client) not in self._subscriptions:
+                self._subscriptions.append((topic, client))
+
+    def _unsubscribe(self, client: LocalClient) -> None:
+        with self._lock:
+            self._subscriptions = [(topic, subscriber) for topic, subscriber
+                                   in self._subscriptions if subscriber is not client]
+
+    def _route(self, message: _Message) -> None:
+        with self._lock:
+            subscribers = {id(client): client for topic, client in self._subscriptions
+                           if mqtt.topic_matches_sub(topic, message.topic)}
+        for client in subscribers.values():
+            client._inbox.put(message)
+
+
+class RoundTripLoad:
+    """发送带关联ID的命令并统计命令到状态的往返延迟"""
+
+    def __init__(self, client: Any, device_prefix: str, commands: Dict[str, Dict[str, Any]],
+                 concurrency: int = 100, device_rate: float = 1.0, timeout: float = 5.0,
+                 qos: int = 0):
+        """
+        初始化往返延迟测试
+
+        Args:
+            client (Any): 已连接的客户端（paho 客户端或 LocalClient），由调用方启动网络循环
+            device_prefix (str): 设备主题前缀
+            commands (Dict[str, Dict[str, Any]]): 设备ID到该设备使用的命令消息的映射
+            concurrency (int): 最多同时在途的命令数
+            device_rate (float): 每台设备每秒最多发送的命令数
+            timeout (float): 命令等待状态的最长时间（秒），超时记为丢失
+            qos (int): 控制消息的 MQTT QoS
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if not commands:
+            raise ValueError("至少需要一台设备")
+        if concurrency < 1 or device_rate <= 0 or timeout <= 0:
+            raise ValueError("并发度、设备命令速率和超时时间必须大于0")
+        self.client = client
+        self.device_prefix = device_prefix
+        self.commands = commands
+        self.concurrency = concurrency
+        self.device_rate = device_rate
+        self.timeout = timeout
+        self.qos = qos
+        self.histogram = LatencyHistogram()
+        self.sent = 0
+        self.completed = 0
+        self.lost = 0
+        self.unmatched = 0
+        self._run = f"{os.getpid()}-{time.monotonic_ns()}"
+        self._seq = count(1)
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(concurrency)
+        self._pending: Dict[str, float] = {}  # 关联ID -> 发送时间
+        self._seconds = 0.0
+        client.on_message = self.on_message
+        client.subscribe(f"{device_prefix}/status/+")
+
+    def on_message(self, client, userdata, msg) -> None:
+        """匹配状态消息中的关联ID（在客户端网络线程中调用）"""
+        received = time.perf_counter()
+        # 关联ID是状态消息的第一个字段，其他状态消息（定期发布）不需要解码
+        if not msg.payload.startswith(b'{"' + CORRELATION_KEY.encode() + b'"'):
+            return
+        try:
+            cid = json.loads(msg.payload).get(CORRELATION_KEY)
+        except ValueError:
+            return
+        with self._lock:
+            sent = self._pending.pop(cid, None)
+            if sent is None:
+                # 已超时，或是其他测试进程的命令
+                self.unmatched += 1
+                return
+            self.completed += 1
+            self.histogram.record(received - sent)
+        self._slots.release()
+
+    def _expire(self, now: float) -> None:
+        """把超时的命令记为丢失并释放并发名额"""
+        deadline = now - self.timeout
+        with self._lock:
+            expired = [cid for cid, sent in self._pending.items() if sent < deadline]
+            for cid in expired:
+                del self._pending[cid]
+            self.lost += len(expired)
+        for _ in expired:
+            self._slots.release()
+
+    def run(self, duration: float) -> Dict[str, Any]:
+        """
+        持续发送命令 duration 秒，再等待在途命令的状态（最多 timeout 秒）
+
+        设备按下一次允许发送的时间排成最小堆，依次取出最早可以发送的设备；
+        并发名额用完时等待状态返回。
+
+        Args:
+            duration (float): 发送命令的时长（秒）
+
+        Returns:
+            Dict[str, Any]: 统计结果（见 stats）
+        """
+        interval = 1 / self.device_rate
+        devices = [(0.0, index, device_id) for index, device_id in enumerate(self.commands)]
+        heapq.heapify(devices)
+        topics = {device_id: f"{self.device_prefix}/control/{device_id}" for device_id in self.commands}
+        started = time.perf_counter()
+        end = started + duration
+        last_expire = started
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if now - last_expire >= 0.1:
+                self._expire(now)
+                last_expire = now
+            ready, index, device_id = devices[0]
+            if ready > now:
+                time.sleep(min(ready, end) - now)
+                continue
+            if not self._slots.acquire(timeout=min(0.1, end - now)):
+                continue
+            cid = f"{self._run}-{next(self._seq)}"
+            payload = json.dumps({**self.commands[device_id], CORRELATION_KEY: cid})
+            sent = time.perf_counter()
+            with self._lock:
+                self._pending[cid] = sent
+                self.sent += 1
+            self.client.publish(topics[device_id], payload, self.qos)
+            heapq.heapreplace(devices, (sent + interval, index, device_id))
+        # 等待在途命令
+        drain_end = time.perf_counter() + self.timeout
+        while self._pending and time.perf_counter() < drain_end:
+            time.sleep(0.01)
+        self._expire(float("inf"))
+        self._seconds = time.perf_counter() - started
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        统计结果
+
+        Returns:
+            Dict[str, Any]: 发送数、完成数、丢失数、运行时间（秒）、吞吐量（完成的往返/秒）和往返延迟（毫秒）
+        """
+        with self._lock:
+            return {
+                "devices": len(self.commands),
+                "concurrency": self.concurrency,
+                "sent": self.sent,
+                "completed": self.completed,
+                "lost": self.lost,
+                "unmatched": self.unmatched,
+                "seconds": self._seconds,
+                "throughput": self.completed / self._seconds if self._seconds else 0.0,
+                "latency_ms": self.histogram.summary(),
+            }
@@ -0,0 +1,221 @@
+"""
+设备状态发布调度模块
+
+用最小堆为每个设备维护下一次发布时间，替代"全部发布后固定 sleep"的循环：
+- 每个设备或设备类型可以有自己的发布周期
+- 新设备的初始相位按黄金分割序列错开，发布均匀分散在整个周期内
+- 下一次发布时间以上一次的计划时间为基准累加，不受发布耗时影响，不会漂移
+- 抖动只作用于单次发布时间，不会累积
+- 落后超过一个完整周期时记为一次超限（overrun），并跳过错过的周期而不是集中补发
+- 添加、删除设备与取出到期设备可以在不同线程中进行
+"""
+
+from typing import Callable, Dict, List, Optional
+import heapq
+import itertools
+import random
+import threading
+
+import numpy as np
+
+from . import clock as sim_clock
+
+# 黄金分割比例，用于生成低差异的初始相位序列
+_GOLDEN = 0.6180339887498949
+
+
+def parse_intervals(spec: Optional[str]) -> Dict[str, float]:
+    """
+    解析按设备类型配置的发布周期
+
+    Args:
+        spec (Optional[str]): 形如 "thermostat=5,smoke_detector=30" 的配置字符串
+
+    Returns:
+        Dict[str, float]: 设备类型到发布周期（秒）的映射
+    """
+    intervals = {}
+    if not spec:
+        return intervals
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        device_type, _, value = item.partition("=")
+        intervals[device_type.strip()] = float(value)
+    return intervals
+
+
+class PublishScheduler:
+    """基于最小堆的设备发布调度器"""
+
+    def __init__(self, interval: float = 10.0, jitter: float = 0.0,
+                 type_intervals: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None,
+                 clock: Callable[[], float] = sim_clock.monotonic):
+        """
+        初始化发布调度器
+
+        Args:
+            interval (float): 默认发布周期（秒）
+            jitter (float): 单次发布时间的随机抖动，占周期的比例（0-0.5）
+            type_intervals (Optional[Dict[str, float]]): 按设备类型的发布周期
+            seed (Optional[int]): 抖动随机数种子
+            clock (Callable[[], float]): 单调时钟，默认为模拟时钟
+        """
+        if not 0 <= jitter <= 0.5:
+            raise ValueError("jitter 必须在 0 到 0.5 之间")
+        self.interval = interval
+        self.jitter = jitter
+        self.type_intervals = dict(type_intervals or {})
+        self.clock = clock
+        self._heap: List[tuple] = []
+        self._unordered = False  # add_many 追加的条目尚未整理成堆
+        self._entries: Dict[str, int] = {}  # 设备ID -> 当前有效的堆条目序号
+        self._seq = itertools.count()
+        self._phases: Dict[float, int] = {}  # 发布周期 -> 已分配的相位数
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.overruns = 0
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._entries
+
+    def interval_for(self, device_type: Optional[str] = None) -> float:
+        """获取设备类型对应的发布周期"""
+        return self.type_intervals.get(device_type, self.interval)
+
+    def add(self, device_id: str, device_type: Optional[str] = None,
+            interval: Optional[float] = None) -> None:
+        """
+        添加设备到调度器
+
+        Args:
+            device_id (str): 设备ID
+            device_type (Optional[str]): 设备类型，用于查找类型发布周期
+            interval (Optional[float]): 显式指定的发布周期，优先于类型配置
+        """
+        if interval is None:
+            interval = self.interval_for(device_type)
+        if interval <= 0:
+            raise ValueError("发布周期必须大于0")
+        with self._lock:
+            index = self._phases.get(interval, 0)
+            self._phases[interval] = index + 1
+            phase = (index * _GOLDEN) % 1.0 * interval
+            self._push(device_id, self.clock() + phase, interval)
+
+    def add_many(self, device_ids: List[str], device_type: Optional[str] = None,
+                 interval: Optional[float] = None) -> None:
+        """
+        批量添加同一发布周期的设备（恢复快照、批量创建时使用）
+
+        相位、抖动和序号与逐个调用 add 相同，但新条目只追加到堆数组，
+        在下一次读取或插入时统一做一次 heapify（连续多次批量添加也只整理一次），
+        而不是每个设备一次 heappush。
+
+        Args:
+            device_ids (List[str]): 设备ID
+            device_type (Optional[str]): 设备类型，用于查找类型发布周期
+            interval (Optional[float]): 显式指定的发布周期，优先于类型配置
+        """
+        if interval is None:
+            interval = self.interval_for(device_type)
+        if interval <= 0:
+            raise ValueError("发布周期必须大于0")
+        count = len(device_ids)
+        if not count:
+            return
+        with self._lock:
+            first = self._phases.get(interval, 0)
+            self._phases[interval] = first + count
+            bases = self.clock() + np.arange(first, first + count) * _GOLDEN % 1.0 * interval
+            if self.jitter:
+                # 与 random.uniform(-jitter, jitter) 相同的算式和随机数序列
+                draw = self._rng.random
+                samples = np.fromiter((draw() for _ in range(count)), dtype=np.float64, count=count)
+                dues = (bases + (-self.jitter + 2 * self.jitter * samples) * interval).tolist()
+            else:
+                dues = bases.tolist()
+            bases = bases.tolist()
+            start = next(self._seq)
+            self._seq = itertools.count(start + count)
+            seqs = range(start, start + count)
+            self._entries.update(zip(device_ids, seqs))
+            intervals = itertools.repeat(interval, count)
+            self._heap.extend(zip(dues, seqs, device_ids, bases, intervals))
+            self._unordered = True
+
+    def remove(self, device_id: str) -> None:
+        """从调度器移除设备（堆中的旧条目在弹出时丢弃）"""
+        with self._lock:
+            self._entries.pop(device_id, None)
+
+    def next_due(self) -> Optional[float]:
+        """返回最近一次待发布的时间，没有设备时返回 None"""
+        with self._lock:
+            heap = self._ordered_heap()
+            while heap and self._entries.get(heap[0][2]) != heap[0][1]:
+                heapq.heappop(heap)
+            return heap[0][0] if heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """
+        取出所有到期的设备，并安排它们的下一次发布
+
+        Args:
+            now (Optional[float]): 当前时间，默认读取时钟
+
+        Returns:
+            List[str]: 到期需要发布的设备ID
+        """
+        if now is None:
+            now = self.clock()
+        due_ids = []
+        with self._lock:
+            heap = self._ordered_heap()
+            while heap and heap[0][0] <= now:
+                due, seq, device_id, base, interval = heapq.heappop(heap)
+                if self._entries.get(device_id) != seq:
+                    continue
+                lag = now - due
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                if lag > interval:
+                    # 落后超过一个周期：记录超限并跳过错过的周期
+                    self.overruns += 1
+                    base += (now - base) // interval * interval
+                due_ids.append(device_id)
+                self._push(device_id, base + interval, interval)
+            self.published += len(due_ids)
+        return due_ids
+
+    def stats(self) -> Dict[str, float]:
+        """返回调度统计信息"""
+        return {
+            "devices": len(self._entries),
+            "published": self.published,
+            "overruns": self.overruns,
+            "max_lag": self.max_lag,
+        }
+
+    def _push(self, device_id: str, base: float, interval: float) -> None:
+        """按计划时间（加抖动）入堆（调用方持有锁）"""
+        due = base
+        if self.jitter:
+            due += self._rng.uniform(-self.jitter, self.jitter) * interval
+        seq = next(self._seq)
+        self._entries[device_id] = seq
+        heapq.heappush(self._ordered_heap(), (due, seq, device_id, base, interval))
+
+    def _ordered_heap(self) -> List[tuple]:
+        """返回整理好的堆（调用方持有锁）"""
+        if self._unordered:
+            heapq.heapify(self._heap)
+            self._unordered = False
+        return self._heap
@@ -0,0 +1,361 @@
+"""
+传感器负载生成模块
+
+原来的 sensor_test.py 每 5 秒发布一条随机读数（7 种传感器类型、每种 4 个ID），无法用于压测数据接入链路。
+本模块按目标速率持续发布传感器读数：
+- 速率（条/秒）由令牌桶控制，所有发布连接共享同一个令牌桶，长时间运行的平均速率等于目标速率
+- 每种传感器类型可以有成千上万个ID；读数按批次向量化生成，类型、ID 和取值范围来自同一张 SENSOR_TYPES 表
+- 可以使用多个 MQTT 连接并行发布，每个连接一个发布线程
+- 发布延迟为调用 publish 到 paho 确认发送完成（on_publish；QoS 0 为写入套接字，QoS 1 为收到 PUBACK）的时间，
+  定期和结束时输出实际速率与延迟分位数
+
+消息格式与 sensor_test.py 相同，发布到 .env 中的 TOPIC：
+    {"type": "temperature", "id": 1, "value": 23}
+
+用法:
+    python -m old.sensor_load --rate 5000 --ids 1000 --connections 4 --duration 60
+"""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from .randomness import generator
+
+# 传感器类型及取值范围（闭区间，整数）
+SENSOR_TYPES = {
+    "temperature": (5, 35),           # 温度：摄氏度
+    "humidity": (30, 90),             # 湿度：%
+    "soil_moisture": (0, 100),        # 土壤湿度：%
+    "light_intensity": (0, 1000),     # 光照强度：lux
+    "air_quality_index": (0, 500),    # 空气质量指数
+    "co2_level": (350, 2000),         # CO2浓度：ppm
+    "pressure": (950, 1050),          # 压力：hPa
+}
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        初始化令牌桶
+
+        Args:
+            rate (float): 每秒补充的令牌数
+            burst (Optional[float]): 桶容量，默认为 0.1 秒的令牌数（至少 1 个）
+            clock (Callable[[], float]): 单调时钟
+            sleep (Callable[[float], None]): 等待函数
+
+        Raises:
+            ValueError: 速率不是正数
+        """
+        if rate <= 0:
+            raise ValueError("速率必须大于0")
+        self.rate = rate
+        self.burst = max(1.0, rate * 0.1) if burst is None else burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> float:
+        """
+        取出令牌，不足时等待
+
+        令牌不足时先预支（余额变为负数）再在锁外等待，并发的取用者按先后顺序排队，总速率不超过 rate。
+
+        Args:
+            count (int): 令牌数
+
+        Returns:
+            float: 等待的时间（秒）
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class SensorGenerator:
+    """按批次向量化生成传感器读数消息"""
+
+    def __init__(self, ids_per_type: int = 1000, types: Optional[Sequence[str]] = None,
+                 rng: Optional[np.random.Generator] = None):
+        """
+        初始化读数生成器
+
+        Args:
+            ids_per_type (int): 每种传感器类型的ID数（ID 为 1 到 ids_per_type）
+            types (Optional[Sequence[str]]): 传感器类型，默认为 SENSOR_TYPES 中的全部类型
+            rng (Optional[np.random.Generator]): 随机数流，默认由运行种子派生
+
+        Raises:
+            ValueError: ID 数不是正数，或传感器类型未知
+        """
+        if ids_per_type < 1:
+            raise ValueError("每种类型的ID数必须大于0")
+        types = list(SENSOR_TYPES if types is None else types)
+        if not types:
+            raise ValueError("至少需要一种传感器类型")
+        unknown = [name for name in types if name not in SENSOR_TYPES]
+        if unknown:
+            raise ValueError(f"未知的传感器类型: {', '.join(unknown)}")
+        self.types = types
+        self.ids_per_type = ids_per_type
+        self.rng = generator("sensor") if rng is None else rng
+        self._low = np.array([SENSOR_TYPES[name][0] for name in types], dtype=np.int64)
+        self._high = np.array([SENSOR_TYPES[name][1] for name in types], dtype=np.int64)
+        # 与 json.dumps 的输出相同，按类型预先拼好字符串模板
+        self._templates = [f'{{"type": "{name}", "id": %d, "value": %d}}'.encode("utf-8")
+                           for name in types]
+
+    def batch(self, count: int) -> List[bytes]:
+        """
+        生成一批读数消息
+
+        Args:
+            count (int): 消息数
+
+        Returns:
+            List[bytes]: JSON 消息
+        """
+        kinds = self.rng.integers(0, len(self.types), count)
+        ids = self.rng.integers(1, self.ids_per_type, count, endpoint=True)
+        values = self.rng.integers(self._low[kinds], self._high[kinds], endpoint=True)
+        templates = self._templates
+        return [templates[kind] % (sensor_id, value) for kind, sensor_id, value
+                in zip(kinds.tolist(), ids.tolist(), values.tolist())]
+
+
+class _Connection:
+    """一个发布连接及其发布延迟记录"""
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.sent = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[int, float] = {}   # mid -> 调用 publish 的时间
+        self._finished: Dict[int, float] = {}  # 在 publish 返回之前就完成的消息
+        self.latencies: Deque[float] = deque(maxlen=100000)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.completed = 0
+        client.on_publish = self.on_publish
+
+    def publish(self, topic: str, payload: bytes, qos: int) -> None:
+        start = time.perf_counter()
+        info = self.client.publish(topic, payload, qos)
+        with self._lock:
+            self.sent += 1
+            if info.rc != 0:
+                self.errors += 1
+                self._finished.pop(info.mid, None)
+                return
+            finished = self._finished.pop(info.mid, None)
+            if finished is None:
+                self._pending[info.mid] = start
+            else:
+                self._record(finished - start)
+
+    def on_publish(self, client, userdata, mid) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            start = self._pending.pop(mid, None)
+            if start is None:
+                self._finished[mid] = now
+            else:
+                self._record(now - start)
+
+    def _record(self, latency: float) -> None:
+        self.completed += 1
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        self.latencies.append(latency)
+
+
+class SensorLoad:
+    """多连接、限速的传感器负载生成器"""
+
+    def __init__(self, clients: Sequence[Any], topic: str, rate: float,
+                 ids_per_type: int = 1000, types: Optional[Sequence[str]] = None,
+                 batch_size: int = 100, qos: int = 0):
+        """
+        初始化负载生成器
+
+        Args:
+            clients (Sequence[Any]): 已连接的 paho 客户端，每个客户端一个发布线程
+            topic (str): 发布主题
+            rate (float): 目标速率（条/秒，所有连接合计）
+            ids_per_type (int): 每种传感器类型的ID数
+            types (Optional[Sequence[str]]): 传感器类型，默认为全部类型
+            batch_size (int): 每次从令牌桶取出并生成的消息数
+            qos (int): MQTT QoS
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if not clients:
+            raise ValueError("至少需要一个发布连接")
+        if batch_size < 1:
+            raise ValueError("批次大小必须大于0")
+        self.topic = topic
+        self.qos = qos
+        self.batch_size = batch_size
+        # 桶容量至少容纳一个批次，否则每个批次都要等待
+        self.bucket = TokenBucket(rate, burst=max(batch_size, rate * 0.1))
+        self.connections = [_Connection(client) for client in clients]
+        self.generators = [SensorGenerator(ids_per_type, types, generator("sensor", str(index)))
+                           for index in range(len(clients))]
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started: Optional[float] = None
+        self._stopped: Optional[float] = None
+
+    def start(self) -> None:
+        """启动发布线程"""
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._stopped = None
+        for index in range(len(self.connections)):
+            thread = threading.Thread(target=self._run, args=(index,),
+                                      name=f"sensor-load-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """停止发布线程（等待当前批次发布完）"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        self._stopped = time.monotonic()
+
+    def _run(self, index: int) -> None:
+        connection = self.connections[index]
+        sensor = self.generators[index]
+        while not self._stop.is_set():
+            self.bucket.acquire(self.batch_size)
+            if self._stop.is_set():
+                return
+            for payload in sensor.batch(self.batch_size):
+                connection.publish(self.topic, payload, self.qos)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        运行统计
+
+        Returns:
+            Dict[str, Any]: 发布数、失败数、运行时间（秒）、实际速率（条/秒）和发布延迟（毫秒，分位数基于最近的样本）
+        """
+        samples: List[float] = []
+        sent = errors = completed = 0
+        latency_total = latency_max = 0.0
+        for connection in self.connections:
+            with connection._lock:
+                sent += connection.sent
+                errors += connection.errors
+                completed += connection.completed
+                latency_total += connection.latency_total
+                latency_max = max(latency_max, connection.latency_max)
+                samples.extend(connection.latencies)
+        samples.sort()
+        end = time.monotonic() if self._stopped is None else self._stopped
+        seconds = end - self._started if self._started is not None else 0.0
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "connections": len(self.connections),
+            "target_rate": self.bucket.rate,
+            "sent": sent,
+            "errors": errors,
+            "seconds": seconds,
+            "rate": sent / seconds if seconds > 0 else 0.0,
+            "latency_ms": {
+                "avg": latency_total / completed * 1000 if completed else 0.0,
+                "p50": percentile(0.5),
+                "p90": percentile(0.9),
+                "p99": percentile(0.99),
+                "max": latency_max * 1000,
+            },
+        }
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """把统计信息格式化为一行文本"""
+    latency = stats["latency_ms"]
+    return (f"sent {stats['sent']} ({stats['errors']} errors) in {stats['seconds']:.1f}s, "
+            f"rate {stats['rate']:.0f}/{stats['target_rate']:.0f} msg/s, "
+            f"latency p50 {latency['p50']:.2f} ms p90 {latency['p90']:.2f} ms "
+            f"p99 {latency['p99']:.2f} ms max {latency['max']:.2f} ms")
+
+
+def main():
+    import paho.mqtt.client as mqtt
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="传感器负载生成器")
+    parser.add_argument("--rate", type=float, default=1000, help="目标速率（条/秒）")
+    parser.add_argument("--ids", type=int, default=1000, help="每种传感器类型的ID数")
+    parser.add_argument("--types", default=None,
+                        help=f"传感器类型（逗号分隔），默认全部: {','.join(SENSOR_TYPES)}")
+    parser.add_argument("--connections", type=int, default=1, help="发布连接数")
+    parser.add_argument("--batch", type=int, default=100, help="每批生成的消息数")
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=0, help="MQTT QoS")
+    parser.add_argument("--duration", type=float, default=None, help="运行时长（秒），默认直到 Ctrl+C")
+    parser.add_argument("--report", type=float, default=5, help="统计输出周期（秒）")
+    parser.add_argument("--topic", default=os.getenv("TOPIC"), help="发布主题，默认为 .env 中的 TOPIC")
+    args = parser.parse_args()
+
+    clients = []
+    for index in range(args.connections):
+        client = mqtt.Client(client_id=f"SensorLoad-{os.getpid()}-{index}")
+        # 默认的在途消息上限（20）会限制 QoS 1 的吞吐量
+        client.max_inflight_messages_set(1000)
+        client.connect(os.getenv("BROKER_IP"), int(os.getenv("BROKER_PORT")), 60)
+        client.loop_start()
+        clients.append(client)
+
+    types = args.types.split(",") if args.types else None
+    load = SensorLoad(clients, args.topic, args.rate, ids_per_type=args.ids, types=types,
+                      batch_size=args.batch, qos=args.qos)
+    deadline = None if args.duration is None else time.monotonic() + args.duration
+    load.start()
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            remaining = args.report if deadline is None else min(args.report, deadline - time.monotonic())
+            time.sleep(max(0.0, remaining))
+            print(format_stats(load.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        load.stop()
+        print("模拟传感器已停止")
+        print(format_stats(load.stats()))
+        for client in clients:
+            client.loop_stop()
+            client.disconnect()
+
+
+if __name__ == '__main__':
+    main()
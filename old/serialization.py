@@ -0,0 +1,104 @@
+"""
+状态序列化模块
+
+提供可替换的 JSON 编码器：安装了 orjson 时默认使用 orjson，否则回退到标准库 json。
+编码结果统一为 UTF-8 bytes，可以直接作为 MQTT 消息体或 HTTP 响应体，
+也可以用 join_object 把多段已编码的 JSON 拼接成一个对象而无需重新编码。
+"""
+
+from typing import Any, Callable, Iterable, Optional, Tuple
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    """标准库编码器"""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    """orjson 编码器（不支持的类型回退到标准库）"""
+    try:
+        return orjson.dumps(obj)
+    except TypeError:
+        return _stdlib_dumps(obj)
+
+
+# 可用的编码器
+ENCODERS = {"json": _stdlib_dumps}
+if orjson is not None:
+    ENCODERS["orjson"] = _orjson_dumps
+
+_dumps: Callable[[Any], bytes] = ENCODERS.get("orjson", _stdlib_dumps)
+
+
+def set_encoder(encoder: Optional[str] = None,
+                func: Optional[Callable[[Any], bytes]] = None) -> str:
+    """
+    选择 JSON 编码器
+
+    Args:
+        encoder (Optional[str]): 编码器名称（"orjson"、"json"），None 表示自动选择
+        func (Optional[Callable[[Any], bytes]]): 自定义编码函数，优先于名称
+
+    Returns:
+        str: 实际使用的编码器名称
+    """
+    global _dumps
+    if func is not None:
+        _dumps = func
+        return getattr(func, "__name__", "custom")
+    if encoder is None:
+        encoder = "orjson" if "orjson" in ENCODERS else "json"
+    if encoder not in ENCODERS:
+        raise ValueError(f"不可用的JSON编码器: {encoder}")
+    _dumps = ENCODERS[encoder]
+    return encoder
+
+
+def dumps(obj: Any) -> bytes:
+    """使用当前编码器把对象编码为 JSON bytes"""
+    return _dumps(obj)
+
+
+def join_object(items: Iterable[Tuple[str, bytes]]) -> bytes:
+    """
+    把已编码的值拼接成一个 JSON 对象
+
+    Args:
+        items: (键, 已编码的JSON值) 序列
+
+    Returns:
+        bytes: {"键": 值, ...} 的 JSON bytes
+    """
+    parts = [_stdlib_dumps(key) + b":" + value for key, value in items]
+    return b"{" + b",".join(parts) + b"}"
+
+
+def prepend_field(payload: bytes, key: str, value: Any) -> bytes:
+    """
+    在已编码的 JSON 对象开头插入一个字段（不重新编码原对象）
+
+    Args:
+        payload (bytes): 已编码的 JSON 对象
+        key (str): 字段名
+        value (Any): 字段值
+
+    Returns:
+        bytes: {"键": 值, ...原对象的字段} 的 JSON bytes
+    """
+    field = _stdlib_dumps(key) + b":" + _dumps(value)
+    rest = payload[1:]
+    if rest.lstrip().startswith(b"}"):
+        return b"{" + field + rest
+    return b"{" + field + b"," + rest
+
+
+# 允许通过环境变量指定编码器
+if os.getenv("JSON_ENCODER"):
+    set_encoder(os.getenv("JSON_ENCODER"))
@@ -0,0 +1,507 @@
+"""
+多进程分片模拟器
+
+单进程模式下 Flask、paho 网络线程和模拟线程共用一个 GIL。
+分片模式按设备ID的稳定哈希把设备划分到 N 个工作进程：
+- 每个工作进程（ShardWorker）拥有自己的列式存储、发布调度器、MQTT 客户端和节拍循环
+- 每个分片只订阅自己设备的控制主题（按批次合并到 SUBSCRIBE 报文中），
+  Broker 只把命令投递给设备所属的分片；通配符订阅会让每条命令发给全部 N 个分片
+- 主进程中的 ShardSupervisor 负责启动工作进程，把 REST 调用路由到设备所属的分片，
+  并合并所有分片的设备列表
+
+启动方式:
+    python -m old.sharding --shards 4
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+
+from flask import Flask, Response, render_template, jsonify, request
+import paho.mqtt.client as mqtt
+from dotenv import load_dotenv
+
+from .devices import DEVICE_TYPES
+from .fleet import FleetStore
+from .scheduler import PublishScheduler, parse_intervals
+from .batching import hash_bucket
+from .randomness import derive_seed, run_seed, set_run_seed
+from .serialization import join_object, prepend_field
+from .commands import CORRELATION_KEY, CommandError, apply_many, correlation_id
+from . import clock as sim_clock
+
+
+# 每个 SUBSCRIBE 报文包含的控制主题数
+SUBSCRIBE_BATCH = 500
+
+# 等待分片响应时检查工作进程是否存活的间隔（秒）
+LIVENESS_INTERVAL = 0.5
+
+
+class ShardUnavailable(ConnectionError):
+    """分片工作进程已退出，请求无法完成"""
+
+
+def shard_for(device_id: str, shards: int) -> int:
+    """计算设备所属分片（稳定哈希，与进程和运行无关）"""
+    return hash_bucket(device_id, shards)
+
+
+def load_config() -> Dict[str, Any]:
+    """从环境变量读取分片模拟器配置"""
+    load_dotenv()
+    broker_port = os.getenv("BROKER_PORT")
+    return {
+        "broker_ip": os.getenv("BROKER_IP"),
+        "broker_port": int(broker_port) if broker_port else 1883,
+        "device_prefix": os.getenv("DEVICE_PREFIX"),
+        "tick_interval": float(os.getenv("SIM_TICK_INTERVAL", "10")),
+        "publish_interval": float(os.getenv("PUBLISH_INTERVAL", "10")),
+        "publish_jitter": float(os.getenv("PUBLISH_JITTER", "0.1")),
+        "publish_intervals": parse_intervals(os.getenv("PUBLISH_INTERVALS")),
+        "seed": run_seed(),
+    }
+
+
+class _NullClient:
+    """不连接 Broker 的 MQTT 客户端替身，只统计发布次数（用于测试和基准）"""
+
+    def __init__(self):
+        self.published = 0
+
+    def publish(self, topic, payload=None, *args, **kwargs):
+        self.published += 1
+
+    def subscribe(self, topic, *args, **kwargs):
+        pass
+
+    def unsubscribe(self, topic, *args, **kwargs):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+class ShardWorker:
+    """分片工作进程：管理本分片的设备并运行节拍与发布循环"""
+
+    def __init__(self, index: int, shards: int, config: Dict[str, Any]):
+        """
+        初始化分片
+
+        Args:
+            index (int): 分片编号
+            shards (int): 分片总数
+            config (Dict[str, Any]): 配置（见 load_config）
+        """
+        self.index = index
+        self.shards = shards
+        self.config = config
+        self.prefix = config["device_prefix"]
+        # 本进程的运行种子由配置的运行种子和分片编号派生：设备类按类型划分的逐个取值流、
+        # 列式存储和调度器的随机数流都因此各分片不同，同一种子和分片数下仍可复现
+        shard_seed = derive_seed("shard", str(index), seed=config.get("seed"))
+        set_run_seed(shard_seed)
+        self.fleet = FleetStore(shard_seed)
+        self.devices: Dict[str, Any] = {}
+        self.control_routes: Dict[str, str] = {}
+        self.scheduler = PublishScheduler(
+            interval=config["publish_interval"],
+            jitter=config["publish_jitter"],
+            type_intervals=config["publish_intervals"],
+            seed=derive_seed("scheduler"),
+        )
+        self.commands = 0
+        # on_message 在 paho 网络线程中执行，与主循环的节拍、发布和主进程请求共用这把锁
+        self._lock = threading.Lock()
+        self.client = self._connect()
+
+    def _connect(self):
+        """连接 Broker；未配置 Broker 时使用不联网的替身"""
+        if not self.config["broker_ip"]:
+            return _NullClient()
+        client = mqtt.Client(client_id=f"WebSimulator-shard{self.index}")
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+        client.connect(self.config["broker_ip"], self.config["broker_port"], 60)
+        client.loop_start()
+        return client
+
+    def on_connect(self, client, userdata, flags, rc):
+        """连接（含重连）后订阅本分片所有设备的控制主题"""
+        with self._lock:
+            topics = list(self.control_routes)
+        self._subscribe(client, topics)
+
+    @staticmethod
+    def _subscribe(client, topics: List[str]) -> None:
+        """按 SUBSCRIBE_BATCH 分批订阅控制主题（未连接时由 on_connect 补订）"""
+        for start in range(0, len(topics), SUBSCRIBE_BATCH):
+            client.subscribe([(topic, 0) for topic in topics[start:start + SUBSCRIBE_BATCH]])
+
+    def on_message(self, client, userdata, msg):
+        """处理接收到的MQTT消息（其他分片的设备直接忽略）"""
+        try:
+            command = json.loads(msg.payload)
+            with self._lock:
+                device_id = self.control_routes.get(msg.topic)
+                if device_id is None:
+                    return
+                self.devices[device_id].handle_command(command)
+                self.commands += 1
+                cid = correlation_id(command)
+                if cid is not None:
+                    # 带关联ID的命令立即发布状态
+                    self.publish_status(device_id, cid)
+        except Exception as e:
+            print(f"Shard {self.index} error handling message: {e}")
+
+    def publish_status(self, device_id: str, cid: Any = None) -> None:
+        """发布设备状态（可带回命令的关联ID）"""
+        payload = self.devices[device_id].to_json()
+        if cid is not None:
+            payload = prepend_field(payload, CORRELATION_KEY, cid)
+        self.client.publish(f"{self.prefix}/status/{device_id}", payload)
+
+    # 以下为主进程可调用的操作，返回 (HTTP状态码, 结果)
+
+    def _add(self, device_type: str, device_id: str) -> Optional[str]:
+        """添加设备，返回其控制主题；ID已存在时返回 None"""
+        if device_id in self.devices:
+            return None
+        self.devices[device_id] = self.fleet.add(DEVICE_TYPES[device_type], device_id)
+        self.scheduler.add(device_id, device_type)
+        topic = f"{self.prefix}/control/{device_id}"
+        self.control_routes[topic] = device_id
+        return topic
+
+    def op_add(self, device_type: str, device_id: str) -> Tuple[int, Any]:
+        topic = self._add(device_type, device_id)
+        if topic is None:
+            return 400, {'error': 'Device ID already exists'}
+        self._subscribe(self.client, [topic])
+        return 200, {'message': 'Device added successfully'}
+
+    def op_add_many(self, items: List[Tuple[str, str]]) -> Tuple[int, Any]:
+        topics = [self._add(device_type, device_id) for device_type, device_id in items]
+        topics = [topic for topic in topics if topic is not None]
+        self._subscribe(self.client, topics)
+        return 200, {'added': len(topics), 'skipped': len(items) - len(topics)}
+
+    def op_remove(self, device_id: str) -> Tuple[int, Any]:
+        if device_id not in self.devices:
+            return 404, {'error': 'Device not found'}
+        topic = f"{self.prefix}/control/{device_id}"
+        self.control_routes.pop(topic, None)
+        self.client.unsubscribe(topic)
+        self.scheduler.remove(device_id)
+        self.fleet.remove(self.devices.pop(device_id))
+        return 200, {'message': 'Device removed successfully'}
+
+    def op_command(self, device_id: str, command: Any) -> Tuple[int, Any]:
+        if device_id not in self.devices:
+            return 404, {'error': 'Device not found'}
+        # 与单进程模式一样按命令表校验，无效命令返回 400 且不修改设备
+        try:
+            apply_many([self.devices[device_id]], command)
+        except CommandError as e:
+            return 400, {'error': str(e)}
+        self.commands += 1
+        self.publish_status(device_id)
+        return 200, {'message': 'Command sent successfully'}
+
+    def op_get(self, device_id: str) -> Tuple[int, Any]:
+        if device_id not in self.devices:
+            return 404, {'error': 'Device not found'}
+        return 200, self.devices[device_id].to_json()
+
+    def op_list(self) -> Tuple[int, Any]:
+        return 200, join_object(
+            (device_id, device.to_json()) for device_id, device in self.devices.items())
+
+    def op_stats(self) -> Tuple[int, Any]:
+        stats = self.scheduler.stats()
+        stats.update(shard=self.index, commands=self.commands)
+        if isinstance(self.client, _NullClient):
+            stats["published"] = self.client.published
+        return 200, stats
+
+    def serve(self, conn) -> None:
+        """
+        运行分片主循环
+
+        用管道的 poll 代替 sleep：等待下一次发布或节拍的同时响应主进程请求。
+        发布、节拍和请求处理都持有 _lock，等待期间释放，MQTT 命令在此时执行。
+        """
+        next_tick = sim_clock.monotonic()
+        while True:
+            now = sim_clock.monotonic()
+            with self._lock:
+                for device_id in self.scheduler.pop_due(now):
+                    if device_id in self.devices:
+                        self.publish_status(device_id)
+                if now >= next_tick:
+                    self.fleet.tick()
+                    next_tick += self.config["tick_interval"]
+                    if next_tick < now:
+                        next_tick = now + self.config["tick_interval"]
+                next_due = self.scheduler.next_due()
+
+            wake = next_tick if next_due is None else min(next_due, next_tick)
+            while conn.poll(sim_clock.real_delay(wake - sim_clock.monotonic())):
+                op, args = conn.recv()
+                if op == "stop":
+                    self.client.loop_stop()
+                    self.client.disconnect()
+                    conn.send((200, None))
+                    return
+                try:
+                    with self._lock:
+                        result = getattr(self, f"op_{op}")(*args)
+                    conn.send(result)
+                except Exception as e:
+                    conn.send((500, {'error': str(e)}))
+            # 步进时钟不实际等待，在这里把模拟时间推进到下一个事件
+            sim_clock.sleep(wake - sim_clock.monotonic())
+
+
+def run_shard(index: int, shards: int, config: Dict[str, Any], conn) -> None:
+    """工作进程入口"""
+    ShardWorker(index, shards, config).serve(conn)
+
+
+class ShardSupervisor:
+    """分片监管者：启动工作进程并把请求路由到设备所属的分片"""
+
+    def __init__(self, shards: int, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化监管者
+
+        Args:
+            shards (int): 分片（工作进程）数量
+            config (Optional[Dict[str, Any]]): 配置，默认从环境变量读取
+        """
+        if shards < 1:
+            raise ValueError("分片数量必须大于0")
+        self.shards = shards
+        self.config = config if config is not None else load_config()
+        self._conns: List[Any] = []
+        self._locks: List[threading.Lock] = []
+        self._processes: List[Any] = []
+
+    def start(self) -> None:
+        """启动所有工作进程"""
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.shards):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=run_shard, args=(index, self.shards, self.config, child),
+                name=f"shard-{index}", daemon=True)
+            process.start()
+            self._conns.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+
+    def stop(self) -> None:
+        """停止所有工作进程"""
+        for index in range(len(self._conns)):
+            try:
+                self.call(index, "stop")
+            except ShardUnavailable:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._conns.clear()
+        self._locks.clear()
+        self._processes.clear()
+
+    def _send(self, shard: int, op: str, args: Tuple) -> None:
+        if not self._processes[shard].is_alive():
+            raise ShardUnavailable(f"Shard {shard} is not running")
+        try:
+            self._conns[shard].send((op, args))
+        except OSError as e:
+            raise ShardUnavailable(f"Shard {shard} is not running") from e
+
+    def _receive(self, shard: int) -> Tuple[int, Any]:
+        """
+        等待分片的响应
+
+        主进程持有管道子端的引用，工作进程退出后 recv 不会收到 EOF，
+        因此分段 poll 并检查进程是否存活，避免 HTTP 请求线程永久阻塞。
+
+        Raises:
+            ShardUnavailable: 工作进程在响应之前退出
+        """
+        conn, process = self._conns[shard], self._processes[shard]
+        while not conn.poll(LIVENESS_INTERVAL):
+            if not process.is_alive():
+                raise ShardUnavailable(f"Shard {shard} exited (code {process.exitcode})")
+        try:
+            return conn.recv()
+        except EOFError as e:
+            raise ShardUnavailable(f"Shard {shard} exited (code {process.exitcode})") from e
+
+    def call(self, shard: int, op: str, *args) -> Tuple[int, Any]:
+        """
+        向指定分片发送请求并等待结果
+
+        Raises:
+            ShardUnavailable: 分片工作进程已退出
+        """
+        with self._locks[shard]:
+            self._send(shard, op, args)
+            return self._receive(shard)
+
+    def broadcast(self, op: str, *args) -> List[Tuple[int, Any]]:
+        """
+        向所有分片并行发送请求并收集结果
+
+        Raises:
+            ShardUnavailable: 有分片工作进程已退出
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            for shard in range(len(self._conns)):
+                self._send(shard, op, args)
+            return [self._receive(shard) for shard in range(len(self._conns))]
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    def owner(self, device_id: str) -> int:
+        """设备所属分片"""
+        return shard_for(device_id, self.shards)
+
+    def add_device(self, device_type: str, device_id: str) -> Tuple[int, Any]:
+        return self.call(self.owner(device_id), "add", device_type, device_id)
+
+    def add_devices(self, items: List[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        批量添加设备：按分片分组，每个分片只需一次往返
+
+        Args:
+            items (List[Tuple[str, str]]): (设备类型, 设备ID) 列表
+
+        Returns:
+            Dict[str, int]: 添加成功和跳过（ID已存在）的设备数
+        """
+        groups: Dict[int, List[Tuple[str, str]]] = {}
+        for device_type, device_id in items:
+            groups.setdefault(self.owner(device_id), []).append((device_type, device_id))
+        totals = {'added': 0, 'skipped': 0}
+        for shard, group in groups.items():
+            _, result = self.call(shard, "add_many", group)
+            for key in totals:
+                totals[key] += result[key]
+        return totals
+
+    def remove_device(self, device_id: str) -> Tuple[int, Any]:
+        return self.call(self.owner(device_id), "remove", device_id)
+
+    def send_command(self, device_id: str, command: Any) -> Tuple[int, Any]:
+        return self.call(self.owner(device_id), "command", device_id, command)
+
+    def get_device(self, device_id: str) -> Tuple[int, Any]:
+        return self.call(self.owner(device_id), "get", device_id)
+
+    def get_devices(self) -> bytes:
+        """合并所有分片的设备状态（直接拼接各分片的 JSON）"""
+        parts = [body[1:-1] for _, body in self.broadcast("list") if body != b"{}"]
+        return b"{" + b",".join(parts) + b"}"
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """各分片的统计信息"""
+        return [stats for _, stats in self.broadcast("stats")]
+
+
+def create_app(supervisor: ShardSupervisor) -> Flask:
+    """
+    创建分片模式的 Web 应用
+
+    提供单进程模式的设备增删、查询和单设备命令接口（命令同样按命令表校验），
+    以及 GET /api/shards。以下单进程模式的功能尚不支持：
+    - 批量接口：POST /api/devices/bulk、POST /api/commands
+    - 设备列表的过滤、字段投影和分页参数，ETag/304 和 since 增量查询
+    - 事件流、状态历史、快照、集群汇总和命令队列接口（/api/events、/api/devices/<id>/history、
+      /api/snapshot、/api/stats、/api/commands/queue、/api/keyframe）
+    """
+    app = Flask(__name__)
+
+    def reply(result: Tuple[int, Any]):
+        status, body = result
+        if isinstance(body, bytes):
+            return Response(body, status=status, mimetype='application/json')
+        return jsonify(body), status
+
+    @app.errorhandler(ShardUnavailable)
+    def shard_unavailable(e):
+        """分片工作进程已退出"""
+        return jsonify({'error': str(e)}), 503
+
+    @app.route('/')
+    def index():
+        """渲染主页"""
+        return render_template('index.html', device_types=DEVICE_TYPES.keys())
+
+    @app.route('/api/devices', methods=['GET'])
+    def get_devices():
+        """获取所有设备状态"""
+        return Response(supervisor.get_devices(), mimetype='application/json')
+
+    @app.route('/api/devices', methods=['POST'])
+    def add_device():
+        """添加新设备"""
+        data = request.json
+        device_type = data.get('type')
+        device_id = data.get('id')
+        if not device_type or not device_id:
+            return jsonify({'error': 'Missing device type or ID'}), 400
+        if device_type not in DEVICE_TYPES:
+            return jsonify({'error': 'Invalid device type'}), 400
+        return reply(supervisor.add_device(device_type, device_id))
+
+    @app.route('/api/devices/<device_id>', methods=['GET'])
+    def get_device(device_id):
+        """获取单个设备状态"""
+        return reply(supervisor.get_device(device_id))
+
+    @app.route('/api/devices/<device_id>', methods=['DELETE'])
+    def remove_device(device_id):
+        """删除设备"""
+        return reply(supervisor.remove_device(device_id))
+
+    @app.route('/api/devices/<device_id>/command', methods=['POST'])
+    def send_command(device_id):
+        """发送设备控制命令"""
+        return reply(supervisor.send_command(device_id, request.get_json(silent=True)))
+
+    @app.route('/api/shards', methods=['GET'])
+    def shard_stats():
+        """各分片的统计信息"""
+        return jsonify(supervisor.stats())
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="多进程分片模拟器")
+    parser.add_argument("--shards", type=int,
+                        default=int(os.getenv("SIM_SHARDS", os.cpu_count() or 1)),
+                        help="分片（工作进程）数量，默认为CPU核数")
+    parser.add_argument("--port", type=int, default=5004, help="Web服务端口")
+    args = parser.parse_args()
+
+    supervisor = ShardSupervisor(args.shards)
+    supervisor.start()
+    try:
+        create_app(supervisor).run(host='0.0.0.0', port=args.port, threaded=True)
+    finally:
+        supervisor.stop()
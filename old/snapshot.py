@@ -0,0 +1,311 @@
+"""
+设备集群快照模块
+
+设备只保存在内存中，Web 应用每次重启都会丢失整个集群，通过 REST API 重建又很慢。
+本模块把集群状态保存为紧凑的二进制文件，并可在启动时恢复：
+- 文件按设备类型分表、按列存放：每列是一段连续的原始数组，设备ID是一段以 NUL 分隔的 UTF-8 文本
+- 保存分两步：在集群锁内把在用行的列数组复制出来（只是内存复制，节拍最多等待这一步），
+  之后在锁外一次顺序写入临时文件，再原子替换目标文件
+- 恢复时内存映射文件，每列直接整列复制进列存储表，设备视图批量创建，不逐个调用设备的 __init__
+- 房间热环境、统计分组和集群版本一并保存；集群汇总在恢复时按列重新计算，状态历史不保存
+
+文件格式:
+    MAGIC (8 字节) | 头部长度 (uint64，小端) | JSON 头部 | 按 64 字节对齐的数据段
+    头部记录各数据段相对于数据区起点的偏移、长度和 NumPy 数据类型
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import gc
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .devices import BaseDevice, DEVICE_TYPES, FLEET_VERSION
+from .fleet import ERROR_TEXT, TRANSIENT_COLUMNS, FleetStore
+from .stats import milliwatts
+
+MAGIC = b"IOTSNAP1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_LENGTH = struct.Struct("<Q")
+
+
+class Snapshot:
+    """在集群锁内复制出来的集群状态，可在锁外写入文件"""
+
+    def __init__(self, fleet: FleetStore):
+        """
+        复制集群状态（持有集群锁的时间只与列数组的内存复制有关）
+
+        Args:
+            fleet (FleetStore): 设备集群
+        """
+        self.tables: List[Tuple[str, List[str], Dict[str, np.ndarray]]] = []
+        with fleet.lock:
+            for table in fleet.tables.values():
+                rows = table.live_rows()
+                if rows.size == table.size:
+                    # 没有空行时整段切片复制
+                    columns = {name: array[:table.size].copy()
+                               for name, array in table.arrays.items()
+                               if name not in TRANSIENT_COLUMNS}
+                    ids = table.ids[:table.size]
+                else:
+                    columns = {name: array[rows] for name, array in table.arrays.items()
+                               if name not in TRANSIENT_COLUMNS}
+                    ids = [table.ids[row] for row in rows.tolist()]
+                self.tables.append((table.device_class.type, ids, columns))
+            environment = fleet.environment
+            count = environment.size
+            self.rooms = environment.names[:count]
+            self.room_arrays = {name: getattr(environment, name)[:count].copy()
+                                for name in ("temp", "humidity", "tau")}
+            self.last_step = environment.last_step
+            self.groups = list(fleet.stats.group_names)
+            self.fleet_version = FLEET_VERSION.value
+        self.error_texts = list(ERROR_TEXT.texts)
+        self.created = time.time()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for _, ids, _ in self.tables)
+
+    def write(self, path: str) -> int:
+        """
+        写入快照文件（先写临时文件，完成后原子替换）
+
+        Args:
+            path (str): 目标文件路径
+
+        Returns:
+            int: 文件字节数
+
+        Raises:
+            ValueError: 设备ID包含 NUL 字符（MQTT 主题中同样不允许）
+        """
+        sections: List[bytes] = []
+        offset = 0
+
+        def section(data) -> List[int]:
+            nonlocal offset
+            start = offset
+            length = memoryview(data).nbytes
+            sections.append(data)
+            padding = -length % ALIGNMENT
+            if padding:
+                sections.append(b"\0" * padding)
+            offset += length + padding
+            return [start, length]
+
+        tables = []
+        for type_name, ids, columns in self.tables:
+            text = "\0".join(ids)
+            if text.count("\0") != max(len(ids) - 1, 0):
+                raise ValueError("设备ID不能包含 NUL 字符")
+            entry = {"type": type_name, "count": len(ids),
+                     "ids": section(text.encode("utf-8")), "columns": {}}
+            for name, array in columns.items():
+                entry["columns"][name] = [array.dtype.str, *section(array)]
+            tables.append(entry)
+        rooms = {name: [array.dtype.str, *section(array)]
+                 for name, array in self.room_arrays.items()}
+
+        header = json.dumps({
+            "format": FORMAT_VERSION,
+            "created": self.created,
+            "fleet_version": self.fleet_version,
+            "error_texts": self.error_texts,
+            "groups": self.groups,
+            "environment": {"rooms": self.rooms, "last_step": self.last_step,
+                            "arrays": rooms},
+            "tables": tables,
+        }, ensure_ascii=False).encode("utf-8")
+        prefix = MAGIC + _LENGTH.pack(len(header)) + header
+        prefix += b"\0" * (-len(prefix) % ALIGNMENT)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(prefix)
+            for data in sections:
+                f.write(data)
+        os.replace(temp_path, path)
+        return len(prefix) + offset
+
+
+def save_snapshot(fleet: FleetStore, path: str) -> Dict[str, Any]:
+    """
+    保存集群快照
+
+    Args:
+        fleet (FleetStore): 设备集群
+        path (str): 快照文件路径
+
+    Returns:
+        Dict[str, Any]: 设备数、文件字节数、持锁复制和写入文件的耗时（秒）
+    """
+    start = time.perf_counter()
+    snapshot = Snapshot(fleet)
+    captured = time.perf_counter()
+    size = snapshot.write(path)
+    return {
+        "path": path,
+        "devices": len(snapshot),
+        "bytes": size,
+        "capture_seconds": captured - start,
+        "write_seconds": time.perf_counter() - captured,
+        "created": snapshot.created,
+    }
+
+
+def _read_header(data: np.ndarray) -> Tuple[Dict[str, Any], int]:
+    """解析文件头部，返回头部和数据区起点"""
+    if data.size < len(MAGIC) + _LENGTH.size or data[:len(MAGIC)].tobytes() != MAGIC:
+        raise ValueError("不是设备集群快照文件")
+    length, = _LENGTH.unpack(data[len(MAGIC):len(MAGIC) + _LENGTH.size].tobytes())
+    start = len(MAGIC) + _LENGTH.size
+    header = json.loads(data[start:start + length].tobytes())
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"不支持的快照格式版本: {header.get('format')}")
+    end = start + length
+    return header, end + -end % ALIGNMENT
+
+
+def load_snapshot(fleet: FleetStore, path: str) -> List[BaseDevice]:
+    """
+    从快照文件恢复集群
+
+    恢复期间暂停垃圾回收（结束后恢复原来的状态）：否则新建的大量视图会反复触发分代回收，
+    每次都要遍历已有的视图。是否在恢复后冻结对象（gc.freeze）由调用方决定，见 web_app 的启动流程。
+
+    Args:
+        fleet (FleetStore): 空的设备集群
+        path (str): 快照文件路径
+
+    Returns:
+        List[BaseDevice]: 恢复的设备视图
+
+    Raises:
+        ValueError: 集群不为空，或文件不是有效的快照
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return _restore(fleet, data)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def _restore(fleet: FleetStore, data: np.ndarray) -> List[BaseDevice]:
+    """在集群锁内装入快照内容"""
+    header, base = _read_header(data)
+
+    def array(spec) -> np.ndarray:
+        dtype, offset, length = spec
+        return data[base + offset:base + offset + length].view(np.dtype(dtype))
+
+    # 快照中的错误信息编码映射到本进程的字符串表
+    error_codes = np.array([ERROR_TEXT.encode(text) for text in header["error_texts"]],
+                           dtype=np.int32)
+    device_classes = {device_class.type: device_class
+                      for device_class in DEVICE_TYPES.values()}
+    restored: List[BaseDevice] = []
+    with fleet.lock:
+        if len(fleet):
+            raise ValueError("只能向空的集群恢复快照")
+
+        environment = header["environment"]
+        fleet.environment.load(environment["rooms"],
+                               {name: array(spec) for name, spec in environment["arrays"].items()},
+                               environment["last_step"])
+
+        for name in header["groups"][1:]:
+            fleet.stats.group_code(name)
+
+        for entry in header["tables"]:
+            device_class = device_classes.get(entry["type"])
+            if device_class is None:
+                raise ValueError(f"快照中有未知的设备类型: {entry['type']}")
+            offset, length = entry["ids"]
+            text = data[base + offset:base + offset + length].tobytes().decode("utf-8")
+            ids = text.split("\0") if entry["count"] else []
+            table = fleet.table(device_class)
+            # 只恢复当前版本仍存在的列，新增的列保持填充值
+            columns = {name: array(spec) for name, spec in entry["columns"].items()
+                       if name in table.columns and name not in TRANSIENT_COLUMNS}
+            if "error_state" in columns:
+                columns["error_state"] = error_codes[columns["error_state"]]
+            views = table.load(ids, columns)
+
+            count = len(ids)
+            cols = table.arrays
+            if "_room" in cols:
+                fleet.environment.join(cols["_room"][:count])
+            power = cols.get("power_consumption")
+            fleet.stats.apply_rows(
+                device_class.type, cols["_group"][:count],
+                online=cols["online"][:count].astype(np.int64),
+                power_mw=None if power is None else milliwatts(power[:count]),
+                devices=True)
+            restored.extend(views)
+
+        FLEET_VERSION.advance(header["fleet_version"])
+    return restored
+
+
+class SnapshotWriter:
+    """后台周期性保存快照的线程"""
+
+    def __init__(self, fleet: FleetStore, path: str, interval: float):
+        """
+        初始化快照线程
+
+        Args:
+            fleet (FleetStore): 设备集群
+            path (str): 快照文件路径
+            interval (float): 保存周期（秒），0 表示不周期保存，只通过 save 手动保存
+        """
+        if interval < 0:
+            raise ValueError("快照周期不能为负数")
+        self.fleet = fleet
+        self.path = path
+        self.interval = interval
+        self.last: Optional[Dict[str, Any]] = None
+        self.errors = 0
+        self._lock = threading.Lock()  # 手动保存与周期保存不同时写同一个文件
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """启动快照线程（保存周期为 0 时不启动）"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止快照线程（不会中断正在进行的写入）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def save(self) -> Dict[str, Any]:
+        """立即保存一次快照"""
+        with self._lock:
+            self.last = save_snapshot(self.fleet, self.path)
+        return self.last
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error writing snapshot {self.path}: {e}")
@@ -0,0 +1,134 @@
+"""
+设备集群能耗与在线状态统计
+
+能耗看板原来只能拉取 GET /api/devices 后在客户端累加 power_consumption，
+每次都要扫描整个集群。本模块维护增量更新的汇总值：
+- 设备的功率或在线状态每次变化时（逐设备赋值或节拍的向量化写入），只把差值加到所属类型和分组上
+- 功率以整数毫瓦累加，增减多少次都不会产生浮点误差
+- 读取汇总只与设备类型数、分组数有关，与设备数无关
+"""
+
+from typing import Any, Dict, List, Optional
+import threading
+
+import numpy as np
+
+
+def milliwatts(power: Any) -> Any:
+    """把功率（瓦特，标量或数组）换算为整数毫瓦"""
+    if isinstance(power, np.ndarray):
+        return np.rint(power * 1000).astype(np.int64)
+    return int(round(float(power) * 1000))
+
+
+class _Totals:
+    """一组设备的计数与功率合计"""
+
+    __slots__ = ("devices", "online", "power_mw")
+
+    def __init__(self):
+        self.devices = 0
+        self.online = 0
+        self.power_mw = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "devices": self.devices,
+            "online": self.online,
+            "offline": self.devices - self.online,
+            "power_consumption": self.power_mw / 1000,
+        }
+
+
+class FleetStats:
+    """按设备类型和分组增量维护的集群汇总"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = _Totals()
+        self.types: Dict[str, _Totals] = {}
+        # 分组编号 0 表示不属于任何分组
+        self.group_names: List[str] = [""]
+        self.group_codes: Dict[str, int] = {"": 0}
+        self.groups: List[_Totals] = [_Totals()]
+
+    def group_code(self, name: Optional[str]) -> int:
+        """获取分组编号，分组不存在时创建"""
+        if not name:
+            return 0
+        code = self.group_codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self.group_codes.get(name)
+                if code is None:
+                    code = len(self.group_names)
+                    self.group_names.append(name)
+                    self.groups.append(_Totals())
+                    self.group_codes[name] = code
+        return code
+
+    def apply(self, device_type: str, group: int, devices: int = 0,
+              online: int = 0, power_mw: int = 0) -> None:
+        """
+        把一台或多台设备的变化量计入类型、分组和集群合计
+
+        Args:
+            device_type (str): 设备类型
+            group (int): 分组编号
+            devices (int): 设备数变化
+            online (int): 在线设备数变化
+            power_mw (int): 功率变化（毫瓦）
+        """
+        with self._lock:
+            totals = self.types.get(device_type)
+            if totals is None:
+                totals = self.types[device_type] = _Totals()
+            for target in (self.total, totals, self.groups[group]):
+                target.devices += devices
+                target.online += online
+                target.power_mw += power_mw
+
+    def apply_rows(self, device_type: str, groups: np.ndarray,
+                   online: Optional[np.ndarray] = None,
+                   power_mw: Optional[np.ndarray] = None,
+                   devices: bool = False) -> None:
+        """
+        计入向量化更新的变化量
+
+        Args:
+            device_type (str): 设备类型
+            groups (np.ndarray): 各行的分组编号
+            online (Optional[np.ndarray]): 各行在线状态的变化（-1、0、1）
+            power_mw (Optional[np.ndarray]): 各行功率的变化（毫瓦）
+            devices (bool): 是否把每一行计为一台新增设备（批量恢复时使用）
+        """
+        size = len(self.group_names)
+        zeros = np.zeros(size)
+        online_by_group = zeros if online is None else np.bincount(groups, online, size)
+        power_by_group = zeros if power_mw is None else np.bincount(groups, power_mw, size)
+        devices_by_group = np.bincount(groups, minlength=size) if devices else zeros
+        changed = (online_by_group != 0) | (power_by_group != 0) | (devices_by_group != 0)
+        for group in np.flatnonzero(changed).tolist():
+            self.apply(device_type, group, devices=int(devices_by_group[group]),
+                       online=int(online_by_group[group]),
+                       power_mw=int(power_by_group[group]))
+
+    def snapshot(self, type_names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        获取汇总
+
+        Args:
+            type_names (Optional[Dict[str, str]]): 设备类型到对外类型名的映射
+
+        Returns:
+            Dict[str, Any]: 集群合计、按类型和按分组的设备数、在线数、离线数与总功率（瓦特）
+        """
+        type_names = type_names or {}
+        with self._lock:
+            stats = self.total.to_dict()
+            stats["types"] = {type_names.get(name, name): totals.to_dict()
+                              for name, totals in self.types.items()}
+            stats["groups"] = {name: totals.to_dict()
+                               for name, totals in zip(self.group_names[1:], self.groups[1:])
+                               if totals.devices}
+        return stats
@@ -5,19 +5,31 @@
 支持添加、删除设备，以及实时查看设备状态。
 """
 
-from flask import Flask, render_template, jsonify, request
-from .devices import (
-    Light, Thermostat, DoorLock, Blind,
-    AirConditioner, SmokeDetector, Fan, Plug
-)
+from flask import Flask, Response, render_template, jsonify, request
+from .devices import DEVICE_TYPES, FLEET_VERSION
+from .fleet import FleetStore, queryable_fields
+from .scheduler import PublishScheduler, parse_intervals
+from .batching import StatusBatcher, parse_shard_spec
+from .serialization import dumps, join_object, prepend_field
+from .events import EventHub
+from .registry import DeviceRegistry
+from .commands import CORRELATION_KEY, CommandError, apply_many, correlation_id
+from .ingest import CommandQueue
+from .randomness import derive_seed, run_seed
+from .history import StateHistory
+from .snapshot import SnapshotWriter, load_snapshot
+from .journal import Journal
+from . import clock as sim_clock
+from contextlib import contextmanager
+import argparse
+import gc
 import threading
 import time
 import json
-from typing import Dict, Any, Type
+from typing import Dict, Any, Optional, Type
 import paho.mqtt.client as mqtt
 from dotenv import load_dotenv
 import os
-import random
 
 # 加载环境变量
 load_dotenv()
@@ -29,138 +41,791 @@ broker_ip = os.getenv("BROKER_IP")
 broker_port = int(os.getenv("BROKER_PORT"))
 device_prefix = os.getenv("DEVICE_PREFIX")
 
-# 设备类型映射
-DEVICE_TYPES = {
-    "light": Light,
-    "thermostat": Thermostat,
-    "doorlock": DoorLock,
-    "blind": Blind,
-    "ac": AirConditioner,
-    "smoke_detector": SmokeDetector,
-    "fan": Fan,
-    "plug": Plug
+# 模拟与发布节奏配置
+tick_interval = float(os.getenv("SIM_TICK_INTERVAL", "10"))  # 模拟节拍周期（秒）
+publish_interval = float(os.getenv("PUBLISH_INTERVAL", "10"))  # 默认发布周期（秒）
+publish_jitter = float(os.getenv("PUBLISH_JITTER", "0.1"))  # 发布抖动（占周期比例）
+publish_intervals = parse_intervals(os.getenv("PUBLISH_INTERVALS"))  # 按类型的发布周期
+
+# 状态发布方式：device 逐设备发布，batch 只发批量帧，both 两者都发
+status_mode = os.getenv("STATUS_MODE", "device")
+if status_mode not in ("device", "batch", "both"):
+    raise ValueError(f"Invalid STATUS_MODE: {status_mode}")
+batch_shard_by, batch_buckets = parse_shard_spec(os.getenv("STATUS_BATCH_SHARD", "type"))
+batch_size = int(os.getenv("STATUS_BATCH_SIZE", "500"))  # 每帧最多设备数
+batch_latency = float(os.getenv("STATUS_BATCH_LATENCY", "1"))  # 最长缓冲时间（秒）
+
+# 增量发布：只发布变化字段，并定期发布完整关键帧
+delta_publish = os.getenv("STATUS_DELTA", "0") == "1"
+keyframe_interval = int(os.getenv("KEYFRAME_INTERVAL", "30"))  # 关键帧间隔（发布次数）
+
+# MQTT 命令接收队列：工作线程数、总容量、队列满时的策略（drop_oldest/drop_new/block）
+command_workers = int(os.getenv("COMMAND_WORKERS", "4"))
+command_queue_size = int(os.getenv("COMMAND_QUEUE_SIZE", "10000"))
+command_queue_policy = os.getenv("COMMAND_QUEUE_POLICY", "drop_oldest")
+# block 策略最长等待（秒）：等待期间 MQTT 网络线程被阻塞，应远小于 keepalive
+command_queue_timeout = float(os.getenv("COMMAND_QUEUE_TIMEOUT", "0.05"))
+
+# 集群汇总（设备数、在线数、总功率）发布到 MQTT 的周期（秒），0 表示不发布
+stats_interval = float(os.getenv("STATS_INTERVAL", "60"))
+
+# 状态历史各分辨率的槽位数：原始采样（每个节拍一个）、1分钟均值、1小时均值
+history_slots = {
+    "raw": int(os.getenv("HISTORY_RAW", "60")),
+    "minutes": int(os.getenv("HISTORY_MINUTES", "60")),
+    "hours": int(os.getenv("HISTORY_HOURS", "24")),
 }
 
-# 存储设备实例
-devices: Dict[str, Any] = {}
+# 集群快照：文件路径、后台保存周期（秒，0 表示只在请求时保存）、启动时是否恢复
+snapshot_path = os.getenv("SNAPSHOT_PATH", "fleet.snapshot")
+snapshot_interval = float(os.getenv("SNAPSHOT_INTERVAL", "0"))
+snapshot_restore = os.getenv("SNAPSHOT_RESTORE", "0") == "1"
+
+# 命令日志：文件路径（为空时不记录）、批量写入并 fsync 的周期（秒）
+journal_path = os.getenv("JOURNAL_PATH") or None
+journal_fsync_interval = float(os.getenv("JOURNAL_FSYNC_INTERVAL", "0.05"))
+
+# 单次批量创建的设备数上限
+bulk_max_devices = int(os.getenv("BULK_MAX_DEVICES", "1000000"))
+
+# 设备状态列式存储
+fleet = FleetStore(history=StateHistory(**history_slots))
+
+# 存储设备实例（列式存储中的行视图）
+# Web 请求线程、MQTT 网络线程和模拟线程并发访问，使用分段加锁的注册表
+devices = DeviceRegistry(stripes=int(os.getenv("REGISTRY_STRIPES", "64")))
+
+# 命令日志（在集群执行任何命令之前打开，写入线程在 __main__ 中启动）
+journal = Journal(journal_path, journal_fsync_interval)
+
+# 快照保存线程（在 __main__ 中启动）
+snapshot_writer = SnapshotWriter(fleet, snapshot_path, snapshot_interval)
+
+# 设备状态发布调度器
+scheduler = PublishScheduler(
+    interval=publish_interval,
+    jitter=publish_jitter,
+    type_intervals=publish_intervals,
+    seed=derive_seed("scheduler"),
+)
+
+# 控制主题到设备ID的路由表，消息路由与设备数量无关
+control_routes: Dict[str, str] = {}
+
+# Web仪表盘的状态变化推送（SSE）
+events = EventHub()
 
 # MQTT客户端
 mqtt_client = mqtt.Client(client_id="WebSimulator")
 
+# 关键帧请求主题：消费端重建状态时请求完整关键帧
+keyframe_topic = f"{device_prefix}/keyframe"
+
+# 集群汇总主题
+stats_topic = f"{device_prefix}/stats"
+
+# 设备类型名（device.type）到 REST API 类型名的映射
+api_type_names = {device_class.type: name for name, device_class in DEVICE_TYPES.items()}
+
+def control_topic(device_id: str) -> str:
+    """设备控制主题"""
+    return f"{device_prefix}/control/{device_id}"
+
+def on_connect(client, userdata, flags, rc):
+    """连接（含重连）成功后用一个通配符订阅所有设备的控制主题"""
+    client.subscribe(f"{device_prefix}/control/+")
+    client.subscribe(keyframe_topic)
+
+def request_keyframes(device_ids=None) -> int:
+    """
+    要求设备在下一次发布时输出完整关键帧
+    
+    Args:
+        device_ids: 设备ID列表，None 表示所有设备
+    
+    Returns:
+        int: 受影响的设备数量
+    """
+    if device_ids is None:
+        device_ids = list(devices)
+    count = 0
+    for device_id in device_ids:
+        device = devices.get(device_id)
+        if device is not None:
+            device.request_keyframe()
+            count += 1
+    return count
+
+@contextmanager
+def journaled_command(device_id: str, command: Any, source: str):
+    """
+    在设备命令锁和命令日志的顺序锁内执行命令，正常结束后记入命令日志
+    
+    Args:
+        device_id (str): 设备ID
+        command (Any): 命令消息
+        source (str): 命令来源：mqtt 或 rest
+    
+    Yields:
+        Optional[BaseDevice]: 设备，不存在时为 None（不记录）
+    """
+    with devices.command(device_id) as device:
+        if device is None:
+            yield None
+            return
+        with journal.ordered(device.type):
+            yield device
+            journal.append("command", device=device_id, command=command, source=source)
+
+def apply_command(device_id: str, command: Dict[str, Any]) -> None:
+    """
+    在命令队列的工作线程中执行 MQTT 控制命令
+    
+    命令带关联ID时立即在设备状态主题发布完整状态（不论 STATUS_MODE），并原样带回关联ID，
+    供消费端和往返延迟测试把状态与命令对应起来。
+    """
+    cid = correlation_id(command)
+    payload = None
+    with journaled_command(device_id, command, "mqtt") as device:
+        if device is not None:
+            device.handle_command(command)
+            if cid is not None:
+                payload = prepend_field(device.to_json(), CORRELATION_KEY, cid)
+    if payload is not None:
+        mqtt_client.publish(f"{device_prefix}/status/{device_id}", payload)
+
+# MQTT 控制命令的接收队列，解码和执行都在工作线程中进行
+command_queue = CommandQueue(
+    apply_command,
+    workers=command_workers,
+    capacity=command_queue_size,
+    policy=command_queue_policy,
+    block_timeout=command_queue_timeout,
+)
+
 def on_message(client, userdata, msg):
-    """处理接收到的MQTT消息"""
+    """
+    处理接收到的MQTT消息
+    
+    在 paho 网络线程中调用，控制命令只做路由查找后入队，不在这里解码和执行。
+    """
     try:
-        device_id = msg.topic.split('/')[-1]
-        if device_id in devices:
-            command = json.loads(msg.payload)
-            devices[device_id].handle_command(command)
+        if msg.topic == keyframe_topic:
+            command = json.loads(msg.payload) if msg.payload else {}
+            request_keyframes(command.get("ids"))
+            return
+        device_id = control_routes.get(msg.topic)
+        if device_id is not None:
+            command_queue.submit(device_id, msg.payload)
     except Exception as e:
         print(f"Error handling message: {e}")
 
+# 批量状态发布器（仅在批量模式下启用）
+batcher = None
+if status_mode != "device":
+    batcher = StatusBatcher(
+        mqtt_client.publish,
+        device_prefix,
+        shard_by=batch_shard_by,
+        buckets=batch_buckets,
+        max_batch=batch_size,
+        max_latency=batch_latency,
+    )
+
 def publish_status(device_id: str):
-    """发布设备状态到MQTT主题"""
-    topic = f"{device_prefix}/status/{device_id}"
-    payload = devices[device_id].to_dict()
-    mqtt_client.publish(topic, json.dumps(payload))
+    """
+    发布设备状态到MQTT主题（逐设备主题和/或批量帧）
+    
+    增量模式下只发布自上次发布以来变化的字段（带 "delta": true），
+    没有变化时不发布；每隔 keyframe_interval 次发布一次完整关键帧（带 "keyframe": true）。
+    """
+    device = devices.get(device_id)
+    if device is None:
+        # 设备已被并发删除
+        return
+    # 有仪表盘订阅时推送（状态未变化时自动跳过）
+    if events:
+        events.publish(device_id, device.to_json())
+    if delta_publish:
+        keyframe, state = device.take_status(keyframe_interval)
+        if state is None:
+            return
+        payload = dumps({"keyframe": True, **state} if keyframe else {"delta": True, **state})
+    else:
+        # 复用设备缓存的已编码状态
+        payload = device.to_json()
+    if status_mode != "batch":
+        topic = f"{device_prefix}/status/{device_id}"
+        mqtt_client.publish(topic, payload)
+    if batcher is not None:
+        batcher.add(device_id, device.type, payload)
+
+def fleet_stats() -> Dict[str, Any]:
+    """集群汇总：合计、按类型和按分组的设备数、在线/离线数与总功率"""
+    return fleet.stats.snapshot(api_type_names)
+
+def publish_stats():
+    """发布集群汇总到MQTT主题"""
+    mqtt_client.publish(stats_topic, dumps({"timestamp": sim_clock.now(), **fleet_stats()}))
+
+def restore_fleet(path: str) -> int:
+    """
+    从快照恢复设备，并登记注册表、发布调度和控制路由
+    
+    应在启动 MQTT 客户端和模拟器线程之前调用。
+    按设备类型整批登记：注册表每段只加一次锁，调度器每种类型只建一次堆，
+    控制路由一次更新；期间暂停垃圾回收。
+    
+    Args:
+        path (str): 快照文件路径
+    
+    Returns:
+        int: 恢复的设备数
+    """
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        restored = load_snapshot(fleet, path)
+        # 恢复只能在空集群上进行，各表中的设备就是恢复的设备，按行号排列
+        all_ids = []
+        for table in fleet.tables.values():
+            ids = table.ids[:table.size]
+            devices.add_many(ids, table.views[:table.size])
+            scheduler.add_many(ids, api_type_names[table.device_class.type])
+            all_ids.extend(ids)
+        topic_prefix = control_topic("")
+        control_routes.update(zip(map(topic_prefix.__add__, all_ids), all_ids))
+    finally:
+        if collecting:
+            gc.enable()
+    return len(restored)
 
 def start_mqtt_client():
     """启动MQTT客户端"""
-    mqtt_client.connect(broker_ip, broker_port, 60)
+    mqtt_client.on_connect = on_connect
     mqtt_client.on_message = on_message
+    command_queue.start()
+    mqtt_client.connect(broker_ip, broker_port, 60)
     mqtt_client.loop_start()
 
 def start_device_simulator():
-    """启动设备模拟器线程"""
+    """
+    启动设备模拟器线程
+    
+    设备按调度器安排的时间各自发布状态，模拟节拍按固定周期执行；
+    两者的下一次时间都以计划时间为基准累加，不受发布耗时影响。
+    时间和等待都来自模拟时钟（SIM_CLOCK），倍速或步进时钟下模拟时间比墙上时间流逝得快。
+    """
+    next_tick = sim_clock.monotonic()
+    next_stats = next_tick + stats_interval if stats_interval > 0 else float('inf')
+    reported_overruns = 0
     while True:
-        for device_id, device in devices.items():
-            publish_status(device_id)
-            
-            # 模拟传感器数据变化
-            if isinstance(device, Thermostat) and random.random() < 0.3:
-                new_temp = round(random.uniform(20, 30), 1)
-                device.update_current_temp(new_temp)
-            
-            if isinstance(device, SmokeDetector) and random.random() < 0.1:
-                device.trigger_alarm()
+        now = sim_clock.monotonic()
+        for device_id in scheduler.pop_due(now):
+            if device_id in devices:
+                publish_status(device_id)
+        if batcher is not None:
+            batcher.flush_due()
+        
+        if now >= next_tick:
+            # 按设备类型批量模拟传感器数据变化（启用命令日志时同时记录节拍事件）
+            journal.tick(fleet)
+            next_tick += tick_interval
+            if next_tick < now:
+                next_tick = now + tick_interval
+        
+        if now >= next_stats:
+            publish_stats()
+            next_stats += stats_interval
+            if next_stats < now:
+                next_stats = now + stats_interval
         
-        time.sleep(10)
+        if scheduler.overruns > reported_overruns:
+            print(f"Publish overrun: {scheduler.overruns - reported_overruns} devices "
+                  f"fell a full period behind (max lag {scheduler.max_lag:.2f}s)")
+            reported_overruns = scheduler.overruns
+        
+        wake = min(next_tick, next_stats)
+        next_due = scheduler.next_due()
+        if next_due is not None:
+            wake = min(wake, next_due)
+        if batcher is not None:
+            deadline = batcher.next_deadline()
+            if deadline is not None:
+                wake = min(wake, deadline)
+        delay = wake - sim_clock.monotonic()
+        if delay > 0:
+            sim_clock.sleep(delay)
 
 @app.route('/')
 def index():
     """渲染主页"""
     return render_template('index.html', device_types=DEVICE_TYPES.keys())
 
+# 设备查询中有特殊含义的参数，其余参数都按 列名=值 或 列名_min/列名_max=值 过滤
+QUERY_PARAMS = {'type', 'fields', 'limit', 'cursor', 'has_error', 'since'}
+
+def parse_device_query(args) -> Dict[str, Any]:
+    """
+    解析设备查询参数
+    
+    Args:
+        args: 请求的查询参数
+    
+    Returns:
+        Dict[str, Any]: FleetStore.query 的参数和投影字段
+    
+    Raises:
+        ValueError: 参数无效
+    """
+    fields = queryable_fields()
+    filters = []
+    for key, value in args.items():
+        if key in QUERY_PARAMS:
+            continue
+        name, op = key, 'eq'
+        if key.endswith(('_min', '_max')) and key not in fields:
+            name, op = key[:-4], key[-3:]
+        column = fields.get(name)
+        if column is None:
+            raise ValueError(f'Unknown query field: {key}')
+        if op != 'eq' and not column.numeric:
+            raise ValueError(f'Range filter requires a numeric field: {name}')
+        try:
+            filters.append((name, op, value if op == 'eq' else column.parse(value)))
+        except ValueError:
+            raise ValueError(f'Invalid value for {key}: {value}')
+    if 'has_error' in args:
+        has_error = args['has_error'].lower()
+        if has_error not in ('true', 'false'):
+            raise ValueError('has_error must be true or false')
+        filters.append(('error_state', 'ne' if has_error == 'true' else 'eq', None))
+    since = args.get('since')
+    if since is not None:
+        if not since.isdigit():
+            raise ValueError('since must be a fleet version')
+        filters.append(('_version', 'min', int(since) + 1))
+    
+    device_type = args.get('type')
+    if device_type is not None and device_type not in DEVICE_TYPES:
+        raise ValueError('Invalid device type')
+    limit = args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError('limit must be a positive integer')
+        limit = int(limit)
+    projection = args.get('fields')
+    return {
+        'device_class': DEVICE_TYPES[device_type] if device_type else None,
+        'filters': filters,
+        'limit': limit,
+        'cursor': args.get('cursor'),
+        'fields': projection.split(',') if projection else None,
+    }
+
 @app.route('/api/devices', methods=['GET'])
 def get_devices():
-    """获取所有设备状态"""
-    return jsonify({
-        device_id: device.to_dict()
-        for device_id, device in devices.items()
-    })
+    """
+    获取设备状态
+    
+    不带参数时返回所有设备。支持的查询参数:
+        type: 设备类型
+        <字段>=值: 按字段值过滤，如 online=false、state=on、error_state=设备连接异常
+        <字段>_min / <字段>_max: 数值字段范围过滤（含边界），如 battery_level_max=20
+        has_error: 是否有错误状态
+        since: 只返回在该集群版本之后发生过变化的设备
+        fields: 只返回指定字段，逗号分隔
+        limit / cursor: 分页，下一页游标在响应头 X-Next-Cursor 中
+    
+    响应头 X-Fleet-Version 为生成响应时的集群版本（可作为下一次的 since），
+    同时作为 ETag；集群没有变化时对 If-None-Match 返回 304。
+    """
+    # 先读取版本再生成内容：此后的变化会在下一次 since 查询中返回
+    fleet_version = FLEET_VERSION.value
+    etag = str(fleet_version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
+    if not request.args:
+        body = join_object(
+            (device_id, device.to_json())
+            for device_id, device in devices.snapshot().items()
+        )
+        return versioned_response(body, etag, fleet_version)
+    
+    try:
+        query = parse_device_query(request.args)
+        matched, next_cursor = fleet.query(
+            query['device_class'], query['filters'], query['limit'], query['cursor'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    fields = query['fields']
+    if fields is None:
+        body = join_object((device.device_id, device.to_json()) for device in matched)
+    else:
+        body = join_object(
+            (device.device_id, dumps({key: state[key] for key in fields if key in state}))
+            for device, state in ((device, device.to_dict()) for device in matched)
+        )
+    response = versioned_response(body, etag, fleet_version)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def versioned_response(body: bytes, etag: str, fleet_version: int) -> Response:
+    """带 ETag 和集群版本的 JSON 响应"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['X-Fleet-Version'] = str(fleet_version)
+    return response
+
+def not_modified(etag: str) -> Response:
+    """304 响应"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/devices', methods=['POST'])
 def add_device():
-    """添加新设备"""
+    """添加新设备（温控器和空调可用 room 指定所在房间，group 指定统计分组）"""
     data = request.json
     device_type = data.get('type')
     device_id = data.get('id')
+    room = data.get('room')
+    group = data.get('group')
     
     if not device_type or not device_id:
         return jsonify({'error': 'Missing device type or ID'}), 400
     
-    if device_id in devices:
+    if device_type not in DEVICE_TYPES:
+        return jsonify({'error': 'Invalid device type'}), 400
+    
+    if room is not None and not isinstance(room, str):
+        return jsonify({'error': 'room must be a string'}), 400
+    if group is not None and not isinstance(group, str):
+        return jsonify({'error': 'group must be a string'}), 400
+    
+    if create_device(device_type, device_id, room=room, group=group) is None:
         return jsonify({'error': 'Device ID already exists'}), 400
+    return jsonify({'message': 'Device added successfully'})
+
+@app.route('/api/devices/bulk', methods=['POST'])
+def add_devices_bulk():
+    """
+    按模板批量创建设备
     
+    请求体:
+        type: 设备类型
+        count: 设备数量
+        id_pattern: 设备ID模板，默认 "{type}-{n}"，n 为序号
+        start: 起始序号，默认 0
+        commands: 创建后对每个设备执行的初始命令列表（可选）
+        room_pattern: 温控器和空调的房间名模板（可选），如 "room-{n}"
+        group: 统计分组（可选）
+    
+    已存在的设备ID会被跳过。
+    """
+    data = request.get_json(silent=True) or {}
+    device_type = data.get('type')
     if device_type not in DEVICE_TYPES:
         return jsonify({'error': 'Invalid device type'}), 400
+    try:
+        count = int(data.get('count', 0))
+        start = int(data.get('start', 0))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid count or start'}), 400
+    if not 0 < count <= bulk_max_devices:
+        return jsonify({'error': f'count must be between 1 and {bulk_max_devices}'}), 400
+    pattern = data.get('id_pattern', '{type}-{n}')
+    commands = data.get('commands') or []
+    if not isinstance(commands, list):
+        return jsonify({'error': 'commands must be a list'}), 400
+    for command in commands:
+        try:
+            DEVICE_TYPES[device_type].COMMANDS.validate(command)
+        except CommandError as e:
+            return jsonify({'error': str(e)}), 400
+    try:
+        device_ids = [pattern.format(type=device_type, n=n)
+                      for n in range(start, start + count)]
+    except (KeyError, IndexError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid id_pattern'}), 400
+    if len(set(device_ids)) != count:
+        return jsonify({'error': 'id_pattern must include {n}'}), 400
+    group = data.get('group')
+    if group is not None and not isinstance(group, str):
+        return jsonify({'error': 'group must be a string'}), 400
+    room_pattern = data.get('room_pattern')
+    try:
+        rooms = ([room_pattern.format(type=device_type, n=n)
+                  for n in range(start, start + count)]
+                 if room_pattern is not None else [None] * count)
+    except (KeyError, IndexError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid room_pattern'}), 400
     
-    # 创建设备实例
-    device_class = DEVICE_TYPES[device_type]
-    devices[device_id] = device_class(device_id)
+    pending = [(device_id, room) for device_id, room in zip(device_ids, rooms)
+               if device_id not in devices]
+    new_ids = [device_id for device_id, _ in pending]
+    new_rooms = [room for _, room in pending]
+    # 与 create_device 相同的登记步骤，按整批执行：列存储批量分配行，
+    # 注册表每段加一次锁，调度器一次入堆，控制路由一次更新
+    with journal.ordered():
+        created_devices = fleet.add_many(DEVICE_TYPES[device_type], new_ids,
+                                         rooms=new_rooms, group=group)
+        for device_id, room in pending:
+            journal.append("add", device=device_id, type=device_type, room=room, group=group)
+    if devices.add_many(new_ids, created_devices) != len(new_ids):
+        # 被并发请求抢先创建的设备撤销
+        lost = [(device_id, device) for device_id, device in zip(new_ids, created_devices)
+                if devices[device_id] is not device]
+        with journal.ordered():
+            for device_id, device in lost:
+                fleet.remove(device)
+                journal.append("remove", device=device_id)
+        lost_ids = {device_id for device_id, _ in lost}
+        created_devices = [device for device_id, device in zip(new_ids, created_devices)
+                           if device_id not in lost_ids]
+        new_ids = [device_id for device_id in new_ids if device_id not in lost_ids]
+    scheduler.add_many(new_ids, device_type)
+    control_routes.update(zip(map(control_topic("").__add__, new_ids), new_ids))
     
-    # 订阅设备控制主题
-    control_topic = f"{device_prefix}/control/{device_id}"
-    mqtt_client.subscribe(control_topic)
+    for device_id, device in zip(new_ids, created_devices):
+        for command in commands:
+            with journaled_command(device_id, command, "rest") as current:
+                if current is device:
+                    device.handle_command(command)
+        if events:
+            events.publish(device_id, device.to_json())
+    created = len(new_ids)
+    return jsonify({'created': created, 'skipped': count - created})
+
+def create_device(device_type: str, device_id: str, notify: bool = True,
+                  room: Optional[str] = None, group: Optional[str] = None):
+    """
+    创建设备并登记调度与控制路由
     
-    return jsonify({'message': 'Device added successfully'})
+    Args:
+        device_type (str): 设备类型
+        device_id (str): 设备ID
+        notify (bool): 是否推送给仪表盘
+        room (Optional[str]): 温控器和空调所在的房间，默认独占一个房间
+        group (Optional[str]): 统计分组
+    
+    Returns:
+        Optional[BaseDevice]: 新设备，设备ID已存在（包括被并发请求抢先创建）时为 None
+    """
+    # 创建设备会从房间热环境的随机数流取值，与节拍一样持有命令日志的全部顺序锁
+    with journal.ordered():
+        device = fleet.add(DEVICE_TYPES[device_type], device_id, room=room, group=group)
+        journal.append("add", device=device_id, type=device_type, room=room, group=group)
+    if not devices.add(device_id, device):
+        with journal.ordered():
+            fleet.remove(device)
+            journal.append("remove", device=device_id)
+        return None
+    scheduler.add(device_id, device_type)
+    # 控制主题已由通配符订阅覆盖，只需登记路由
+    control_routes[control_topic(device_id)] = device_id
+    if notify and events:
+        events.publish(device_id, device.to_json())
+    return device
+
+def select_devices(selector: Dict[str, Any]):
+    """
+    按选择器查找设备
+    
+    Args:
+        selector (Dict[str, Any]): 可包含 type（设备类型）、prefix（ID前缀）、online（在线状态）
+    
+    Returns:
+        List[BaseDevice]: 匹配的设备
+    
+    Raises:
+        ValueError: 选择器无效
+    """
+    unknown = set(selector) - {'type', 'prefix', 'online'}
+    if unknown:
+        raise ValueError(f"Unknown selector keys: {', '.join(sorted(unknown))}")
+    device_type = selector.get('type')
+    if device_type is not None and device_type not in DEVICE_TYPES:
+        raise ValueError('Invalid device type')
+    online = selector.get('online')
+    if online is not None and not isinstance(online, bool):
+        raise ValueError('online must be true or false')
+    return fleet.select(
+        DEVICE_TYPES[device_type] if device_type else None,
+        online=online,
+        prefix=selector.get('prefix'),
+    )
+
+@app.route('/api/commands', methods=['POST'])
+def send_bulk_command():
+    """
+    对选择器匹配的所有设备执行同一条命令
+    
+    请求体:
+        selector: {"type": ..., "prefix": ..., "online": ...}，省略的条件不限
+        command: 设备命令
+    
+    先对所有匹配设备执行命令，再集中发布一遍状态。
+    """
+    data = request.get_json(silent=True) or {}
+    command = data.get('command')
+    if not isinstance(command, dict):
+        return jsonify({'error': 'Missing command'}), 400
+    try:
+        matched = select_devices(data.get('selector') or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 命令按设备类型只校验一次，对任一类型无效时不执行
+    # 在设备命令锁内执行，跳过选择之后被并发删除的设备
+    try:
+        applied = apply_many(matched, command,
+                             guard=lambda device: journaled_command(device.device_id,
+                                                                    command, "rest"))
+    except CommandError as e:
+        return jsonify({'error': str(e)}), 400
+    for device in applied:
+        publish_status(device.device_id)
+    return jsonify({'message': 'Command sent successfully', 'matched': len(matched)})
+
+@app.route('/api/snapshot', methods=['POST'])
+def save_fleet_snapshot():
+    """立即保存集群快照（写入 SNAPSHOT_PATH）"""
+    try:
+        return jsonify(snapshot_writer.save())
+    except (OSError, ValueError) as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """集群汇总（增量维护，读取耗时与设备数无关）"""
+    return jsonify(fleet_stats())
+
+@app.route('/api/commands/queue', methods=['GET'])
+def command_queue_stats():
+    """MQTT 命令接收队列的深度、丢弃数和命令延迟"""
+    return jsonify(command_queue.stats())
 
 @app.route('/api/devices/<device_id>', methods=['GET'])
 def get_device(device_id):
     """获取单个设备状态"""
     print(f"Getting status for device: {device_id}")
-    if device_id not in devices:
+    device = devices.get(device_id)
+    if device is None:
         print(f"Device not found: {device_id}")
         return jsonify({'error': 'Device not found'}), 404
-    device_data = devices[device_id].to_dict()
-    print(f"Device data: {device_data}")
-    return jsonify(device_data)
+    # 设备版本作为 ETag，状态未变化时返回 304
+    etag = str(device.version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    response = Response(device.to_json(), mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/devices/<device_id>/history', methods=['GET'])
+def get_device_history(device_id):
+    """
+    获取设备数值字段的历史
+    
+    查询参数:
+        field: 字段名，如 current_temp、humidity、power_consumption
+        from, to: 时间范围（Unix 时间戳，含边界），可省略
+        resolution: raw、1m 或 1h，省略时选择保留范围覆盖 from 的最细分辨率
+    """
+    device = devices.get(device_id)
+    if device is None:
+        return jsonify({'error': 'Device not found'}), 404
+    field = request.args.get('field')
+    if not field:
+        return jsonify({'error': 'field is required'}), 400
+    try:
+        start, end = (float(request.args[key]) if key in request.args else None
+                      for key in ('from', 'to'))
+        history = fleet.device_history(device, field, start, end,
+                                       request.args.get('resolution'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'device_id': device_id, 'field': field, **history})
 
 @app.route('/api/devices/<device_id>', methods=['DELETE'])
 def remove_device(device_id):
     """删除设备"""
-    if device_id not in devices:
+    device = devices.pop(device_id)
+    if device is None:
         return jsonify({'error': 'Device not found'}), 404
     
-    # 取消订阅设备控制主题
-    control_topic = f"{device_prefix}/control/{device_id}"
-    mqtt_client.unsubscribe(control_topic)
-    
-    del devices[device_id]
+    control_routes.pop(control_topic(device_id), None)
+    scheduler.remove(device_id)
+    # 等待该设备正在执行的命令结束后再释放存储行
+    with devices.command_lock(device_id), journal.ordered():
+        fleet.remove(device)
+        journal.append("remove", device=device_id)
+    events.remove(device_id)
     return jsonify({'message': 'Device removed successfully'})
 
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    设备状态变化事件流（Server-Sent Events）
+    
+    只推送状态发生变化的设备，客户端应先获取一次 /api/devices 作为初始状态。
+    """
+    subscriber = events.subscribe()
+    return Response(
+        events.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/keyframe', methods=['POST'])
+def keyframe():
+    """请求完整关键帧（可选指定设备ID列表）"""
+    data = request.get_json(silent=True) or {}
+    count = request_keyframes(data.get('ids'))
+    return jsonify({'message': 'Keyframe requested', 'devices': count})
+
 @app.route('/api/devices/<device_id>/command', methods=['POST'])
 def send_command(device_id):
     """发送设备控制命令"""
-    if device_id not in devices:
-        return jsonify({'error': 'Device not found'}), 404
-    
-    command = request.json
-    devices[device_id].handle_command(command)
+    command = request.get_json(silent=True)
+    # 无效命令在修改设备之前抛出，不会记入命令日志
+    try:
+        with journaled_command(device_id, command, "rest") as device:
+            if device is None:
+                return jsonify({'error': 'Device not found'}), 404
+            apply_many([device], command)
+    except CommandError as e:
+        return jsonify({'error': str(e)}), 400
     publish_status(device_id)
     
     return jsonify({'message': 'Command sent successfully'})
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="智能家居设备模拟器Web应用")
+    parser.add_argument("--restore", action="store_true", default=snapshot_restore,
+                        help="启动时从 SNAPSHOT_PATH 恢复设备（也可设置 SNAPSHOT_RESTORE=1）")
+    args = parser.parse_args()
+    
+    # 用相同的 SIM_SEED 重新运行可以复现本次模拟
+    print(f"Run seed: {run_seed()} (set SIM_SEED to reproduce)")
+    
+    if args.restore and os.path.exists(snapshot_path):
+        started = time.perf_counter()
+        count = restore_fleet(snapshot_path)
+        # 恢复的设备视图在整个进程生命周期内存在，冻结后不再参与分代垃圾回收的遍历
+        gc.freeze()
+        print(f"Restored {count} devices from {snapshot_path} "
+              f"in {time.perf_counter() - started:.2f}s")
+    
+    snapshot_writer.start()
+    journal.start()
+    if journal.enabled and len(fleet):
+        print(f"Journal {journal_path} does not include the {len(fleet)} restored devices; "
+              f"replay starts from an empty fleet")
+    
     # 启动MQTT客户端
     start_mqtt_client()
     
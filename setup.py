@@ -8,5 +8,6 @@ setup(
         "flask",
         "paho-mqtt",
         "python-dotenv",
+        "numpy",
     ],
 ) 
\ No newline at end of file
@@ -0,0 +1,73 @@
+import pytest
+import asyncio
+import json
+import socket
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import paho.mqtt.client as mqtt
+from old.async_engine import AsyncSimulator, AsyncMqttIO
+
+def make_message(topic, payload):
+    msg = mqtt.MQTTMessage(topic=topic.encode("utf-8"))
+    msg.payload = json.dumps(payload).encode("utf-8")
+    return msg
+
+# 发布与命令处理测试
+def test_publishes_and_handles_commands():
+    published = []
+    simulator = AsyncSimulator("test/devices", lambda topic, payload: published.append(topic),
+                               tick_interval=0.05, publish_interval=0.1, seed=0)
+    simulator.add_device("light", "light-001")
+    simulator.add_device("thermostat", "thermo-001")
+    with pytest.raises(ValueError):
+        simulator.add_device("light", "light-001")
+
+    async def scenario():
+        task = asyncio.create_task(simulator.run())
+        await asyncio.sleep(0.05)
+        # 运行中添加的设备也会被调度
+        simulator.add_device("plug", "plug-001")
+        simulator.on_message(None, None, make_message(
+            "test/devices/control/light-001", {"command": "turn_on"}))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert simulator.devices["light-001"].state == "on"
+    assert simulator.commands == 1
+    for device_id in ("light-001", "thermo-001", "plug-001"):
+        assert published.count(f"test/devices/status/{device_id}") >= 2
+
+    simulator.remove_device("plug-001")
+    assert "test/devices/control/plug-001" not in simulator.control_routes
+
+# 套接字由事件循环驱动测试
+def test_mqtt_socket_driven_by_loop():
+    class FakeClient:
+        reads = 0
+        def loop_read(self):
+            FakeClient.reads += 1
+            reader.recv(1)
+        def loop_write(self):
+            pass
+        def loop_misc(self):
+            return mqtt.MQTT_ERR_SUCCESS
+
+    reader, writer = socket.socketpair()
+
+    async def scenario():
+        client = FakeClient()
+        AsyncMqttIO(asyncio.get_running_loop(), client)
+        client.on_socket_open(client, None, reader)
+        writer.send(b"x")
+        await asyncio.sleep(0.05)
+        client.on_socket_close(client, None, reader)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        reader.close()
+        writer.close()
+    assert FakeClient.reads == 1
@@ -0,0 +1,52 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.batching import StatusBatcher, parse_shard_spec, hash_bucket, unpack_frame
+
+class Recorder:
+    """记录发布的消息"""
+    def __init__(self):
+        self.messages = []
+    
+    def __call__(self, topic, payload):
+        self.messages.append((topic, payload))
+
+# 帧大小上限测试
+def test_flush_on_batch_size():
+    sent = Recorder()
+    batcher = StatusBatcher(sent, "home", max_batch=3, max_latency=60)
+    for i in range(7):
+        batcher.add(f"light-{i}", "light", b'{"state":"off"}')
+    batcher.add("fan-0", "fan", b'{"on":false}')
+    
+    assert [topic for topic, _ in sent.messages] == ["home/status/batch/light"] * 2
+    assert [device_id for device_id, _ in unpack_frame(sent.messages[0][1])] == \
+        ["light-0", "light-1", "light-2"]
+    
+    assert batcher.flush() == 2
+    assert len(unpack_frame(sent.messages[-1][1])) == 1
+
+# 延迟上限测试
+def test_flush_on_latency():
+    now = [100.0]
+    sent = Recorder()
+    batcher = StatusBatcher(sent, "home", shard_by="hash", buckets=4,
+                            max_batch=1000, max_latency=0.5, clock=lambda: now[0])
+    batcher.add("plug-1", "plug", b'{"on":true}')
+    batcher.add("plug-1", "plug", b'{"on":false}')  # 同一帧只保留最新状态
+    assert batcher.next_deadline() == pytest.approx(100.5)
+    assert batcher.flush_due() == 0
+    
+    now[0] = 100.6
+    assert batcher.flush_due() == 1
+    topic, payload = sent.messages[0]
+    assert topic == f"home/status/batch/{hash_bucket('plug-1', 4)}"
+    assert unpack_frame(payload) == [("plug-1", {"on": False})]
+    assert batcher.next_deadline() is None
+
+def test_parse_shard_spec():
+    assert parse_shard_spec(None) == ("type", 0)
+    assert parse_shard_spec("hash:32") == ("hash", 32)
+    with pytest.raises(ValueError):
+        parse_shard_spec("random")
@@ -0,0 +1,65 @@
+import pytest
+import sys
+import os
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old import clock as sim_clock
+from old.clock import RealClock, ScaledClock, StepClock, parse_clock
+from old.devices import DoorLock, Light
+from old.fleet import FleetStore
+from old.scheduler import PublishScheduler
+
+@pytest.fixture
+def step_clock():
+    clock = StepClock(start=datetime(2025, 1, 1).timestamp())
+    previous = sim_clock.set_clock(clock)
+    yield clock
+    sim_clock.set_clock(previous)
+
+# 时钟配置解析测试
+def test_parse_clock():
+    assert type(parse_clock(None)) is RealClock
+    assert type(parse_clock("real", "2025-01-01T00:00:00")) is ScaledClock
+    clock = parse_clock("scaled:60", "1700000000")
+    assert clock.rate == 60 and clock.start == 1700000000
+    assert isinstance(parse_clock("step"), StepClock)
+    for spec in ("fast", "scaled:0", "scaled:abc"):
+        with pytest.raises(ValueError):
+            parse_clock(spec)
+
+# 倍速时钟测试
+def test_scaled_clock_runs_faster():
+    clock = ScaledClock(1000.0, start=0.0)
+    started = time.monotonic()
+    clock.sleep(100.0)
+    assert time.monotonic() - started < 0.5
+    assert clock.monotonic() >= 100.0
+    assert clock.now() == pytest.approx(clock.monotonic(), abs=1.0)
+    assert clock.real_delay(100.0) == pytest.approx(0.1)
+
+# 步进时钟下设备时间戳与节拍测试
+def test_devices_follow_step_clock(step_clock):
+    started = time.monotonic()
+    step_clock.sleep(7 * 24 * 3600)  # 一周的模拟时间不需要实际等待
+    assert time.monotonic() - started < 0.5
+
+    fleet = FleetStore(seed=1)
+    lock = fleet.add(DoorLock, "lock-1")
+    lock.handle_command({"command": "unlock"})
+    assert lock.to_dict()["last_update"] == "2025-01-08T00:00:00"
+    assert lock.to_dict()["last_unlock_time"] == "2025-01-08T00:00:00"
+
+    fleet.add(Light, "light-1")
+    step_clock.sleep(90)
+    fleet.tick()
+    assert fleet.environment.last_step == step_clock.now()
+    step_clock.advance_to(0.0)  # 不会后退
+    assert step_clock.now() == datetime(2025, 1, 8, 0, 1, 30).timestamp()
+
+    # 调度器默认使用模拟时钟
+    scheduler = PublishScheduler(interval=60.0)
+    scheduler.add("light-1", "light")
+    step_clock.sleep(60)
+    assert "light-1" in scheduler.pop_due()
+    assert scheduler.next_due() > sim_clock.monotonic()
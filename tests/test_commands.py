@@ -0,0 +1,49 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.commands import CommandError, apply_many, render_docs, DOC_PATH
+from old.devices import Light, Fan, Thermostat, DEVICE_TYPES
+
+# 参数校验测试
+def test_validate_clamps_and_rejects():
+    cmd, kwargs = Light.COMMANDS.validate({"command": "set_brightness", "brightness": "150"})
+    assert cmd.name == "set_brightness"
+    assert kwargs == {"brightness": 100}
+    assert Light.COMMANDS.validate({"command": "set_brightness"})[1] == {"brightness": 100}
+    
+    with pytest.raises(CommandError, match="无效的亮度值"):
+        Light.COMMANDS.validate({"command": "set_brightness", "brightness": "bright"})
+    with pytest.raises(CommandError, match="无效的风速"):
+        Thermostat.COMMANDS.validate({"command": "set_fan_speed", "speed": "turbo"})
+    with pytest.raises(CommandError, match="未知命令"):
+        Light.COMMANDS.validate({"command": "explode"})
+    with pytest.raises(CommandError):
+        Light.COMMANDS.validate(["turn_on"])
+
+# 无效命令不修改设备状态测试
+def test_invalid_command_leaves_state():
+    light = Light("light-001")
+    light.handle_command({"command": "set_brightness", "brightness": None})
+    assert light.brightness == 50
+    light.handle_command({"command": "set_brightness", "brightness": 80})
+    assert light.brightness == 80
+
+# 批量执行测试
+def test_apply_many_validates_per_type():
+    lights = [Light(f"light-{i}") for i in range(3)]
+    fans = [Fan(f"fan-{i}") for i in range(2)]
+    applied = apply_many(lights + fans, {"command": "turn_on"})
+    assert len(applied) == 5
+    assert all(light.state == "on" for light in lights)
+    assert all(fan.on for fan in fans)
+    
+    # 对任一类型无效时不修改任何设备
+    with pytest.raises(CommandError):
+        apply_many(lights + fans, {"command": "set_speed", "speed": 2})
+    assert all(fan.speed == 1 for fan in fans)
+
+# 文档与命令表一致测试
+def test_docs_up_to_date():
+    with open(DOC_PATH, encoding="utf-8") as f:
+        assert render_docs(DEVICE_TYPES) in f.read()
@@ -1,9 +1,10 @@
 import pytest
+import json
 from datetime import datetime
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from old.devices import BaseDevice, Light, Thermostat, AirConditioner
+from old.devices import BaseDevice, Light, Thermostat, AirConditioner, SmokeDetector, FLEET_VERSION
 
 # 基础设备测试
 def test_base_device():
@@ -67,4 +68,82 @@ def test_airconditioner():
     
     # 测试摆风控制
     ac.handle_command({"command": "toggle_swing"})
-    assert ac.swing == True 
\ No newline at end of file
+    assert ac.swing == True 
+
+# 紧凑内存布局测试
+def test_compact_layout():
+    thermostat = Thermostat("thermostat-002")
+    # 使用 __slots__，没有实例字典
+    assert not hasattr(thermostat, "__dict__")
+    # 类型名称为共享的类属性
+    assert thermostat.type is Thermostat("thermostat-003").type
+    
+    # 模式和风速以小整数存储，对外仍为字符串
+    thermostat.handle_command({"command": "set_mode", "mode": "heat"})
+    assert thermostat._mode == 1
+    assert thermostat.to_dict()["mode"] == "heat"
+    
+    # 时间以时间戳存储，仅在 to_dict 中格式化
+    assert isinstance(thermostat._last_update, float)
+    datetime.fromisoformat(thermostat.to_dict()["last_update"])
+
+# 变化跟踪与增量状态测试
+def test_dirty_tracking_and_keyframes():
+    light = Light("light-002")
+    # 首次发布为完整关键帧
+    keyframe, state = light.take_status(keyframe_interval=3)
+    assert keyframe and state["type"] == "light"
+    # 没有变化时不输出
+    assert light.take_status(keyframe_interval=3) == (False, None)
+    
+    light.handle_command({"command": "set_color_temp", "color_temp": 3000})
+    assert "color_temp" in light.dirty_fields()
+    assert "brightness" not in light.dirty_fields()
+    keyframe, delta = light.take_status(keyframe_interval=3)
+    assert not keyframe
+    assert delta["color_temp"] == 3000
+    assert "state" not in delta and "brightness" not in delta
+    
+    # 每3次发布输出一次关键帧
+    keyframe, state = light.take_status(keyframe_interval=3)
+    assert keyframe and "brightness" in state
+    
+    # 请求关键帧
+    light.request_keyframe()
+    assert light.take_status(keyframe_interval=3)[0]
+
+# 序列化缓存测试
+def test_serialization_cache():
+    light = Light("light-003")
+    payload = light.to_json()
+    # 状态未变化时复用同一份编码结果
+    assert light.to_json() is payload
+    assert light.to_dict() is light.to_dict()
+    
+    # 赋相同的值不会使缓存失效
+    light.brightness = 50
+    assert light.to_json() is payload
+    
+    # 状态变化后缓存失效
+    light.handle_command({"command": "turn_on"})
+    assert light.to_json() is not payload
+    assert json.loads(light.to_json())["state"] == "on"
+
+# 版本号测试
+def test_version_bumped_on_mutation():
+    thermostat = Thermostat("thermo-ver")
+    smoke = SmokeDetector("smoke-ver")
+    versions = [thermostat.version]
+    thermostat.handle_command({"command": "set_target_temp", "temperature": 22})
+    versions.append(thermostat.version)
+    thermostat.update_current_temp(21.5)
+    versions.append(thermostat.version)
+    smoke.trigger_alarm()
+    assert versions == sorted(set(versions))
+    assert smoke.version > versions[-1]
+    assert FLEET_VERSION.value >= smoke.version
+    
+    # 读取状态不改变版本
+    version = smoke.version
+    smoke.to_json()
+    assert smoke.version == version
@@ -0,0 +1,97 @@
+import pytest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Thermostat, AirConditioner
+from old.fleet import FleetStore
+
+def trajectory(fleet, device, seconds, tick=10.0, start=0.0):
+    """按节拍推进并记录温控器读数"""
+    readings = []
+    for step in range(int(seconds / tick) + 1):
+        fleet.tick(now=start + step * tick)
+        readings.append(device.current_temp)
+    return np.array(readings)
+
+# 温控器加热到目标温度且曲线平滑测试
+def test_thermostat_heats_room_smoothly():
+    fleet = FleetStore(seed=1)
+    thermostat = fleet.add(Thermostat, "thermostat-1")
+    thermostat.handle_command({"command": "set_mode", "mode": "heat"})
+    thermostat.handle_command({"command": "set_target_temp", "temperature": 26})
+    
+    temps = trajectory(fleet, thermostat, 3600)
+    assert temps[0] == 22.0
+    assert abs(temps[-1] - 26) < 0.5
+    # 每个节拍的变化很小，且升温过程单调（不振荡）
+    assert np.abs(np.diff(temps)).max() <= 0.1 + 1e-9
+    assert (np.diff(temps) >= 0).all()
+    
+    # 制冷模式下目标温度低于室温时不加热
+    thermostat.handle_command({"command": "set_mode", "mode": "cool"})
+    thermostat.handle_command({"command": "set_target_temp", "temperature": 20})
+    later = trajectory(fleet, thermostat, 1800, start=3610)
+    assert later[-1] < temps[-1]
+
+# 同一房间的空调影响温控器读数测试
+def test_ac_cools_shared_room():
+    fleet = FleetStore(seed=1)
+    thermostat = fleet.add(Thermostat, "thermostat-1", room="living")
+    thermostat.handle_command({"command": "set_mode", "mode": "heat"})
+    thermostat.handle_command({"command": "set_target_temp", "temperature": 16})
+    ac = fleet.add(AirConditioner, "ac-1", room="living")
+    dry = fleet.add(AirConditioner, "ac-2")
+    fan = fleet.add(AirConditioner, "ac-3")
+    for device in (ac, dry, fan):
+        device.handle_command({"command": "turn_on"})
+        device.handle_command({"command": "set_temp", "temp": 18})
+    dry.handle_command({"command": "set_mode", "mode": "dry"})
+    fan.handle_command({"command": "set_mode", "mode": "fan"})
+    
+    temps = trajectory(fleet, thermostat, 1800)
+    assert temps[-1] < 20
+    assert len(fleet.environment) == 3
+    # 未指定房间的空调独占以设备ID命名的房间；除湿模式的房间比送风模式更干燥
+    assert (fleet.environment.room_state("ac-2")["humidity"]
+            < fleet.environment.room_state("ac-3")["humidity"])
+    
+    # 房间向室外温度弛豫，关闭空调后回升
+    ac.handle_command({"command": "turn_off"})
+    fleet.environment.outdoor_temp = 30
+    fleet.environment.outdoor_amplitude = 0
+    later = trajectory(fleet, thermostat, 3600, start=1810)
+    assert later[-1] > temps[-1]
+
+# 移除设备后释放房间测试
+def test_removed_devices_free_rooms(tmp_path):
+    from old.snapshot import save_snapshot, load_snapshot
+    fleet = FleetStore(seed=1)
+    shared = [fleet.add(Thermostat, "thermostat-0", room="living"),
+              fleet.add(AirConditioner, "ac-0", room="living")]
+    for i in range(1000):
+        fleet.remove(fleet.add(Thermostat, f"thermostat-{i + 1}"))
+    fleet.remove(fleet.add_many(AirConditioner, ["ac-1", "ac-2"])[1])
+    # 反复增删后房间数和编号范围保持有界，空闲编号被复用
+    assert len(fleet) == 3
+    assert sorted(fleet.environment.rooms) == ["ac-1", "living"]
+    assert fleet.environment.size == 3 and fleet.environment.temp.size == 1024
+    fleet.tick(now=1000.0)
+
+    # 空闲编号在快照中保留，恢复后重新计入成员数
+    path = str(tmp_path / "fleet.snapshot")
+    save_snapshot(fleet, path)
+    restored = FleetStore(seed=1)
+    load_snapshot(restored, path)
+    assert sorted(restored.environment.rooms) == ["ac-1", "living"]
+    restored.remove(restored.select(AirConditioner, prefix="ac-0")[0])
+    assert "living" in restored.environment.rooms
+    restored.remove(restored.select(Thermostat)[0])
+    assert sorted(restored.environment.rooms) == ["ac-1"]
+
+    # 只有房间的最后一台设备移除时才删除房间
+    fleet.remove(shared[0])
+    assert "living" in fleet.environment.rooms
+    fleet.remove(shared[1])
+    assert sorted(fleet.environment.rooms) == ["ac-1"]
+    assert len(fleet.environment) == 1
@@ -0,0 +1,51 @@
+import pytest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.events import EventHub
+from old.devices import Light
+
+def parse_events(chunks):
+    """把 SSE 片段解析为 (事件名, 数据) 列表"""
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.decode("utf-8").strip().split("\n")
+                      if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+# 只推送变化并按设备合并测试
+def test_publish_skips_unchanged_and_coalesces():
+    hub = EventHub(heartbeat=0.01)
+    subscriber = hub.subscribe()
+    light = Light("light-001")
+
+    assert hub.publish("light-001", light.to_json())
+    # 缓存的编码结果未变化，不再推送
+    assert not hub.publish("light-001", light.to_json())
+    light.handle_command({"command": "turn_on"})
+    assert hub.publish("light-001", light.to_json())
+
+    pending = subscriber.take(0)
+    assert list(pending) == ["light-001"]
+    assert json.loads(pending["light-001"])["state"] == "on"
+
+# 事件流格式测试
+def test_stream_update_and_remove_events():
+    hub = EventHub(heartbeat=0.01)
+    subscriber = hub.subscribe()
+    stream = hub.stream(subscriber)
+    assert next(stream).startswith(b"retry:")
+
+    hub.publish("light-001", Light("light-001").to_json())
+    hub.publish("light-002", Light("light-002").to_json())
+    hub.remove("light-002")
+    events = parse_events([next(stream), next(stream)])
+    assert events[0][0] == "update"
+    assert sorted(events[0][1]) == ["light-001"]
+    assert events[1] == ("remove", ["light-002"])
+
+    stream.close()
+    assert len(hub) == 0
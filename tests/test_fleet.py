@@ -0,0 +1,108 @@
+import pytest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light, Thermostat, SmokeDetector, DoorLock, Plug, Fan
+from old.fleet import FleetStore
+
+# 行视图测试
+def test_view_keeps_device_api():
+    fleet = FleetStore(seed=1)
+    light = fleet.add(Light, "light-001")
+    assert isinstance(light, Light)
+    assert light.type == "light"
+    
+    light.handle_command({"command": "set_brightness", "brightness": 80})
+    light.handle_command({"command": "turn_on"})
+    assert light.state == "on"
+    assert light.brightness == 80
+    # 状态写入列数组
+    table = fleet.table(Light)
+    assert table.arrays["brightness"][light._row] == 80
+    
+    # to_dict 输出可直接序列化为JSON
+    data = json.loads(json.dumps(light.to_dict()))
+    assert data["power_consumption"] == pytest.approx(8.0)
+    
+    lock = fleet.add(DoorLock, "doorlock-001")
+    assert lock.last_lock_time is None
+    lock.handle_command({"command": "lock"})
+    assert isinstance(lock.last_lock_time, str)
+
+# 行复用测试
+def test_remove_reuses_row():
+    fleet = FleetStore(seed=1)
+    first = fleet.add(Light, "light-001")
+    fleet.add(Light, "light-002")
+    fleet.remove(first)
+    assert len(fleet) == 1
+    
+    third = fleet.add(Light, "light-003")
+    assert third._row == first._row
+    assert third.state == "off"
+    assert fleet.table(Light).ids[third._row] == "light-003"
+
+# 向量化节拍测试
+def test_tick_updates_whole_type():
+    fleet = FleetStore(seed=42)
+    thermostats = [fleet.add(Thermostat, f"thermostat-{i}") for i in range(2000)]
+    detectors = [fleet.add(SmokeDetector, f"smoke-{i}") for i in range(2000)]
+    
+    fleet.tick(now=1000.0)
+    updated = fleet.tick(now=1600.0)
+    # 温控器读数来自所在房间：自动模式下从22℃向目标温度24℃升温
+    changed = updated[Thermostat]
+    assert changed.size == 2000
+    for row in changed[:50]:
+        device = thermostats[row]
+        assert 22 < device.current_temp <= 24
+        assert 10 <= device.humidity <= 95
+    
+    # 向量化更新的设备被标记为已变化
+    device = thermostats[changed[0]]
+    assert {"current_temp", "humidity", "last_update"} <= set(device.dirty_fields())
+    # 每个被更新的设备都得到新的、互不相同的版本号
+    versions = {thermostats[row].version for row in changed}
+    assert len(versions) == changed.size
+    
+    alarmed = updated[SmokeDetector]
+    assert 100 < alarmed.size < 300  # 约10%
+    assert all(detectors[row].alarm for row in alarmed)
+    assert all(50 <= detectors[row].smoke_level <= 100 for row in alarmed)
+
+# 按条件选择设备测试
+def test_select_filters_on_columns():
+    fleet = FleetStore(seed=0)
+    lights = [fleet.add(Light, f"light-{i}") for i in range(10)]
+    fleet.add(Plug, "plug-0")
+    lights[3].online = False
+    assert len(fleet.select()) == 11
+    assert len(fleet.select(Light)) == 10
+    assert [d.device_id for d in fleet.select(Light, online=False)] == ["light-3"]
+    assert [d.device_id for d in fleet.select(prefix="plug")] == ["plug-0"]
+    assert fleet.select(Fan) == []
+
+# 批量新建测试
+def test_add_many_matches_add():
+    single, batch = FleetStore(seed=1), FleetStore(seed=1)
+    freed = batch.add(Plug, "plug-old")
+    batch.remove(freed)
+    ids = [f"plug-{i}" for i in range(5)]
+    expected = [single.add(Plug, device_id, group="floor-1") for device_id in ids]
+    created = batch.add_many(Plug, ids, group="floor-1")
+    # 释放的行被复用，状态、版本顺序和汇总与逐个添加一致
+    assert created[0]._row == freed._row
+    for a, b in zip(expected, created):
+        left, right = a.to_dict(), b.to_dict()
+        left.pop("last_update"), right.pop("last_update")
+        assert left == right
+    assert [d._version for d in created] == sorted(d._version for d in created)
+    assert batch.stats.snapshot() == single.stats.snapshot()
+
+    rooms = ["living", None, "living"]
+    thermostats = batch.add_many(Thermostat, ["t-1", "t-2", "t-3"], rooms=rooms)
+    room_of = batch.table(Thermostat).arrays["_room"]
+    assert room_of[thermostats[0]._row] == room_of[thermostats[2]._row]
+    assert room_of[thermostats[1]._row] != room_of[thermostats[0]._row]
+    assert batch.add_many(Light, []) == []
@@ -0,0 +1,93 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light, Thermostat, Plug
+from old.fleet import FleetStore
+from old.history import StateHistory
+from old.web_app import app
+import json
+
+# 原始采样与环形覆盖测试
+def test_raw_ring_keeps_latest_samples():
+    fleet = FleetStore(seed=5, history=StateHistory(raw=5, minutes=3, hours=2))
+    thermostat = fleet.add(Thermostat, "thermostat-1")
+    readings = []
+    for step in range(8):
+        fleet.tick(now=step * 10.0)
+        readings.append(thermostat.current_temp)
+
+    history = fleet.device_history(thermostat, "current_temp", resolution="raw")
+    times = [t for t, _ in history["points"]]
+    assert times == [30.0, 40.0, 50.0, 60.0, 70.0]
+    assert [v for _, v in history["points"]] == pytest.approx(readings[3:], abs=1e-3)
+
+    # 时间范围过滤
+    history = fleet.device_history(thermostat, "current_temp", 40, 50, "raw")
+    assert [t for t, _ in history["points"]] == [40.0, 50.0]
+
+# 分钟和小时降采样测试
+def test_downsampling_means():
+    fleet = FleetStore(seed=5, history=StateHistory(raw=4, minutes=10, hours=2))
+    light = fleet.add(Light, "light-1")
+    light.handle_command({"command": "set_brightness", "brightness": 40})
+    light.handle_command({"command": "turn_on"})
+    for step in range(6):  # 0-50秒：4W
+        fleet.tick(now=step * 10.0)
+    light.handle_command({"command": "set_brightness", "brightness": 80})
+    for step in range(6, 12):  # 60-110秒：前3个节拍8W，之后关灯
+        if step == 9:
+            light.handle_command({"command": "turn_off"})
+        fleet.tick(now=step * 10.0)
+    fleet.tick(now=120.0)
+
+    history = fleet.device_history(light, "power_consumption", resolution="1m")
+    assert history["points"] == [(0.0, pytest.approx(4.0)), (60.0, pytest.approx(4.0))]
+    # 覆盖 from 的最细分辨率：原始采样只保留最近4个节拍，因此选择1分钟
+    assert fleet.device_history(light, "power_consumption", start=0.0)["resolution"] == "1m"
+    assert fleet.device_history(light, "power_consumption", start=100.0)["resolution"] == "raw"
+
+    with pytest.raises(ValueError):
+        fleet.device_history(light, "humidity")
+
+# 内存固定与行复用测试
+def test_memory_is_fixed_and_reused_rows_start_empty():
+    history = StateHistory(raw=10, minutes=10, hours=10)
+    fleet = FleetStore(seed=5, history=history)
+    plugs = [fleet.add(Plug, f"plug-{i}") for i in range(100)]
+    fleet.tick(now=0.0)
+    size = history.nbytes()
+    for step in range(1, 500):
+        fleet.tick(now=step * 10.0)
+    assert history.nbytes() == size
+
+    fleet.remove(plugs[0])
+    plug = fleet.add(Plug, "plug-new")
+    assert plug._row == plugs[0]._row
+    assert fleet.device_history(plug, "power_consumption", resolution="raw")["points"] == []
+    assert fleet.device_history(plug, "power_consumption", resolution="1h")["points"] == []
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# 历史接口测试
+def test_history_api(client):
+    client.post('/api/devices', json={'type': 'thermostat', 'id': 'test-thermostat-history'})
+    from old.web_app import fleet
+    fleet.tick()
+    response = client.get('/api/devices/test-thermostat-history/history?field=humidity')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['field'] == 'humidity'
+    assert data['resolution'] == 'raw'
+    assert len(data['points']) >= 1
+
+    assert client.get('/api/devices/test-thermostat-history/history').status_code == 400
+    assert client.get('/api/devices/test-thermostat-history/history'
+                      '?field=humidity&from=abc').status_code == 400
+    assert client.get('/api/devices/test-thermostat-history/history'
+                      '?field=brightness').status_code == 400
+    assert client.get('/api/devices/missing/history?field=humidity').status_code == 404
@@ -0,0 +1,75 @@
+import pytest
+import json
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.ingest import CommandQueue
+
+def payload(n):
+    return json.dumps({"command": "set", "n": n}).encode()
+
+# 同一设备按顺序执行测试
+def test_per_device_ordering():
+    seen = {}
+    lock = threading.Lock()
+    
+    def handler(device_id, command):
+        with lock:
+            seen.setdefault(device_id, []).append(command["n"])
+    
+    queue = CommandQueue(handler, workers=4, capacity=100000)
+    queue.start()
+    for n in range(500):
+        for d in range(10):
+            queue.submit(f"light-{d}", payload(n))
+    assert queue.join(10)
+    queue.stop()
+    assert all(seen[f"light-{d}"] == list(range(500)) for d in range(10))
+    stats = queue.stats()
+    assert stats["processed"] == 5000
+    assert stats["depth"] == 0
+    assert stats["latency_ms"]["max"] >= stats["latency_ms"]["p50"] >= 0
+
+# 队列满时的丢弃策略测试
+@pytest.mark.parametrize("policy,expected", [("drop_new", [0, 1]), ("drop_oldest", [3, 4])])
+def test_drop_policies(policy, expected):
+    seen = []
+    queue = CommandQueue(lambda device_id, command: seen.append(command["n"]),
+                         workers=1, capacity=2, policy=policy)
+    # 工作线程尚未启动，队列很快被填满
+    for n in range(5):
+        queue.submit("light-1", payload(n))
+    assert len(queue) == 2
+    assert queue.stats()["dropped"] == 3
+    queue.start()
+    assert queue.join(5)
+    queue.stop()
+    assert seen == expected
+    # MQTT 网络线程调用 submit，默认策略不等待
+    assert CommandQueue(lambda device_id, command: None).policy == "drop_oldest"
+
+# 阻塞策略与错误计数测试
+def test_block_policy_waits_for_space():
+    release = threading.Event()
+    seen = []
+    
+    def handler(device_id, command):
+        release.wait(5)
+        seen.append(command["n"])
+    
+    queue = CommandQueue(handler, workers=1, capacity=1, policy="block", block_timeout=0.05)
+    queue.start()
+    assert queue.submit("light-1", payload(0))
+    assert queue.join(0.05) is False  # 第一条命令正在执行
+    assert queue.submit("light-1", payload(1))  # 进入队列
+    assert not queue.submit("light-1", payload(2))  # 等待超时后丢弃
+    release.set()
+    queue.block_timeout = 5
+    assert queue.submit("light-1", b"not json")
+    assert queue.join(5)
+    queue.stop()
+    assert seen == [0, 1]
+    stats = queue.stats()
+    assert stats["dropped"] == 1
+    assert stats["errors"] == 1
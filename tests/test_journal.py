@@ -0,0 +1,143 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light, Thermostat, AirConditioner, SmokeDetector, Plug
+from old.fleet import FleetStore
+from old.journal import Journal, Replayer, read_journal, rotate
+from old.randomness import set_run_seed
+from old import clock as sim_clock
+from old.web_app import app
+
+def run_session(path):
+    """按 Web 应用的方式执行并记录一段模拟"""
+    set_run_seed(2024)
+    clock = sim_clock.StepClock(start=1000.0)
+    previous = sim_clock.set_clock(clock)
+    journal = Journal(path, fsync_interval=0.01)
+    journal.start()
+    fleet = FleetStore()
+    devices = {}
+
+    def add(device_class, type_name, device_id, room=None):
+        with journal.ordered():
+            devices[device_id] = fleet.add(device_class, device_id, room=room)
+            journal.append("add", device=device_id, type=type_name, room=room, group=None)
+
+    def command(device_id, message):
+        device = devices[device_id]
+        with journal.ordered(device.type):
+            device.handle_command(message)
+            journal.append("command", device=device_id, command=message, source="rest")
+
+    for i in range(10):
+        add(Light, "light", f"light-{i}")
+        add(Plug, "plug", f"plug-{i}")
+        add(SmokeDetector, "smoke_detector", f"smoke-{i}")
+    add(Thermostat, "thermostat", "thermostat-1", room="living")
+    add(AirConditioner, "ac", "ac-1", room="living")
+    command("ac-1", {"command": "turn_on"})
+    command("thermostat-1", {"command": "set_target_temp", "temperature": 25})
+    command("light-3", {"command": "unknown"})
+    for step in range(30):
+        for i in range(0, 10, 3):
+            command(f"plug-{i}", {"command": "turn_on" if step % 2 else "turn_off"})
+        journal.tick(fleet)
+        clock.sleep(10)
+    with journal.ordered():
+        fleet.remove(devices.pop("light-5"))
+        journal.append("remove", device="light-5")
+    journal.close()
+    sim_clock.set_clock(previous)
+    return fleet
+
+# 记录与确定性回放测试
+def test_replay_reproduces_state(tmp_path):
+    path = str(tmp_path / "journal.log")
+    fleet = run_session(path)
+
+    records = list(read_journal(path))
+    assert records[0]["kind"] == "header" and records[0]["seed"] == 2024
+    assert [record["seq"] for record in records] == list(range(1, len(records) + 1))
+    ticks = [record for record in records if record["kind"] == "tick"]
+    assert len(ticks) == 30
+    assert sum(tick["events"]["readings"] for tick in ticks) > 0
+
+    set_run_seed(999)  # 回放使用日志头部中的种子
+    published = []
+    replayer = Replayer(publish=published.append)
+    stats = replayer.run(records)
+    assert stats["ticks"] == 30 and stats["divergences"] == 0
+    assert stats["commands"] == 3 + 30 * 4
+    assert len(replayer.fleet) == len(fleet) == 31
+    originals = {device.device_id: device for device in fleet.select()}
+    for device in replayer.fleet.select():
+        # 设备时间戳同样来自模拟时钟，回放结果逐字段相同
+        assert device.to_dict() == originals[device.device_id].to_dict()
+    assert published
+
+    # 篡改节拍事件后回放会报告不一致
+    ticks[5]["events"]["digest"] += 1
+    assert Replayer().run(records)["divergences"] == 1
+    set_run_seed(None)
+
+# 倍速回放与不完整记录测试
+def test_replay_speed_and_partial_records(tmp_path):
+    path = str(tmp_path / "journal.log")
+    run_session(path)
+    records = list(read_journal(path))
+    assert records[-1]["t"] - records[0]["t"] == pytest.approx(300.0)
+
+    # 300 秒的模拟按 1000 倍速约 0.3 秒回放完，不限速时远快于此
+    assert Replayer(speed=1000).run(records)["seconds"] >= 0.3
+    assert Replayer().run(records)["seconds"] < 0.3
+    with pytest.raises(ValueError):
+        Replayer(speed=0)
+    with pytest.raises(ValueError):
+        Replayer().run(records[1:])
+
+    # 进程崩溃留下的半条记录被忽略
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 999, "kind": "com')
+    assert len(list(read_journal(path))) == len(records)
+    set_run_seed(None)
+
+# Web 应用命令记录测试
+def test_web_app_journals_commands(tmp_path, monkeypatch):
+    from old import web_app
+    journal = Journal(str(tmp_path / "web.log"))
+    monkeypatch.setattr(web_app, "journal", journal)
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        client.post('/api/devices', json={'type': 'light', 'id': 'test-light-journal'})
+        client.post('/api/devices/test-light-journal/command', json={'command': 'turn_on'})
+        response = client.post('/api/devices/test-light-journal/command', json={'command': 'fly'})
+        assert response.status_code == 400
+        client.delete('/api/devices/test-light-journal')
+    journal.close()
+
+    kinds = [(record["kind"], record.get("device")) for record in read_journal(journal.path)]
+    assert kinds == [("header", None), ("add", "test-light-journal"),
+                     ("command", "test-light-journal"), ("remove", "test-light-journal")]
+    set_run_seed(None)
+
+# 同一路径重启日志测试
+def test_restart_rotates_journal(tmp_path):
+    path = str(tmp_path / "journal.log")
+    run_session(path)
+    first_records = list(read_journal(path))
+    run_session(path)
+
+    # 前一次运行被重命名，两个文件各自只有一个头部并能独立回放
+    assert os.path.exists(path + ".1") and not os.path.exists(path + ".2")
+    assert list(read_journal(path + ".1")) == first_records
+    for log in (path, path + ".1"):
+        records = list(read_journal(log))
+        assert [record["kind"] for record in records].count("header") == 1
+        assert Replayer().run(records)["divergences"] == 0
+    assert rotate(str(tmp_path / "missing.log")) is None
+
+    # 拼接在一起的多次运行会被拒绝，而不是静默地回放出不同的结果
+    with pytest.raises(ValueError):
+        Replayer().run(first_records + list(read_journal(path)))
+    set_run_seed(None)
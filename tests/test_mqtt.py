@@ -1,11 +1,11 @@
 import pytest
 import json
-import time
 from unittest.mock import MagicMock, patch
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from old.web_app import device_prefix
+from old import web_app
 
 def test_mqtt_publish_subscribe(mock_mqtt):
     """测试MQTT消息发布和订阅"""
@@ -41,4 +41,32 @@ def test_mqtt_error_handling(mock_mqtt):
     mock_mqtt.publish.side_effect = Exception("Publish failed")
     with pytest.raises(Exception) as exc_info:
         mock_mqtt.publish("test/topic", "test message")
-    assert str(exc_info.value) == "Publish failed" 
\ No newline at end of file
+    assert str(exc_info.value) == "Publish failed" 
+
+def test_wildcard_control_routing():
+    """测试通配符订阅与控制主题路由"""
+    # 连接后只订阅一次通配符控制主题
+    client = MagicMock()
+    web_app.on_connect(client, None, {}, 0)
+    control_subscriptions = [call for call in client.subscribe.call_args_list
+                             if '/control/' in call.args[0]]
+    assert [call.args[0] for call in control_subscriptions] == [f"{device_prefix}/control/+"]
+    
+    # 添加设备不再逐个订阅
+    web_app.app.config['TESTING'] = True
+    with patch.object(web_app.mqtt_client, 'subscribe') as subscribe, \
+            web_app.app.test_client() as http:
+        for i in range(20):
+            http.post('/api/devices', json={'type': 'light', 'id': f'route-light-{i}'})
+        subscribe.assert_not_called()
+    
+    # 控制消息按路由表分发到对应设备
+    message = MagicMock()
+    message.topic = web_app.control_topic('route-light-7')
+    message.payload = json.dumps({"command": "turn_on"}).encode()
+    web_app.command_queue.start()
+    web_app.on_message(None, None, message)
+    # 命令在工作线程中执行
+    assert web_app.command_queue.join(5)
+    assert web_app.devices['route-light-7'].state == 'on'
+    assert web_app.devices['route-light-8'].state == 'off'
@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old import randomness
+from old.devices import Plug, Thermostat, SmokeDetector
+from old.fleet import FleetStore
+
+@pytest.fixture
+def seeded():
+    randomness.set_run_seed(1234)
+    yield
+    randomness.set_run_seed(None)
+
+def run_fleet(extra_types=()):
+    fleet = FleetStore()
+    detectors = [fleet.add(SmokeDetector, f"smoke-{i}") for i in range(200)]
+    for device_class in extra_types:
+        for i in range(50):
+            fleet.add(device_class, f"{device_class.type}-{i}")
+    for step in range(5):
+        fleet.tick(now=1000.0 + step)
+    return [(d.alarm, d.smoke_level, d.online) for d in detectors]
+
+# 相同运行种子逐位复现测试
+def test_same_seed_reproduces(seeded):
+    first = run_fleet()
+    plug = Plug("plug-1")
+    plug.handle_command({"command": "turn_on"})
+    first_power = plug.power_consumption
+    
+    randomness.set_run_seed(1234)
+    assert run_fleet() == first
+    plug = Plug("plug-1")
+    plug.handle_command({"command": "turn_on"})
+    assert plug.power_consumption == first_power
+    
+    randomness.set_run_seed(4321)
+    assert run_fleet() != first
+
+# 各类型的随机数流相互独立测试
+def test_streams_are_independent(seeded):
+    assert run_fleet() == run_fleet(extra_types=(Thermostat, Plug))
+    a = randomness.generator("fleet", "light").random(4)
+    b = randomness.generator("fleet", "fan").random(4)
+    assert not np.array_equal(a, b)
+    assert randomness.stream("device", "plug") is Plug._rng
@@ -0,0 +1,95 @@
+import pytest
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.registry import DeviceRegistry
+from old.devices import Light
+
+# 基本操作测试
+def test_add_pop_and_snapshot_isolation():
+    registry = DeviceRegistry(stripes=4)
+    assert registry.add("light-1", "a")
+    assert not registry.add("light-1", "b")
+    assert registry["light-1"] == "a"
+    registry.add("light-2", "c")
+
+    snapshot = registry.snapshot()
+    registry.add("light-3", "d")
+    assert registry.pop("light-1") == "a"
+    assert registry.pop("light-1") is None
+
+    # 快照不受之后写入的影响
+    assert sorted(snapshot) == ["light-1", "light-2"]
+    assert snapshot["light-1"] == "a"
+    assert sorted(registry) == ["light-2", "light-3"]
+    assert len(registry) == 2
+
+# 批量添加测试
+def test_add_many_skips_existing_and_keeps_snapshots():
+    registry = DeviceRegistry(stripes=4)
+    registry.add("light-1", "old")
+    snapshot = registry.snapshot()
+    ids = [f"light-{i}" for i in range(100)] + ["light-7"]
+    values = [f"new-{i}" for i in range(100)] + ["duplicate"]
+    assert registry.add_many(ids, values) == 99
+    assert registry["light-1"] == "old"
+    assert registry["light-7"] == "new-7"
+    assert len(registry) == 100 and registry.add_many([], []) == 0
+    assert list(snapshot) == ["light-1"]
+
+# 并发读写测试
+def test_concurrent_writers_and_readers():
+    registry = DeviceRegistry(stripes=8)
+    errors = []
+    done = threading.Event()
+
+    def writer(offset):
+        for i in range(2000):
+            device_id = f"light-{offset}-{i}"
+            registry.add(device_id, i)
+            if i % 3 == 0:
+                registry.pop(device_id)
+
+    def reader():
+        try:
+            while not done.is_set():
+                for device_id, value in registry.snapshot().items():
+                    assert isinstance(value, int)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    writers = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert len(registry) == 4 * (2000 - 667)
+
+# 同一设备命令串行执行测试
+def test_commands_serialized_per_device():
+    registry = DeviceRegistry()
+    registry.add("light-1", Light("light-1"))
+    counter = {"value": 0}
+
+    def worker():
+        for _ in range(1000):
+            with registry.command("light-1") as device:
+                value = counter["value"]
+                device.handle_command({"command": "set_brightness", "brightness": value % 100})
+                counter["value"] = value + 1
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter["value"] == 4000
+
+    with registry.command("missing") as device:
+        assert device is None
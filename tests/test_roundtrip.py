@@ -0,0 +1,69 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.async_engine import AsyncSimulator
+from old.roundtrip import LatencyHistogram, LocalBroker, RoundTripLoad
+from old.serialization import prepend_field
+import json
+
+# 延迟直方图分位数测试
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    summary = histogram.summary()
+    assert summary["p50"] == pytest.approx(500, rel=0.02)
+    assert summary["p99"] == pytest.approx(990, rel=0.02)
+    assert summary["p999"] == pytest.approx(999, rel=0.02)
+    assert summary["max"] == pytest.approx(1000)
+    assert summary["avg"] == pytest.approx(500.5)
+    assert LatencyHistogram().summary()["p99"] == 0.0
+
+# 关联ID回传测试
+def test_correlation_id_is_echoed():
+    assert prepend_field(b'{"online":true}', "correlation_id", "c-1") == \
+        b'{"correlation_id":"c-1","online":true}'
+    assert prepend_field(b'{}', "correlation_id", 7) == b'{"correlation_id":7}'
+
+    published = []
+    simulator = AsyncSimulator("test", lambda topic, payload: published.append((topic, payload)),
+                               seed=0)
+    simulator.add_device("light", "light-1")
+    simulator.handle_command("light-1", {"command": "turn_on", "correlation_id": "abc"})
+    topic, payload = published[-1]
+    assert topic == "test/status/light-1"
+    status = json.loads(payload)
+    assert status["correlation_id"] == "abc" and status["state"] == "on"
+
+# 进程内 Broker 替身上的端到端往返测试
+def test_round_trip_against_web_app(monkeypatch):
+    from old import web_app
+    broker = LocalBroker()
+    simulator_client = broker.client("WebSimulator")
+    monkeypatch.setattr(web_app, "mqtt_client", simulator_client)
+    device_ids = [f"test-roundtrip-{i}" for i in range(20)]
+    for device_id in device_ids:
+        web_app.create_device("light", device_id, notify=False)
+    web_app.start_mqtt_client()
+
+    client = broker.client("RoundTripLoad")
+    client.loop_start()
+    load = RoundTripLoad(client, web_app.device_prefix,
+                         {device_id: {"command": "turn_on"} for device_id in device_ids},
+                         concurrency=5, device_rate=10, timeout=2)
+    stats = load.run(0.5)
+    client.loop_stop()
+    simulator_client.loop_stop()
+
+    assert stats["sent"] > 0
+    assert stats["completed"] == stats["sent"] and stats["lost"] == 0
+    # 每台设备每秒最多 10 条命令
+    assert stats["sent"] <= 20 * 10 * 0.5 + 20
+    assert stats["throughput"] > 0
+    assert 0 < stats["latency_ms"]["p50"] <= stats["latency_ms"]["p999"] <= stats["latency_ms"]["max"]
+    assert all(web_app.devices.get(device_id).to_dict()["state"] == "on" for device_id in device_ids)
+
+    with web_app.app.test_client() as http:
+        for device_id in device_ids:
+            http.delete(f'/api/devices/{device_id}')
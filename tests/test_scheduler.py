@@ -0,0 +1,82 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.scheduler import PublishScheduler, parse_intervals
+
+class FakeClock:
+    """可手动推进的时钟"""
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+# 发布时间均匀分布测试
+def test_publishes_spread_over_period():
+    clock = FakeClock()
+    scheduler = PublishScheduler(interval=10, clock=clock)
+    for i in range(100):
+        scheduler.add(f"light-{i:03d}")
+    
+    # 每秒到期的设备数大致相同，而不是集中在同一时刻
+    clock.now -= 0.001
+    counts = []
+    for _ in range(10):
+        clock.now += 1
+        counts.append(len(scheduler.pop_due()))
+    assert sum(counts) == 100
+    assert max(counts) - min(counts) <= 3
+
+# 无漂移测试
+def test_schedule_does_not_drift():
+    clock = FakeClock()
+    scheduler = PublishScheduler(interval=10, clock=clock)
+    scheduler.add("light-001")
+    first = scheduler.next_due()
+    
+    # 每次都晚于计划时间处理，下一次计划时间仍在原网格上
+    for k in range(1, 6):
+        clock.now = scheduler.next_due() + 0.7
+        assert scheduler.pop_due() == ["light-001"]
+        assert scheduler.next_due() == pytest.approx(first + 10 * k)
+    assert scheduler.overruns == 0
+
+# 超限与类型周期测试
+def test_overrun_and_type_intervals():
+    clock = FakeClock()
+    scheduler = PublishScheduler(interval=10, jitter=0.2, seed=1, clock=clock,
+                                 type_intervals=parse_intervals("thermostat=2, fan=30"))
+    assert scheduler.interval_for("thermostat") == 2
+    scheduler.add("thermostat-001", "thermostat")
+    scheduler.add("fan-001", "fan")
+    
+    # 长时间停顿后只发布一次，并记录超限
+    clock.now += 100
+    assert sorted(scheduler.pop_due()) == ["fan-001", "thermostat-001"]
+    assert scheduler.overruns == 2
+    assert scheduler.next_due() > clock.now
+    
+    scheduler.remove("fan-001")
+    assert "fan-001" not in scheduler
+    clock.now += 100
+    assert scheduler.pop_due() == ["thermostat-001"]
+
+# 批量添加与逐个添加一致测试
+def test_add_many_matches_add():
+    clock = FakeClock()
+    single = PublishScheduler(interval=10, jitter=0.2, seed=3, clock=clock)
+    bulk = PublishScheduler(interval=10, jitter=0.2, seed=3, clock=clock)
+    single.add("fan-first", "fan")
+    bulk.add("fan-first", "fan")
+    ids = [f"fan-{i:03d}" for i in range(200)]
+    for device_id in ids:
+        single.add(device_id, "fan")
+    bulk.add_many(ids, "fan")
+    bulk.add_many([], "fan")
+    assert len(bulk) == 201 and "fan-150" in bulk
+    # 相位、抖动和到期顺序都相同
+    assert bulk.next_due() == single.next_due()
+    for _ in range(25):
+        clock.now += 1
+        assert bulk.pop_due() == single.pop_due()
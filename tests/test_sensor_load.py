@@ -0,0 +1,93 @@
+import pytest
+import sys
+import os
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from old.sensor_load import SENSOR_TYPES, SensorGenerator, SensorLoad, TokenBucket
+import json
+
+class FakeClient:
+    """记录发布的消息，按需在 publish 返回之前或之后确认发送完成"""
+
+    def __init__(self, immediate=True):
+        self.immediate = immediate
+        self.on_publish = None
+        self.messages = []
+        self.unconfirmed = []
+
+    def publish(self, topic, payload, qos=0):
+        mid = len(self.messages) + 1
+        self.messages.append((topic, payload))
+        if self.immediate:
+            self.on_publish(self, None, mid)
+        else:
+            self.unconfirmed.append(mid)
+        return SimpleNamespace(rc=0, mid=mid)
+
+    def confirm(self):
+        for mid in self.unconfirmed:
+            self.on_publish(self, None, mid)
+        self.unconfirmed = []
+
+# 向量化读数生成测试
+def test_generator_ranges_and_format():
+    sensor = SensorGenerator(ids_per_type=5000, rng=np.random.default_rng(1))
+    readings = [json.loads(payload) for payload in sensor.batch(20000)]
+    assert {reading["type"] for reading in readings} == set(SENSOR_TYPES)
+    for reading in readings:
+        low, high = SENSOR_TYPES[reading["type"]]
+        assert low <= reading["value"] <= high
+        assert 1 <= reading["id"] <= 5000
+    assert len({(r["type"], r["id"]) for r in readings}) > 10000
+    # 与原来 json.dumps 的输出逐字节相同
+    payload = sensor.batch(1)[0]
+    assert payload == json.dumps(json.loads(payload)).encode("utf-8")
+
+    only = SensorGenerator(ids_per_type=1, types=["pressure"], rng=np.random.default_rng(1))
+    reading = json.loads(only.batch(1)[0])
+    assert reading["type"] == "pressure" and reading["id"] == 1
+    with pytest.raises(ValueError):
+        SensorGenerator(types=["vibration"])
+    with pytest.raises(ValueError):
+        SensorGenerator(ids_per_type=0)
+
+# 令牌桶限速测试
+def test_token_bucket_rate():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(100, burst=10, clock=lambda: now[0], sleep=sleep)
+    for _ in range(110):
+        bucket.acquire()
+    # 初始的 10 个令牌之后按每秒 100 个补充
+    assert now[0] == pytest.approx(1.0)
+    now[0] += 5  # 空闲期间最多积累 burst 个令牌
+    assert bucket.acquire(10) == 0
+    assert bucket.acquire(1) == pytest.approx(0.01)
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+# 多连接限速发布与延迟统计测试
+def test_load_rate_and_latency():
+    clients = [FakeClient(), FakeClient(immediate=False)]
+    load = SensorLoad(clients, "sensors", rate=2000, ids_per_type=100, batch_size=50)
+    load.start()
+    time.sleep(0.5)
+    load.stop()
+    clients[1].confirm()
+
+    stats = load.stats()
+    assert stats["sent"] == sum(len(client.messages) for client in clients)
+    # 初始容量 200 条，之后按每秒 2000 条
+    assert 600 <= stats["sent"] <= 1400
+    assert stats["errors"] == 0
+    assert stats["rate"] == pytest.approx(stats["sent"] / stats["seconds"])
+    assert all(client.messages for client in clients)
+    assert all(topic == "sensors" for client in clients for topic, _ in client.messages)
+    latency = stats["latency_ms"]
+    assert 0 <= latency["p50"] <= latency["p90"] <= latency["p99"] <= latency["max"]
+    assert latency["max"] > 0
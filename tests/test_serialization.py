@@ -0,0 +1,22 @@
+import pytest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old import serialization
+from old.serialization import dumps, join_object, set_encoder
+
+def test_encoders_produce_same_json():
+    state = {"type": "light", "online": True, "error_state": "设备连接异常", "brightness": 50}
+    for name in serialization.ENCODERS:
+        set_encoder(name)
+        assert json.loads(dumps(state)) == state
+    set_encoder()
+    
+    with pytest.raises(ValueError):
+        set_encoder("unknown")
+
+def test_join_object():
+    body = join_object([("light-001", b'{"state":"on"}'), ("fan-001", b'{"on":false}')])
+    assert json.loads(body) == {"light-001": {"state": "on"}, "fan-001": {"on": False}}
+    assert join_object([]) == b"{}"
@@ -0,0 +1,122 @@
+import pytest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light
+from old.randomness import set_run_seed
+from old.sharding import ShardSupervisor, ShardUnavailable, ShardWorker, create_app, shard_for
+
+CONFIG = {
+    "broker_ip": None,  # 不连接Broker
+    "broker_port": 1883,
+    "device_prefix": "test/devices",
+    "tick_interval": 10.0,
+    "publish_interval": 10.0,
+    "publish_jitter": 0.1,
+    "publish_intervals": {},
+}
+
+@pytest.fixture(scope="module")
+def supervisor():
+    supervisor = ShardSupervisor(2, CONFIG)
+    supervisor.start()
+    yield supervisor
+    supervisor.stop()
+
+def test_shard_for_is_stable():
+    assert shard_for("light-001", 4) == shard_for("light-001", 4)
+    owners = {shard_for(f"light-{i}", 4) for i in range(100)}
+    assert owners == {0, 1, 2, 3}
+
+def test_routes_to_owner_and_merges(supervisor):
+    client = create_app(supervisor).test_client()
+    for i in range(10):
+        response = client.post('/api/devices', json={'type': 'light', 'id': f'light-{i}'})
+        assert response.status_code == 200
+    response = client.post('/api/devices', json={'type': 'light', 'id': 'light-3'})
+    assert response.status_code == 400
+    
+    response = client.post('/api/devices/light-3/command', json={'command': 'turn_on'})
+    assert response.status_code == 200
+    assert json.loads(client.get('/api/devices/light-3').data)['state'] == 'on'
+    # 与单进程模式一样校验命令
+    response = client.post('/api/devices/light-3/command',
+        json={'command': 'set_brightness', 'brightness': 'bright'})
+    assert response.status_code == 400
+    assert client.post('/api/devices/light-3/command', json={'command': 'fly'}).status_code == 400
+    
+    # 合并所有分片的设备
+    devices = json.loads(client.get('/api/devices').data)
+    assert sorted(devices) == sorted(f'light-{i}' for i in range(10))
+    stats = json.loads(client.get('/api/shards').data)
+    assert sum(shard['devices'] for shard in stats) == 10
+    assert all(shard['devices'] > 0 for shard in stats)
+    
+    assert client.delete('/api/devices/light-3').status_code == 200
+    assert client.get('/api/devices/light-3').status_code == 404
+
+def test_add_devices_groups_by_shard(supervisor):
+    items = [('plug', f'plug-{i}') for i in range(20)] + [('plug', 'plug-0')]
+    assert supervisor.add_devices(items) == {'added': 20, 'skipped': 1}
+    for i in range(20):
+        status, _ = supervisor.get_device(f'plug-{i}')
+        assert status == 200
+
+# 分片随机数流测试
+def test_shards_draw_independent_device_streams():
+    config = dict(CONFIG, seed=1234)
+    draws = []
+    for index in (0, 1, 0):
+        ShardWorker(index, 2, config)
+        draws.append([Light._rng.random() for _ in range(5)])
+    set_run_seed(None)
+    # 同一种子下每个分片可复现，不同分片的按类型取值序列不同
+    assert draws[0] == draws[2]
+    assert draws[0] != draws[1]
+
+# 分片 MQTT 命令处理测试
+def test_shard_on_message_applies_command():
+    worker = ShardWorker(0, 1, dict(CONFIG, seed=1))
+    set_run_seed(None)
+    worker.op_add('light', 'light-mqtt')
+    message = type('Message', (), {})()
+    message.topic = 'test/devices/control/light-mqtt'
+    message.payload = json.dumps({'command': 'turn_on', 'correlation_id': 1}).encode()
+    worker.on_message(None, None, message)
+    assert worker.commands == 1 and worker.client.published == 1
+    assert json.loads(worker.op_get('light-mqtt')[1])['state'] == 'on'
+    # 分片锁在请求处理和节拍中使用，处理完成后已释放
+    assert not worker._lock.locked()
+
+# 分片按设备订阅控制主题测试
+def test_shard_subscribes_only_own_devices():
+    worker = ShardWorker(0, 1, dict(CONFIG, seed=1))
+    set_run_seed(None)
+    subscribed = []
+    worker.client.subscribe = lambda topics: subscribed.append([topic for topic, qos in topics])
+    worker.op_add_many([('plug', f'plug-{i}') for i in range(1200)] + [('plug', 'plug-0')])
+    # 合并为每批最多 500 个主题的 SUBSCRIBE
+    assert [len(batch) for batch in subscribed] == [500, 500, 200]
+    assert subscribed[0][0] == 'test/devices/control/plug-0'
+    # 重连后重新订阅全部设备
+    subscribed.clear()
+    worker.on_connect(worker.client, None, {}, 0)
+    assert sum(len(batch) for batch in subscribed) == 1200
+
+# 分片进程退出后返回 503 测试
+def test_dead_shard_returns_503():
+    supervisor = ShardSupervisor(1, CONFIG)
+    supervisor.start()
+    try:
+        client = create_app(supervisor).test_client()
+        assert client.post('/api/devices', json={'type': 'fan', 'id': 'fan-1'}).status_code == 200
+        supervisor._processes[0].kill()
+        supervisor._processes[0].join(5)
+        assert client.get('/api/devices/fan-1').status_code == 503
+        assert client.get('/api/devices').status_code == 503
+        # 已发出的请求在等待响应时发现进程退出，不会永久阻塞
+        with pytest.raises(ShardUnavailable):
+            supervisor._receive(0)
+    finally:
+        supervisor.stop()
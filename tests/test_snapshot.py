@@ -0,0 +1,99 @@
+import pytest
+import sys
+import os
+import gc
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light, Thermostat, AirConditioner, SmokeDetector, Plug
+from old.fleet import FleetStore
+from old.snapshot import SnapshotWriter, load_snapshot, save_snapshot
+import json
+
+def build_fleet():
+    fleet = FleetStore(seed=7)
+    for i in range(20):
+        fleet.add(Light, f"light-{i}", group="floor-1")
+        fleet.add(Plug, f"plug-{i}", group="floor-2")
+        fleet.add(SmokeDetector, f"smoke-{i}")
+    thermostat = fleet.add(Thermostat, "thermostat-1", room="living")
+    ac = fleet.add(AirConditioner, "ac-1", room="living")
+    ac.handle_command({"command": "turn_on"})
+    thermostat.handle_command({"command": "set_target_temp", "temperature": 25})
+    fleet.select(Light)[3].handle_command({"command": "unknown"})
+    for device in fleet.select(Plug)[::2]:
+        device.handle_command({"command": "turn_on"})
+    fleet.remove(fleet.select(Light)[5])
+    for step in range(10):
+        fleet.tick(now=1000.0 + step * 10)
+    return fleet
+
+# 保存与恢复往返测试
+def test_round_trip(tmp_path):
+    fleet = build_fleet()
+    path = str(tmp_path / "fleet.snapshot")
+    info = save_snapshot(fleet, path)
+    assert info["devices"] == len(fleet) == 61
+
+    restored_fleet = FleetStore(seed=7)
+    frozen = gc.get_freeze_count()
+    restored = load_snapshot(restored_fleet, path)
+    # 恢复只在期间暂停垃圾回收，不改变进程的回收状态
+    assert gc.isenabled() and gc.get_freeze_count() == frozen
+    assert len(restored) == len(restored_fleet) == 61
+    originals = {device.device_id: device for device in fleet.select()}
+    for device in restored:
+        original = originals[device.device_id]
+        assert type(device).__name__ == type(original).__name__
+        assert device.to_dict() == original.to_dict()
+        assert device.version == original.version
+    assert restored_fleet.stats.snapshot() == fleet.stats.snapshot()
+    assert (restored_fleet.environment.room_state("living")
+            == fleet.environment.room_state("living"))
+
+    # 恢复后的设备可以继续执行命令和节拍，版本号大于快照中的版本
+    light = restored_fleet.select(Light)[0]
+    light.handle_command({"command": "turn_on"})
+    assert light.version > max(device.version for device in fleet.select())
+    restored_fleet.tick(now=1100.0)
+    assert restored_fleet.add(Light, "light-new").device_id == "light-new"
+
+# 无效恢复测试
+def test_restore_errors(tmp_path):
+    fleet = build_fleet()
+    path = str(tmp_path / "fleet.snapshot")
+    save_snapshot(fleet, path)
+    with pytest.raises(ValueError):
+        load_snapshot(fleet, path)
+
+    bad = tmp_path / "bad.snapshot"
+    bad.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        load_snapshot(FleetStore(), str(bad))
+
+# 后台周期保存测试
+def test_periodic_writer(tmp_path):
+    fleet = build_fleet()
+    path = str(tmp_path / "fleet.snapshot")
+    writer = SnapshotWriter(fleet, path, 0.05)
+    writer.start()
+    deadline = time.monotonic() + 5
+    while writer.last is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    assert writer.last is not None and writer.errors == 0
+    assert len(load_snapshot(FleetStore(), path)) == len(fleet)
+
+# 快照接口测试
+def test_snapshot_api(tmp_path, monkeypatch):
+    from old import web_app
+    monkeypatch.setattr(web_app.snapshot_writer, "path", str(tmp_path / "api.snapshot"))
+    web_app.app.config['TESTING'] = True
+    with web_app.app.test_client() as client:
+        client.post('/api/devices', json={'type': 'light', 'id': 'test-light-snapshot'})
+        response = client.post('/api/snapshot')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['devices'] == len(web_app.fleet)
+
+    restored = load_snapshot(FleetStore(), str(tmp_path / "api.snapshot"))
+    assert 'test-light-snapshot' in {device.device_id for device in restored}
@@ -0,0 +1,90 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from old.devices import Light, Plug, AirConditioner
+from old.fleet import FleetStore
+from old.web_app import app
+import json
+
+def recompute(fleet):
+    """遍历所有设备重新计算合计"""
+    devices = list(fleet.select())
+    return {
+        "devices": len(devices),
+        "online": sum(1 for d in devices if d.online),
+        "power_consumption": round(sum(getattr(d, "power_consumption", 0) for d in devices), 3),
+    }
+
+# 增量汇总与全量重算一致测试
+def test_incremental_totals_match_recompute():
+    fleet = FleetStore(seed=3)
+    lights = [fleet.add(Light, f"light-{i}", group="floor-1") for i in range(50)]
+    plugs = [fleet.add(Plug, f"plug-{i}", group="floor-2") for i in range(50)]
+    ac = fleet.add(AirConditioner, "ac-1")
+
+    for light in lights[::2]:
+        light.handle_command({"command": "turn_on"})
+        light.handle_command({"command": "set_brightness", "brightness": 37})
+    for plug in plugs[::3]:
+        plug.handle_command({"command": "turn_on"})
+    ac.handle_command({"command": "turn_on"})
+    for step in range(20):
+        fleet.tick(now=step * 10.0)
+    fleet.remove(lights[0])
+    fleet.remove(plugs[3])
+
+    stats = fleet.stats.snapshot()
+    expected = recompute(fleet)
+    assert stats["devices"] == expected["devices"] == 99
+    assert stats["online"] == expected["online"]
+    assert stats["offline"] == 99 - expected["online"]
+    # 汇总按毫瓦累计，每台设备最多有 0.5 mW 的舍入误差
+    assert stats["power_consumption"] == pytest.approx(expected["power_consumption"],
+                                                       abs=0.0005 * stats["devices"])
+
+# 按类型和分组汇总测试
+def test_type_and_group_breakdown():
+    fleet = FleetStore(seed=3)
+    light = fleet.add(Light, "light-1", group="floor-1")
+    fleet.add(Light, "light-2")
+    ac = fleet.add(AirConditioner, "ac-1", group="floor-1")
+    light.handle_command({"command": "turn_on"})
+    ac.handle_command({"command": "turn_on"})
+
+    stats = fleet.stats.snapshot({"airconditioner": "ac"})
+    assert stats["types"]["light"]["devices"] == 2
+    assert stats["types"]["light"]["power_consumption"] == pytest.approx(5.0)
+    assert stats["groups"]["floor-1"]["devices"] == 2
+    assert stats["groups"]["floor-1"]["power_consumption"] == pytest.approx(1005.0)
+
+    # 分组内设备全部删除后不再返回该分组
+    fleet.remove(light)
+    fleet.remove(ac)
+    assert "floor-1" not in fleet.stats.snapshot()["groups"]
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# 汇总接口测试
+def test_stats_api(client):
+    before = json.loads(client.get('/api/stats').data)
+    response = client.post('/api/devices', json={
+        'type': 'plug',
+        'id': 'test-plug-stats',
+        'group': 'stats-group'
+    })
+    assert response.status_code == 200
+    client.post('/api/devices/test-plug-stats/command', json={'command': 'turn_on'})
+
+    stats = json.loads(client.get('/api/stats').data)
+    assert stats["devices"] == before["devices"] + 1
+    assert stats["groups"]["stats-group"]["devices"] == 1
+    assert stats["groups"]["stats-group"]["power_consumption"] > 0
+    assert "plug" in stats["types"]
+
+    response = client.post('/api/devices', json={'type': 'plug', 'id': 'x', 'group': 1})
+    assert response.status_code == 400
@@ -58,9 +58,118 @@ def test_send_command(client):
     # 测试发送无效命令
     response = client.post('/api/devices/test-light-003/command',
         json={'command': 'invalid_command'})
-    assert response.status_code == 200  # 命令无效但API调用成功
+    assert response.status_code == 400
+    assert '未知命令' in response.get_json()['error']
+    
+    # 测试参数无效的命令
+    response = client.post('/api/devices/test-light-003/command',
+        json={'command': 'set_brightness', 'brightness': 'bright'})
+    assert response.status_code == 400
     
     # 测试发送命令到不存在的设备
     response = client.post('/api/devices/non-existent/command',
         json={'command': 'turn_on'})
-    assert response.status_code == 404 
\ No newline at end of file
+    assert response.status_code == 404 
+
+def test_event_stream(client):
+    client.post('/api/devices',
+        json={'type': 'light', 'id': 'test-light-sse'})
+    
+    # 订阅事件流后，命令引起的状态变化会被推送
+    response = client.get('/api/events')
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    client.post('/api/devices/test-light-sse/command',
+        json={'command': 'turn_on'})
+    event = next(chunks).decode('utf-8')
+    assert event.startswith('event: update')
+    data = json.loads(event.split('data: ', 1)[1])
+    assert data['test-light-sse']['state'] == 'on'
+    response.close()
+
+def test_bulk_provision_and_selector_command(client):
+    response = client.post('/api/devices/bulk',
+        json={'type': 'fan', 'count': 50, 'id_pattern': 'bulk-fan-{n:03d}'})
+    assert response.status_code == 200
+    assert json.loads(response.data) == {'created': 50, 'skipped': 0}
+    
+    # 已存在的ID被跳过，初始命令作用于新设备
+    response = client.post('/api/devices/bulk',
+        json={'type': 'fan', 'count': 10, 'start': 45, 'id_pattern': 'bulk-fan-{n:03d}',
+              'commands': [{'command': 'turn_on'}]})
+    assert json.loads(response.data) == {'created': 5, 'skipped': 5}
+    assert json.loads(client.get('/api/devices/bulk-fan-050').data)['on'] is True
+    
+    response = client.post('/api/devices/bulk',
+        json={'type': 'fan', 'count': 10, 'id_pattern': 'no-sequence'})
+    assert response.status_code == 400
+    
+    # 按类型和ID前缀选择设备执行命令
+    response = client.post('/api/commands',
+        json={'selector': {'type': 'fan', 'prefix': 'bulk-fan-0'},
+              'command': {'command': 'set_speed', 'speed': 3}})
+    assert response.status_code == 200
+    assert json.loads(response.data)['matched'] == 55
+    assert json.loads(client.get('/api/devices/bulk-fan-012').data)['speed'] == 3
+    
+    response = client.post('/api/commands',
+        json={'selector': {'color': 'red'}, 'command': {'command': 'turn_on'}})
+    assert response.status_code == 400
+
+def test_query_filter_projection_and_pagination(client):
+    client.post('/api/devices/bulk',
+        json={'type': 'doorlock', 'count': 25, 'id_pattern': 'query-lock-{n:02d}'})
+    for i in range(5):
+        client.post(f'/api/devices/query-lock-{i:02d}/command', json={'command': 'unlock'})
+    
+    # 按类型和字段值过滤，只返回指定字段
+    response = client.get('/api/devices?type=doorlock&locked=false&fields=locked,battery_level')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert sorted(data) == [f'query-lock-{i:02d}' for i in range(5)]
+    assert set(data['query-lock-00']) == {'locked', 'battery_level'}
+    
+    # 数值范围过滤会排除没有该字段的设备类型
+    data = json.loads(client.get('/api/devices?battery_level_min=0&fields=battery_level').data)
+    assert all('battery_level' in state for state in data.values())
+    assert 'test-light-001' not in data
+    
+    # 游标分页遍历全部匹配设备，不重复不遗漏
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/devices?type=doorlock&limit=10&cursor={cursor}')
+        seen.extend(json.loads(response.data))
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(f'query-lock-{i:02d}' for i in range(25))
+    
+    assert client.get('/api/devices?color=red').status_code == 400
+    assert client.get('/api/devices?state_min=1').status_code == 400
+    assert client.get('/api/devices?limit=0').status_code == 400
+
+def test_etag_and_since(client):
+    client.post('/api/devices', json={'type': 'plug', 'id': 'test-plug-etag'})
+    
+    # 设备未变化时条件请求返回304
+    response = client.get('/api/devices/test-plug-etag')
+    etag = response.headers['ETag']
+    response = client.get('/api/devices/test-plug-etag', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    response = client.get('/api/devices')
+    fleet_version = response.headers['X-Fleet-Version']
+    assert client.get('/api/devices',
+        headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    
+    # 命令使设备版本和集群版本递增
+    client.post('/api/devices/test-plug-etag/command', json={'command': 'turn_on'})
+    response = client.get('/api/devices/test-plug-etag', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert int(response.headers['ETag'].strip('"')) > int(etag.strip('"'))
+    
+    # since 只返回此后变化的设备
+    data = json.loads(client.get(f'/api/devices?since={fleet_version}').data)
+    assert list(data) == ['test-plug-etag']